@@ -1,9 +1,22 @@
+import time
+
+# Measured from the first line so the rerun latency includes the imports Streamlit re-evaluates
+rerun_start_time = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
 import os
+import threading
 from dotenv import load_dotenv
-from snowflake_connection import get_snowflake_connection
+from snowflake_connection import get_snowflake_connection, query_dataframe, execute_concurrently
 from cortex_agent import CortexAgent
+from warmup import start_background_warmup, get_warmup_status
+from query_ledger import build_query_tag, record_query, top_slowest_features, feature_latency
+from health_probe import get_health_status
+from cancellation import CANCEL_POLL_SECONDS, CancelToken
+from table_profile import get_profile, profile_frame
+from question_router import answer_question, router_stats
+from example_cache import EXAMPLE_QUERIES, start_example_prewarm, get_cached_answer, record_cold_answer, example_cache_stats
 
 # Load environment variables
 load_dotenv()
@@ -20,8 +33,78 @@ if "conversation_id" not in st.session_state:
     st.session_state.conversation_id = None
 if "messages" not in st.session_state:
     st.session_state.messages = []
-if "agent" not in st.session_state:
-    st.session_state.agent = CortexAgent()
+
+# What this rerun did besides rendering, recorded with its latency
+rerun_action = "render"
+
+def get_agent():
+    """Return this session's Cortex Agent, created when a question first needs it"""
+    if "agent" not in st.session_state:
+        st.session_state.agent = CortexAgent()
+    return st.session_state.agent
+
+@st.cache_resource
+def start_background_services():
+    """
+    Start the process-wide background threads once, rather than on every rerun
+
+    Pre-connects and resumes the warehouse before the first question, and computes
+    the Query Builder example answers and keeps them current.
+    """
+    start_background_warmup()
+    start_example_prewarm(agent_factory=CortexAgent)
+    return True
+
+@st.cache_data(ttl=30)
+def ledger_summary():
+    """Cancelled work and rerun latency over the last hour, re-read from the ledger at most every 30 s"""
+    since = time.time() - 3600
+    return {
+        "cancelled": sum(row["cancelled_count"] or 0 for row in top_slowest_features(n=100, since=since)),
+        "rerun": feature_latency("app_rerun", statement="rerun:render", since=since)
+    }
+
+def ask_agent(agent, question, conversation_id, cancel_token=None):
+    """
+    Ask the Cortex Agent a question, running any SQL it asks for, and return its final response
+    """
+    response = agent.send_message(question, conversation_id, cancel_token=cancel_token)
+    if response and response.get("status") == "pending_sql_execution":
+        sql = response["sql_query"]
+        response = dict(agent.execute_sql_and_get_answer(sql, response["tool_use_id"], cancel_token=cancel_token), sql=sql)
+    return response
+
+def run_cancellable(function, *args, cancel_token):
+    """
+    Run an agent call in a worker thread while this script run waits for it
+
+    Streamlit stops a script run at its next UI update when the user clicks Stop,
+    asks another question or changes a widget, so the wait loop keeps updating a
+    status line. If the run is stopped before the call finishes, the token is
+    cancelled, which closes the agent stream and cancels any running statement.
+    """
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(response=function(*args, cancel_token=cancel_token)),
+                              name="agent-call", daemon=True)
+    worker.start()
+    status = st.empty()
+    start_time = time.time()
+    try:
+        while worker.is_alive():
+            status.caption(f"Waiting for the agent... {time.time() - start_time:.0f}s")
+            worker.join(CANCEL_POLL_SECONDS)
+    finally:
+        if worker.is_alive():
+            cancel_token.cancel("Stopped by the user")
+    status.empty()
+    return result.get("response")
+
+def record_stopped(cancel_token, question):
+    """Note a stopped question in the chat history so the rerun shows it was not answered"""
+    if cancel_token.cancelled:
+        st.session_state.messages.append({"role": "assistant", "content": f"⏹ Stopped before answering: {question}"})
+
+start_background_services()
 
 # Title and description
 st.title("❄️ Snowflake Cortex Agent POC")
@@ -51,16 +134,46 @@ if not cortex_api_key:
 with st.sidebar:
     st.header("Connection Status")
     
+    # Warm/cold indicator from the background warm-up
+    warmup_status = get_warmup_status()
+    if warmup_status["state"] == "warm":
+        st.success("🔥 Warm: connections open and warehouse running")
+    elif warmup_status["state"] == "warming":
+        st.info("⏳ Warming up connections and warehouse...")
+    elif warmup_status["state"] == "error":
+        st.warning(f"🧊 Cold: warm-up failed ({warmup_status['error_message']})")
+    else:
+        st.info("🧊 Cold: first query will pay connection and warehouse start-up")
+    
+    # Share of questions answered by the template router instead of the agent
+    stats = router_stats()
+    if stats["questions"]:
+        st.caption(f"⚡ Fast path: {stats['routed']}/{stats['questions']} questions ({stats['hit_rate']:.0%}), "
+                   f"avg {stats['avg_routed_ms'] or 0:.0f} ms")
+    
+    # Agent requests and statements stopped before they finished
+    summary = ledger_summary()
+    if summary["cancelled"]:
+        st.caption(f"⏹ Cancelled in the last hour: {summary['cancelled']} agent requests and statements")
+    
+    # Time to re-render the page, excluding reruns that ran a query or asked the agent
+    if summary["rerun"]["count"]:
+        st.caption(f"🔁 Rerun latency (last hour): p50 {summary['rerun']['p50_seconds'] * 1000:.0f} ms, "
+                   f"p95 {summary['rerun']['p95_seconds'] * 1000:.0f} ms over {summary['rerun']['count']} reruns")
+    
     # Check Snowflake connection
     if st.button("Test Snowflake Connection"):
-        conn = get_snowflake_connection()
-        if conn:
+        rerun_action = "connection_test"
+        # Both metadata queries are independent, so run them in a single round trip
+        info_result, tables_result = execute_concurrently([
+            "SELECT current_database(), current_schema(), current_warehouse()",
+            "SHOW TABLES IN SuperstoreDB.data"
+        ], timeout=30, tag=build_query_tag("sidebar_status"))
+        if info_result["status"] == "success":
             st.success("✅ Connected to Snowflake successfully!")
             
             # Display database info
-            cursor = conn.cursor()
-            cursor.execute("SELECT current_database(), current_schema(), current_warehouse()")
-            db, schema, warehouse = cursor.fetchone()
+            db, schema, warehouse = info_result["data"].iloc[0].tolist()
             
             st.markdown(f"""
             **Current Connection:**
@@ -70,35 +183,26 @@ with st.sidebar:
             """)
             
             # Check if tables exist
-            cursor.execute("SHOW TABLES IN SuperstoreDB.data")
-            tables = cursor.fetchall()
-            if tables:
+            tables_df = tables_result["data"]
+            if tables_result["status"] == "success" and not tables_df.empty:
                 st.markdown("**Available Tables:**")
-                for table in tables:
-                    st.markdown(f"- {table[1]}")
-            
-            cursor.close()
-            conn.close()
+                for table_name in tables_df["name"]:
+                    st.markdown(f"- {table_name}")
         else:
             st.error("❌ Failed to connect to Snowflake. Check your credentials.")
+            st.caption(info_result["error_message"])
     
-    # Test Cortex Agent API connection
-    cortex_api_status = "❌ Not Connected"
-    cortex_api_message = "Cortex Agent API connection failed."
-
-    if st.session_state.cortex_agent.api_key:
-        try:
-            conversation_id = st.session_state.cortex_agent.start_conversation()
-            if conversation_id:
-                cortex_api_status = "✅ Connected"
-                cortex_api_message = f"Successfully connected to Cortex Agent API. Conversation ID: {conversation_id}"
-            else:
-                cortex_api_message = "Failed to establish a conversation with the Cortex Agent."
-        except Exception as e:
-            cortex_api_message = f"Error connecting to Cortex Agent API: {str(e)}"
+    # Health from the background probe; reading it never waits on the network
+    health = get_health_status(agent_factory=CortexAgent)
+    if health["state"] == "unknown":
+        st.caption("⏳ Checking Snowflake and Cortex Agent health...")
+    for name, check in health["checks"].items():
+        label = {"snowflake": "Snowflake", "cortex_agent": "Cortex Agent credentials"}.get(name, name)
+        detail = f"{check['seconds'] * 1000:.0f} ms" if check["ok"] else check["error_message"]
+        st.caption(f"{'✅' if check['ok'] else '❌'} {label}: {detail} (checked {health['age_seconds']:.0f}s ago)")
 
     # Check if Cortex Agents feature is available
-    if cortex_api_status == "❌ Not Connected":
+    if health["checks"].get("cortex_agent", {}).get("ok") is False:
         st.sidebar.warning("⚠️ Cortex Agents API Not Available")
         st.sidebar.info("""
         The Cortex Agents API appears to be unavailable in your Snowflake account. This could be because:
@@ -110,8 +214,9 @@ with st.sidebar:
         """)
     else:
         if st.button("Test Cortex Agent API"):
+            rerun_action = "connection_test"
             if not st.session_state.conversation_id:
-                conversation_id = st.session_state.agent.start_conversation()
+                conversation_id = get_agent().start_conversation()
                 if conversation_id:
                     st.session_state.conversation_id = conversation_id
                     st.success(f"✅ Connected to Cortex Agent API! Conversation ID: {conversation_id}")
@@ -129,9 +234,12 @@ with tab1:
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+            if "data" in message:
+                st.dataframe(message["data"], use_container_width=True)
     
     # Chat input
     if prompt := st.chat_input("Ask a question about the Superstore data..."):
+        rerun_action = "chat"
         # Add user message to chat history
         st.session_state.messages.append({"role": "user", "content": prompt})
         
@@ -142,13 +250,32 @@ with tab1:
         # Get response from Cortex Agent
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
-                if not st.session_state.conversation_id:
-                    st.session_state.conversation_id = st.session_state.agent.start_conversation()
+                # Known question shapes are answered directly, without the agent round trip
+                routed = answer_question(prompt)
+                if not routed and not st.session_state.conversation_id:
+                    st.session_state.conversation_id = get_agent().start_conversation()
                 
-                if st.session_state.conversation_id:
-                    response = st.session_state.agent.send_message(prompt, st.session_state.conversation_id)
-                    if response:
-                        response_text = response.get("response", "No response received.")
+                if routed:
+                    st.markdown(routed["assistant_response"])
+                    st.dataframe(routed["data"], use_container_width=True)
+                    st.caption(f"Answered from the {routed['template']} template in {routed['seconds'] * 1000:.0f} ms")
+                    st.session_state.messages.append({"role": "assistant", "content": routed["assistant_response"],
+                                                      "data": routed["data"], "sql": routed["sql"]})
+                    with st.expander("View SQL Query"):
+                        st.code(routed["sql"], language="sql")
+                elif st.session_state.conversation_id:
+                    # Clicking Stop (or asking another question) reruns the script, which cancels the request
+                    st.button("⏹ Stop", key="stop_chat_request", help="Stop waiting for this answer")
+                    cancel_token = CancelToken()
+                    try:
+                        response = run_cancellable(ask_agent, get_agent(), prompt,
+                                                   st.session_state.conversation_id, cancel_token=cancel_token)
+                    finally:
+                        record_stopped(cancel_token, prompt)
+                    if response and response["status"] == "error":
+                        st.error(f"The Cortex Agent request failed: {response.get('error_message')}")
+                    elif response:
+                        response_text = response.get("assistant_response") or "No response received."
                         st.markdown(response_text)
                         
                         # Add assistant message to chat history
@@ -172,42 +299,43 @@ with tab2:
     with col1:
         query_type = st.selectbox(
             "Select query type:",
-            ["Sales Analysis", "Customer Information", "Product Details"]
+            list(EXAMPLE_QUERIES)
         )
         
-        if query_type == "Sales Analysis":
-            example_queries = [
-                "Show me the top 5 products by sales",
-                "What is the total profit by region?",
-                "Which category has the highest discount rate?"
-            ]
-        elif query_type == "Customer Information":
-            example_queries = [
-                "List all Gold tier customers",
-                "Which customer has spent the most?",
-                "Show me customers managed by Jason Gonzalez"
-            ]
-        else:
-            example_queries = [
-                "Which products have an 'A' sustainability rating?",
-                "List all products made of Glass",
-                "What's the average warranty period for Office Supplies?"
-            ]
+        example_queries = EXAMPLE_QUERIES[query_type]
         
         selected_query = st.selectbox("Choose an example query:", example_queries)
         custom_query = st.text_area("Or write your own query:", value=selected_query, height=100)
         
         if st.button("Run Query"):
+            rerun_action = "query_builder"
             with st.spinner("Processing query..."):
-                if not st.session_state.conversation_id:
-                    st.session_state.conversation_id = st.session_state.agent.start_conversation()
+                start_time = time.perf_counter()
+                # Example answers are pre-computed in the background; known question shapes
+                # are answered directly, without the agent round trip
+                answer = get_cached_answer(custom_query) or answer_question(custom_query)
+                if not answer and not st.session_state.conversation_id:
+                    st.session_state.conversation_id = get_agent().start_conversation()
                 
-                if st.session_state.conversation_id:
-                    response = st.session_state.agent.send_message(custom_query, st.session_state.conversation_id)
+                if answer:
+                    if not answer.get("cached"):
+                        record_cold_answer(time.perf_counter() - start_time)
+                    st.session_state.messages.append({"role": "user", "content": custom_query})
+                    st.session_state.messages.append(dict({"role": "assistant", "content": answer["assistant_response"]},
+                                                          **{key: answer[key] for key in ("data", "sql") if key in answer}))
+                elif st.session_state.conversation_id:
+                    cancel_token = CancelToken()
+                    try:
+                        response = run_cancellable(ask_agent, get_agent(), custom_query,
+                                                   st.session_state.conversation_id, cancel_token=cancel_token)
+                    finally:
+                        record_stopped(cancel_token, custom_query)
+                    record_cold_answer(time.perf_counter() - start_time)
                     if response:
                         # Add to chat history
                         st.session_state.messages.append({"role": "user", "content": custom_query})
-                        st.session_state.messages.append({"role": "assistant", "content": response.get("response", "No response received.")})
+                        st.session_state.messages.append(dict({"role": "assistant", "content": response.get("assistant_response") or "No response received."},
+                                                              **({"sql": response["sql"]} if "sql" in response else {})))
                     else:
                         st.error("Failed to get a response from the Cortex Agent.")
                 else:
@@ -215,8 +343,14 @@ with tab2:
     
     with col2:
         st.subheader("Query Results")
+        cache_stats = example_cache_stats()
+        if cache_stats["warm_hits"] and cache_stats["avg_cold_ms"]:
+            st.caption(f"Pre-computed examples: {cache_stats['current']} ready, warm hits avg {cache_stats['avg_warm_ms']:.1f} ms "
+                       f"vs {cache_stats['avg_cold_ms']:.0f} ms cold")
         if st.session_state.messages and len(st.session_state.messages) >= 2:
             st.markdown(st.session_state.messages[-1]["content"])
+            if "data" in st.session_state.messages[-1]:
+                st.dataframe(st.session_state.messages[-1]["data"], use_container_width=True)
             
             # Display SQL if available in the last response
             if len(st.session_state.messages) >= 2 and "sql" in st.session_state.messages[-1]:
@@ -233,46 +367,20 @@ with tab3:
     )
     
     if st.button("Load Data"):
-        with st.spinner(f"Loading {table_choice} data..."):
+        rerun_action = "data_explorer"
+        with st.spinner(f"Profiling {table_choice}..."):
             conn = get_snowflake_connection()
             if conn:
                 try:
-                    cursor = conn.cursor()
-                    cursor.execute(f"SELECT * FROM SuperstoreDB.data.{table_choice} LIMIT 100")
-                    
-                    # Get column names
-                    column_names = [desc[0] for desc in cursor.description]
-                    
-                    # Fetch data
-                    data = cursor.fetchall()
-                    
-                    # Create DataFrame
-                    df = pd.DataFrame(data, columns=column_names)
-                    
-                    # Display data
-                    st.dataframe(df, use_container_width=True)
-                    
-                    # Show basic statistics
-                    st.subheader("Basic Statistics")
-                    
-                    # For numerical columns
-                    numeric_cols = df.select_dtypes(include=['float', 'int']).columns
-                    if not numeric_cols.empty:
-                        st.write(df[numeric_cols].describe())
-                    
-                    # Count by categorical columns
-                    if table_choice == "Customers":
-                        st.subheader("Customers by State")
-                        state_counts = df["STATE"].value_counts().reset_index()
-                        state_counts.columns = ["State", "Count"]
-                        st.bar_chart(state_counts.set_index("State"))
-                    elif table_choice == "Claims":
-                        st.subheader("Claims by Type")
-                        claim_type_counts = df["CLAIM_TYPE"].value_counts().reset_index()
-                        claim_type_counts.columns = ["Claim Type", "Count"]
-                        st.bar_chart(claim_type_counts.set_index("Claim Type"))
-                    
-                    cursor.close()
+                    # Statistics are aggregate SQL over the full table, computed once per data version
+                    profile = get_profile(table_choice, backend="snowflake", conn=conn)
+                    sample = query_dataframe(
+                        f"SELECT * FROM SuperstoreDB.data.{table_choice} LIMIT 100",
+                        conn=conn,
+                        tag=build_query_tag("data_explorer")
+                    )
+                    # Kept in the session so widget changes below re-render without querying again
+                    st.session_state.explorer = {"table": table_choice, "profile": profile, "sample": sample}
                     conn.close()
                 except Exception as e:
                     st.error(f"Error loading data: {e}")
@@ -280,7 +388,33 @@ with tab3:
                         conn.close()
             else:
                 st.error("Failed to connect to Snowflake.")
+    
+    explorer = st.session_state.get("explorer")
+    if explorer and explorer["table"] == table_choice:
+        profile = explorer["profile"]
+        st.subheader("Column Statistics")
+        st.caption(f"{profile['rows']:,} rows; "
+                   f"{'cached' if profile['cached'] else 'computed'} for data version {profile['version']} "
+                   f"(profiling took {profile['seconds']:.1f}s)")
+        st.dataframe(profile_frame(profile), use_container_width=True)
+        
+        # Most frequent values of the columns that have them
+        top_columns = [column for column in profile["columns"] if column["top_values"]]
+        if top_columns:
+            st.subheader("Top Values")
+            column_name = st.selectbox("Column:", [column["name"] for column in top_columns])
+            top_values = next(column["top_values"] for column in top_columns if column["name"] == column_name)
+            st.bar_chart(pd.DataFrame(top_values).set_index("value")["count"])
+        
+        # A few rows to show what the data looks like
+        st.subheader("Sample Rows")
+        st.dataframe(explorer["sample"], use_container_width=True)
 
 # Footer
 st.markdown("---")
 st.markdown("Snowflake Cortex Agent POC | Created with Streamlit")
+
+# Track how long each rerun takes; render-only reruns are the cost of every interaction
+rerun_seconds = time.perf_counter() - rerun_start_time
+record_query(build_query_tag("app_rerun"), f"rerun:{rerun_action}",
+             submit_time=time.time() - rerun_seconds, last_row_seconds=rerun_seconds)
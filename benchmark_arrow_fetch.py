@@ -0,0 +1,104 @@
+import time
+import pandas as pd
+from dotenv import load_dotenv
+from snowflake_connection import get_snowflake_connection, query_dataframe, fetch_arrow_batches
+from query_ledger import build_query_tag, tag_statement_params, set_session_query_tag
+
+# Load environment variables
+load_dotenv()
+
+ORDERS_TABLE = "SuperstoreDB.data.Orders"
+SCALED_TABLE = "SuperstoreDB.data.Orders_Scaled"
+SCALE_FACTOR = 100
+REPEATS = 3
+
+# QUERY_TAG attached to every benchmark statement
+BENCHMARK_TAG = build_query_tag("benchmark")
+
+def create_scaled_copy(conn, scale_factor=SCALE_FACTOR):
+    """
+    Create a scaled copy of the Orders table by cross joining it with a row generator
+    
+    Args:
+        conn: Open Snowflake connection
+        scale_factor (int): Number of copies of each order line to produce
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE OR REPLACE TRANSIENT TABLE {SCALED_TABLE} AS
+        SELECT o.*
+        FROM {ORDERS_TABLE} o
+        CROSS JOIN TABLE(GENERATOR(ROWCOUNT => {scale_factor}))
+    """)
+    cursor.close()
+
+def fetch_with_tuples(conn, query):
+    """Baseline: fetchall() into Python tuples, then build a DataFrame"""
+    cursor = conn.cursor()
+    cursor.execute(query, _statement_params=tag_statement_params(BENCHMARK_TAG))
+    column_names = [desc[0] for desc in cursor.description]
+    data = cursor.fetchall()
+    cursor.close()
+    return pd.DataFrame(data, columns=column_names)
+
+def fetch_streaming(conn, query):
+    """Stream Arrow batches and only count rows, as a large-result consumer would"""
+    return sum(batch.num_rows for batch in fetch_arrow_batches(query, conn=conn, tag=BENCHMARK_TAG))
+
+def time_call(func, *args, **kwargs):
+    """Return the best wall-clock time in seconds over REPEATS runs and the last result"""
+    best = None
+    result = None
+    for _ in range(REPEATS):
+        start_time = time.time()
+        result = func(*args, **kwargs)
+        elapsed = time.time() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def benchmark_table(conn, table_name, prefetch_threads=(1, 4, 8)):
+    """
+    Compare the tuple-based fetch path against the Arrow helpers for one table
+    """
+    # Disable the result cache so every run downloads the result again
+    conn.cursor().execute("ALTER SESSION SET USE_CACHED_RESULT = FALSE")
+    query = f"SELECT * FROM {table_name}"
+    
+    print(f"\n=== {table_name} ===")
+    elapsed, df = time_call(fetch_with_tuples, conn, query)
+    print(f"fetchall + pd.DataFrame:          {elapsed:.3f}s ({len(df)} rows)")
+    
+    for threads in prefetch_threads:
+        elapsed, df = time_call(query_dataframe, query, conn=conn, prefetch_threads=threads, tag=BENCHMARK_TAG)
+        print(f"query_dataframe (threads={threads}):    {elapsed:.3f}s ({len(df)} rows)")
+    
+    elapsed, table = time_call(query_dataframe, query, conn=conn, as_arrow=True, tag=BENCHMARK_TAG)
+    print(f"query_dataframe (as_arrow):       {elapsed:.3f}s ({table.num_rows} rows)")
+    
+    elapsed, row_count = time_call(fetch_streaming, conn, query)
+    print(f"fetch_arrow_batches (streaming):  {elapsed:.3f}s ({row_count} rows)")
+
+def run_benchmark():
+    """
+    Benchmark result fetching on the full Orders table and on a scaled copy
+    """
+    conn = get_snowflake_connection()
+    if not conn:
+        print("Failed to connect to Snowflake. Please check your credentials.")
+        return False
+    
+    try:
+        set_session_query_tag(conn, BENCHMARK_TAG)
+        benchmark_table(conn, ORDERS_TABLE)
+        
+        print(f"\nCreating scaled copy ({SCALE_FACTOR}x) in {SCALED_TABLE}...")
+        create_scaled_copy(conn)
+        benchmark_table(conn, SCALED_TABLE)
+        
+        conn.cursor().execute(f"DROP TABLE IF EXISTS {SCALED_TABLE}")
+        return True
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    run_benchmark()
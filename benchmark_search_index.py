@@ -0,0 +1,84 @@
+import json
+import time
+from dotenv import load_dotenv
+from snowflake_connection import get_snowflake_connection
+from query_ledger import build_query_tag, execute_tagged
+from setup_database import SEARCH_SERVICE_TEMPLATE, SEARCH_SERVICE_SOURCE, LEGACY_SEARCH_SERVICE_SOURCE
+
+# Load environment variables
+load_dotenv()
+
+# Temporary services built side by side from each definition, dropped afterwards
+BENCHMARK_SERVICES = {
+    "per order line (before)": ("superstore_product_search_bench_lines", LEGACY_SEARCH_SERVICE_SOURCE),
+    "per product (after)": ("superstore_product_search_bench_products", SEARCH_SERVICE_SOURCE),
+}
+
+SAMPLE_QUERIES = ["ergonomic office chair", "recycled paper", "wireless headset"]
+SEARCH_LIMIT = 10
+
+BENCHMARK_TAG = build_query_tag("benchmark")
+
+def describe_service(cursor, service_name):
+    """Return DESCRIBE CORTEX SEARCH SERVICE output as a dict keyed by lowercase column name"""
+    execute_tagged(cursor, f"DESCRIBE CORTEX SEARCH SERVICE SuperstoreDB.data.{service_name}", BENCHMARK_TAG)
+    columns = [desc[0].lower() for desc in cursor.description]
+    row = cursor.fetchone()
+    return dict(zip(columns, row)) if row else {}
+
+def duplicate_hits(cursor, service_name, query):
+    """Return (hits, distinct products) for one search, to show duplicate results"""
+    request = json.dumps({"query": query, "columns": ["Product_ID", "Product_Name"], "limit": SEARCH_LIMIT})
+    execute_tagged(
+        cursor,
+        "SELECT SNOWFLAKE.CORTEX.SEARCH_PREVIEW(%s, %s)",
+        BENCHMARK_TAG,
+        params=(f"SuperstoreDB.data.{service_name}", request)
+    )
+    results = json.loads(cursor.fetchone()[0]).get("results", [])
+    return len(results), len({result.get("Product_ID") or result.get("PRODUCT_ID") for result in results})
+
+def run_benchmark():
+    """
+    Build a search service from the per-order-line and the per-product definitions and compare them
+
+    Reports source documents, build (initial refresh) time and duplicate hits for a few sample queries.
+    """
+    conn = get_snowflake_connection()
+    if not conn:
+        print("Failed to connect to Snowflake. Please check your credentials.")
+        return False
+
+    cursor = conn.cursor()
+    try:
+        for label, (service_name, source) in BENCHMARK_SERVICES.items():
+            start_time = time.time()
+            execute_tagged(cursor, SEARCH_SERVICE_TEMPLATE.format(name=f"SuperstoreDB.data.{service_name}", source=source), BENCHMARK_TAG)
+            build_seconds = time.time() - start_time
+
+            execute_tagged(cursor, f"SELECT COUNT(*) FROM ({source})", BENCHMARK_TAG)
+            documents = cursor.fetchone()[0]
+            description = describe_service(cursor, service_name)
+
+            print(f"\n=== {label} ===")
+            print(f"Source documents:     {documents}")
+            print(f"Indexed rows:         {description.get('source_data_num_rows', 'n/a')}")
+            print(f"Build/refresh time:   {build_seconds:.2f}s")
+            for query in SAMPLE_QUERIES:
+                try:
+                    hits, distinct_products = duplicate_hits(cursor, service_name, query)
+                    print(f"'{query}': {hits} hits, {distinct_products} distinct products")
+                except Exception as e:
+                    print(f"'{query}': search failed: {e}")
+        return True
+    finally:
+        for service_name, _ in BENCHMARK_SERVICES.values():
+            try:
+                execute_tagged(cursor, f"DROP CORTEX SEARCH SERVICE IF EXISTS SuperstoreDB.data.{service_name}", BENCHMARK_TAG)
+            except Exception as e:
+                print(f"Error dropping {service_name}: {e}")
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,101 @@
+import time
+from dotenv import load_dotenv
+from snowflake_connection import get_snowflake_connection
+from query_ledger import build_query_tag, execute_tagged, set_session_query_tag
+
+# Load environment variables
+load_dotenv()
+
+BENCHMARK_TAG = build_query_tag("benchmark")
+
+# Example questions answered from Orders and from the summary tables created by setup_database.py
+EXAMPLE_QUESTIONS = [
+    (
+        "What are the total sales by category?",
+        "SELECT Category, SUM(Sales) FROM SuperstoreDB.data.Orders GROUP BY Category",
+        "SELECT Category, SUM(Sales) FROM SuperstoreDB.data.Daily_Sales_Summary GROUP BY Category"
+    ),
+    (
+        "What is the total profit by region?",
+        "SELECT Region, SUM(Profit) FROM SuperstoreDB.data.Orders GROUP BY Region",
+        "SELECT Region, SUM(Profit) FROM SuperstoreDB.data.Daily_Sales_Summary GROUP BY Region"
+    ),
+    (
+        "What is the monthly sales trend?",
+        "SELECT DATE_TRUNC('month', Order_Date) AS Month, SUM(Sales) FROM SuperstoreDB.data.Orders GROUP BY Month ORDER BY Month",
+        "SELECT DATE_TRUNC('month', Order_Date) AS Month, SUM(Sales) FROM SuperstoreDB.data.Daily_Sales_Summary GROUP BY Month ORDER BY Month"
+    ),
+    (
+        "Which category has the highest discount rate?",
+        "SELECT Category, AVG(Discount) AS Rate FROM SuperstoreDB.data.Orders GROUP BY Category ORDER BY Rate DESC LIMIT 1",
+        "SELECT Category, SUM(Discount_Total) / SUM(Order_Lines) AS Rate FROM SuperstoreDB.data.Daily_Sales_Summary "
+        "GROUP BY Category ORDER BY Rate DESC LIMIT 1"
+    ),
+    (
+        "Show me the top 5 products by sales",
+        "SELECT Product_Name, SUM(Sales) AS Total FROM SuperstoreDB.data.Orders GROUP BY Product_ID, Product_Name ORDER BY Total DESC LIMIT 5",
+        "SELECT Product_Name, Sales FROM SuperstoreDB.data.Product_Summary ORDER BY Sales DESC LIMIT 5"
+    ),
+    (
+        "Which customer has spent the most?",
+        "SELECT Customer_Name, SUM(Sales) AS Total FROM SuperstoreDB.data.Orders GROUP BY Customer_ID, Customer_Name ORDER BY Total DESC LIMIT 1",
+        "SELECT Customer_Name, Sales FROM SuperstoreDB.data.Customer_Summary ORDER BY Sales DESC LIMIT 1"
+    ),
+]
+
+def run_query(cursor, query):
+    """Run a query and return (query_id, client-side seconds, rows)"""
+    start_time = time.time()
+    execute_tagged(cursor, query, BENCHMARK_TAG)
+    rows = cursor.fetchall()
+    return cursor.sfqid, time.time() - start_time, rows
+
+def bytes_scanned(cursor, query_ids):
+    """Look up BYTES_SCANNED for this session's queries"""
+    execute_tagged(
+        cursor,
+        "SELECT query_id, bytes_scanned FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION(RESULT_LIMIT => 1000))",
+        BENCHMARK_TAG
+    )
+    scanned = dict(cursor.fetchall())
+    return {query_id: scanned.get(query_id) for query_id in query_ids}
+
+def run_benchmark():
+    """
+    Compare latency and bytes scanned of the example questions on Orders against the summary tables
+
+    The gap grows with the size of Orders; load a large synthetic dataset first
+    (generate_data.py and chunked_loader.py) to measure it at scale.
+    """
+    conn = get_snowflake_connection()
+    if not conn:
+        print("Failed to connect to Snowflake. Please check your credentials.")
+        return False
+
+    cursor = conn.cursor()
+    try:
+        set_session_query_tag(conn, BENCHMARK_TAG)
+        # Disable the result cache so every query scans its table
+        cursor.execute("ALTER SESSION SET USE_CACHED_RESULT = FALSE")
+
+        runs = []
+        for question, orders_query, summary_query in EXAMPLE_QUESTIONS:
+            orders_id, orders_seconds, orders_rows = run_query(cursor, orders_query)
+            summary_id, summary_seconds, summary_rows = run_query(cursor, summary_query)
+            runs.append((question, orders_id, orders_seconds, summary_id, summary_seconds, len(orders_rows) == len(summary_rows)))
+
+        # QUERY_HISTORY is populated asynchronously
+        time.sleep(5)
+        scanned = bytes_scanned(cursor, [run[1] for run in runs] + [run[3] for run in runs])
+
+        print(f"\n{'Question':<48} {'Orders s':>9} {'Summary s':>10} {'Orders bytes':>14} {'Summary bytes':>14} {'Rows match':>10}")
+        for question, orders_id, orders_seconds, summary_id, summary_seconds, rows_match in runs:
+            print(f"{question[:48]:<48} {orders_seconds:>9.3f} {summary_seconds:>10.3f} "
+                  f"{scanned[orders_id] or 0:>14} {scanned[summary_id] or 0:>14} {str(rows_match):>10}")
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    run_benchmark()
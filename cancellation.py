@@ -0,0 +1,81 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Seconds between checks of a cancel token while waiting on a warehouse statement or an agent response
+CANCEL_POLL_SECONDS = float(os.getenv('CANCEL_POLL_SECONDS', '0.2'))
+
+class RequestCancelled(Exception):
+    """Raised inside a call whose cancel token was cancelled"""
+
+class CancelToken:
+    """
+    Cooperative cancellation flag shared by the UI and the code doing the work
+
+    The UI calls cancel(); work in progress either checks the token between
+    steps or registers a callback with on_cancel() that interrupts a blocking
+    call (closing an HTTP stream, interrupting a local query). Callbacks run in
+    the thread that calls cancel().
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+        self.cancel_time = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="Cancelled by the user"):
+        """Cancel the work using this token; later calls do nothing"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self.cancel_time = time.time()
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error running cancel callback: {e}")
+
+    def wait(self, seconds):
+        """Wait up to seconds for cancellation; returns True if cancelled"""
+        return self._event.wait(seconds)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise RequestCancelled(self.reason)
+
+    @contextmanager
+    def on_cancel(self, callback):
+        """
+        Run callback if the token is cancelled while the block runs (immediately if it already is)
+        """
+        with self._lock:
+            already_cancelled = self._event.is_set()
+            if not already_cancelled:
+                self._callbacks.append(callback)
+        if already_cancelled:
+            callback()
+        try:
+            yield self
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+def cancelled_response(token=None):
+    """Agent-style response returned by a call that was cancelled"""
+    return {"status": "cancelled", "assistant_response": "",
+            "error_message": token.reason if token is not None and token.reason else "Cancelled"}
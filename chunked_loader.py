@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+import pandas as pd
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from snowflake_connection import get_connection_pool
+from query_ledger import build_query_tag, execute_tagged
+from load_manifest import text_sha256
+from preprocess_data import TABLE_SCHEMAS, DATA_DIR, PARQUET_COMPRESSION, normalize_frame, to_arrow_table
+
+# Load environment variables
+load_dotenv()
+
+# Snowflake loads fastest from compressed files of roughly 100-250 MB
+DEFAULT_TARGET_CHUNK_BYTES = int(os.getenv('LOADER_TARGET_CHUNK_MB', '128')) * 1024 * 1024
+
+# CSV rows parsed per read; bounds memory independently of the input size
+ROWS_PER_PIECE = int(os.getenv('LOADER_ROWS_PER_PIECE', '200000'))
+
+# Concurrent PUTs while chunks are being produced
+UPLOAD_WORKERS = int(os.getenv('LOADER_UPLOAD_WORKERS', '4'))
+
+# Local working area for chunk files and resumable progress
+CHUNK_DIR = os.path.join(DATA_DIR, 'chunks')
+
+STAGE = "@SuperstoreDB.data.SUPERSTORE_STAGE"
+
+LOADER_TAG = build_query_tag("chunked_loader")
+
+def source_fingerprint(path):
+    """
+    Identify an input file by path, size and modification time
+
+    Cheap even for very large files, and changes whenever the file is rewritten.
+    """
+    stat = os.stat(path)
+    return text_sha256(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)[:16]
+
+def iter_typed_pieces(path, table, rows_per_piece=ROWS_PER_PIECE, skip_rows=0):
+    """
+    Stream a CSV as typed Arrow tables of at most rows_per_piece rows
+
+    Only one piece is held in memory at a time. skip_rows (a multiple of
+    rows_per_piece) skips pieces already consumed by an earlier run.
+    """
+    reader = pd.read_csv(path, encoding='utf-8-sig', dtype=str, keep_default_na=False,
+                         chunksize=rows_per_piece)
+    rows_seen = 0
+    for raw in reader:
+        rows_seen += len(raw)
+        if rows_seen <= skip_rows:
+            continue
+        yield to_arrow_table(normalize_frame(raw, table), table)
+
+def iter_chunks(path, table, work_dir, progress, target_bytes=DEFAULT_TARGET_CHUNK_BYTES,
+                rows_per_piece=ROWS_PER_PIECE):
+    """
+    Split a CSV of any size into size-targeted Parquet chunk files
+
+    Pieces are appended to the current chunk as row groups until its compressed
+    size reaches target_bytes. Each finished chunk is recorded in progress
+    before it is yielded, so a restarted run continues after the last one.
+
+    Yields:
+        str: Name of each newly finished chunk file in work_dir
+    """
+    writer = None
+    chunk_name = None
+    chunk_rows = 0
+
+    def finish_chunk():
+        writer.close()
+        progress["rows_consumed"] += chunk_rows
+        progress["chunks"][chunk_name] = {"rows": chunk_rows, "uploaded": False}
+        save_progress(work_dir, progress)
+
+    for piece in iter_typed_pieces(path, table, rows_per_piece, skip_rows=progress["rows_consumed"]):
+        if writer is None:
+            chunk_name = f"{table.lower()}_{len(progress['chunks']):05d}.parquet"
+            writer = pq.ParquetWriter(os.path.join(work_dir, chunk_name), piece.schema,
+                                      compression=PARQUET_COMPRESSION)
+            chunk_rows = 0
+        writer.write_table(piece)
+        chunk_rows += piece.num_rows
+
+        if os.path.getsize(os.path.join(work_dir, chunk_name)) >= target_bytes:
+            finish_chunk()
+            yield chunk_name
+            writer = None
+
+    if writer is not None:
+        finish_chunk()
+        yield chunk_name
+
+def load_progress(work_dir, fingerprint):
+    """Load resumable progress for this input, or start fresh if the input changed"""
+    try:
+        with open(os.path.join(work_dir, 'progress.json'), 'r') as f:
+            progress = json.load(f)
+        if progress.get("fingerprint") == fingerprint:
+            return progress
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return {"fingerprint": fingerprint, "rows_consumed": 0, "chunks": {}, "produced_all": False, "copied": False}
+
+def save_progress(work_dir, progress):
+    """Persist progress atomically"""
+    tmp_path = os.path.join(work_dir, 'progress.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(progress, f, indent=2)
+    os.replace(tmp_path, os.path.join(work_dir, 'progress.json'))
+
+def _put_chunk(pool, work_dir, stage_prefix, chunk_name):
+    local_path = os.path.join(work_dir, chunk_name)
+    with pool.connection() as conn:
+        execute_tagged(
+            conn.cursor(),
+            f"PUT file://{local_path} {STAGE}/{stage_prefix}/ OVERWRITE=TRUE AUTO_COMPRESS=FALSE",
+            LOADER_TAG
+        )
+    return chunk_name
+
+def load_large_file(path, table='Orders', target_bytes=DEFAULT_TARGET_CHUNK_BYTES,
+                    rows_per_piece=ROWS_PER_PIECE, upload_workers=UPLOAD_WORKERS,
+                    truncate=False, keep_chunks=False, pool=None):
+    """
+    Load an arbitrarily large CSV into a table with constant memory
+
+    Chunks are produced by a generator and uploaded in parallel as soon as each
+    one is finished, then loaded with a single COPY over their stage prefix so
+    the warehouse can parallelize across files. If the process dies, running it
+    again on the same input resumes: finished chunks are not rebuilt, uploaded
+    chunks are not re-sent, and COPY load metadata skips files already loaded.
+
+    Args:
+        path (str): CSV file (optionally gzip-compressed) with the table's source headers
+        table (str): Target table, one of preprocess_data.TABLE_SCHEMAS
+        target_bytes (int): Approximate compressed size of each chunk
+        rows_per_piece (int): CSV rows parsed per read
+        upload_workers (int): Concurrent PUTs
+        truncate (bool): Empty the table before the first COPY instead of appending
+        keep_chunks (bool): Keep local chunk files after they are uploaded
+        pool (SnowflakeConnectionPool): Pool to upload and load with (default get_connection_pool())
+
+    Returns:
+        dict: chunks, rows, seconds and copy_result
+    """
+    if table not in TABLE_SCHEMAS:
+        raise ValueError(f"Unknown table {table}; expected one of {list(TABLE_SCHEMAS)}")
+
+    start_time = time.time()
+    pool = pool or get_connection_pool()
+    fingerprint = source_fingerprint(path)
+    work_dir = os.path.join(CHUNK_DIR, table.lower(), fingerprint)
+    os.makedirs(work_dir, exist_ok=True)
+    stage_prefix = f"chunks/{table.lower()}/{fingerprint}"
+
+    progress = load_progress(work_dir, fingerprint)
+    if progress["copied"]:
+        print(f"{path} was already loaded into {table}")
+        return {"chunks": len(progress["chunks"]), "rows": progress["rows_consumed"], "seconds": 0, "copy_result": None}
+    if progress["chunks"]:
+        print(f"Resuming {path}: {len(progress['chunks'])} chunks / {progress['rows_consumed']} rows already produced")
+
+    def mark_uploaded(future):
+        chunk_name = future.result()
+        progress["chunks"][chunk_name]["uploaded"] = True
+        save_progress(work_dir, progress)
+        if not keep_chunks:
+            os.remove(os.path.join(work_dir, chunk_name))
+        print(f"Uploaded {chunk_name} ({progress['chunks'][chunk_name]['rows']} rows)")
+
+    with ThreadPoolExecutor(max_workers=upload_workers) as executor:
+        pending = set()
+
+        def drain(block):
+            # Progress is saved from this thread only, so uploads are recorded here as they complete
+            done, _ = wait(pending, return_when=FIRST_COMPLETED if block else ALL_COMPLETED, timeout=None if block else 0)
+            for future in done:
+                pending.discard(future)
+                mark_uploaded(future)
+
+        def submit(chunk_name):
+            pending.add(executor.submit(_put_chunk, pool, work_dir, stage_prefix, chunk_name))
+            drain(block=False)
+            # Bound the number of finished-but-unsent chunks on local disk
+            while len(pending) >= upload_workers * 2:
+                drain(block=True)
+
+        # Chunks finished by an earlier run but never uploaded
+        for chunk_name, info in list(progress["chunks"].items()):
+            if not info["uploaded"]:
+                submit(chunk_name)
+
+        if not progress["produced_all"]:
+            for chunk_name in iter_chunks(path, table, work_dir, progress, target_bytes, rows_per_piece):
+                submit(chunk_name)
+            progress["produced_all"] = True
+            save_progress(work_dir, progress)
+
+        while pending:
+            drain(block=True)
+
+    copy_command = f"""
+    COPY INTO SuperstoreDB.data.{table}
+    FROM {STAGE}/{stage_prefix}/
+    PATTERN = '.*[.]parquet'
+    FILE_FORMAT = (TYPE = 'PARQUET')
+    MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+    ON_ERROR = 'ABORT_STATEMENT'
+    """
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        if truncate and not progress.get("truncated"):
+            execute_tagged(cursor, f"TRUNCATE TABLE SuperstoreDB.data.{table}", LOADER_TAG)
+            progress["truncated"] = True
+            save_progress(work_dir, progress)
+        execute_tagged(cursor, copy_command, LOADER_TAG)
+        copy_result = cursor.fetchall()
+        cursor.close()
+
+    progress["copied"] = True
+    save_progress(work_dir, progress)
+
+    elapsed = time.time() - start_time
+    print(f"Loaded {progress['rows_consumed']} rows from {len(progress['chunks'])} chunks into {table} in {elapsed:.2f}s")
+    return {"chunks": len(progress["chunks"]), "rows": progress["rows_consumed"], "seconds": elapsed, "copy_result": copy_result}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a large CSV into Snowflake in parallel Parquet chunks")
+    parser.add_argument("path", help="CSV file to load")
+    parser.add_argument("--table", default="Orders", choices=list(TABLE_SCHEMAS))
+    parser.add_argument("--target-mb", type=int, default=DEFAULT_TARGET_CHUNK_BYTES // (1024 * 1024))
+    parser.add_argument("--truncate", action="store_true", help="Replace the table contents instead of appending")
+    parser.add_argument("--keep-chunks", action="store_true", help="Keep local chunk files after upload")
+    args = parser.parse_args()
+    load_large_file(args.path, table=args.table, target_bytes=args.target_mb * 1024 * 1024,
+                    truncate=args.truncate, keep_chunks=args.keep_chunks)
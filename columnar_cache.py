@@ -0,0 +1,238 @@
+import os
+import json
+import glob
+import time
+import argparse
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from load_manifest import file_sha256, text_sha256
+from preprocess_data import DATA_DIR, INGESTED_ORDERS_DIR, SURVIVORSHIP_RULE, TABLE_SCHEMAS, source_path, arrow_schema, normalize_frame, conform_dimension, to_arrow_table
+
+# Load environment variables
+load_dotenv()
+
+# Directory holding the converted Arrow IPC files
+CACHE_DIR = os.getenv('DATA_CACHE_DIR', os.path.join(DATA_DIR, 'cache'))
+
+# Source CSV rows parsed per batch while converting, bounding memory for large files
+CONVERT_CHUNK_ROWS = int(os.getenv('DATA_CACHE_CHUNK_ROWS', '1000000'))
+
+# Bump when the conversion changes so existing cache files are rebuilt
+CACHE_FORMAT_VERSION = 1
+
+# path -> {size, mtime_ns, sha256}, so unchanged sources are not re-hashed on every load
+DIGEST_INDEX_PATH = os.path.join(CACHE_DIR, 'source_digests.json')
+
+_digest_lock = threading.Lock()
+
+# Real paths of the cache files this process has memory-mapped
+_mapped_paths = set()
+
+def source_files(path):
+    """
+    Return the data files of a source: the file itself, or every CSV/Parquet file in a directory
+
+    The default Orders source (superstore.csv) also includes the files ingest_daemon.py
+    appended to Orders, in load order, so local answers see the same rows as the warehouse.
+    """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '*.csv')) + glob.glob(os.path.join(path, '*.parquet')))
+    if os.path.abspath(path) == os.path.abspath(source_path('Orders')):
+        return [path] + sorted(glob.glob(os.path.join(INGESTED_ORDERS_DIR, '*.parquet')))
+    return [path]
+
+def source_digest(path):
+    """
+    Return the SHA-256 of a source file, re-hashing only when its size or modification time changed
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    with _digest_lock:
+        try:
+            with open(DIGEST_INDEX_PATH, 'r') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = {}
+        entry = index.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+
+        digest = file_sha256(path)
+        index[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{DIGEST_INDEX_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, DIGEST_INDEX_PATH)
+        return digest
+
+def cache_path(table, path=None, conform=False, rule=SURVIVORSHIP_RULE):
+    """
+    Return the cache file for a source, named by a hash of the source content and the conversion
+
+    A changed source, schema, survivorship rule or CACHE_FORMAT_VERSION gives a
+    new file name, so a stale cache file is never read. The name starts with
+    _cache_prefix, so the files a new one supersedes can be found.
+    """
+    path = path or source_path(table)
+    key = text_sha256(
+        table,
+        CACHE_FORMAT_VERSION,
+        TABLE_SCHEMAS[table]['columns'],
+        rule if conform else None,
+        *(source_digest(f) for f in source_files(path))
+    )
+    return os.path.join(CACHE_DIR, f"{_cache_prefix(table, path, conform, rule)}_{key[:16]}.arrow")
+
+def source_id(path):
+    """Short hash of a source's absolute path, so files built from different sources never supersede each other"""
+    return text_sha256(os.path.abspath(path))[:8]
+
+def _cache_prefix(table, path, conform, rule):
+    """
+    Common start of every cache file name of one source: the table, the variant (raw, or
+    the survivorship rule of a conformed dimension) and the source_id
+    """
+    return f"{table.lower()}_{rule if conform else 'raw'}_{source_id(path)}"
+
+def map_file(path):
+    """Read an Arrow IPC cache file as a memory-mapped table, remembering that this process mapped it"""
+    _mapped_paths.add(os.path.realpath(path))
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+def _mapped_now():
+    """The files this process mapped that are still mapped (all of them where /proc is unavailable)"""
+    try:
+        with open('/proc/self/maps') as f:
+            mapped = {line.split(None, 5)[5].strip() for line in f if len(line.split(None, 5)) == 6}
+    except OSError:
+        return set(_mapped_paths)
+    return _mapped_paths & mapped
+
+def remove_superseded(pattern, keep):
+    """
+    Delete the files in CACHE_DIR matching a glob pattern, except keep
+
+    Called after writing a new content-hashed file, so the files it replaces do
+    not accumulate. Files this process still has memory-mapped are left for the
+    next cleanup; a file another process holds open and cannot be deleted is skipped.
+
+    Args:
+        pattern (str): Glob pattern, relative to CACHE_DIR, of the files keep supersedes
+        keep (str): The current file
+
+    Returns:
+        list: Paths removed
+    """
+    in_use = _mapped_now() | {os.path.realpath(keep)}
+    removed = []
+    for path in glob.glob(os.path.join(CACHE_DIR, pattern)):
+        if os.path.realpath(path) in in_use:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        _mapped_paths.discard(os.path.realpath(path))
+        removed.append(path)
+    return removed
+
+def _typed_batches(table, path):
+    """Yield typed Arrow tables for a source in batches of at most CONVERT_CHUNK_ROWS rows"""
+    schema = arrow_schema(table)
+    for file_path in source_files(path):
+        if file_path.endswith('.parquet'):
+            for batch in pq.ParquetFile(file_path).iter_batches(batch_size=CONVERT_CHUNK_ROWS):
+                yield pa.Table.from_batches([batch]).select(schema.names).cast(schema)
+            continue
+        reader = pd.read_csv(file_path, encoding='utf-8-sig', dtype=str, keep_default_na=False, chunksize=CONVERT_CHUNK_ROWS)
+        for raw in reader:
+            yield to_arrow_table(normalize_frame(raw, table), table)
+
+def build_cache(table, path=None, conform=False, rule=SURVIVORSHIP_RULE):
+    """
+    Convert a source to an uncompressed Arrow IPC file that can be memory-mapped
+
+    Large sources are converted batch by batch. Dimensions conformed to one row
+    per key are converted in one pass, since duplicates can be anywhere in the file.
+    The file is written under a temporary name and renamed, so concurrent
+    processes never map a partial file; the files it supersedes (same table,
+    variant and source) are then removed.
+
+    Returns:
+        str: Path of the cache file
+    """
+    path = path or source_path(table)
+    target = cache_path(table, path, conform, rule)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    start_time = time.time()
+    rows = 0
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, arrow_schema(table)) as writer:
+        if conform:
+            typed = pa.concat_tables(_typed_batches(table, path)).to_pandas()
+            kept, _ = conform_dimension(typed, table, rule)
+            writer.write_table(to_arrow_table(kept, table))
+            rows = len(kept)
+        else:
+            for batch in _typed_batches(table, path):
+                writer.write_table(batch)
+                rows += batch.num_rows
+    os.replace(tmp_path, target)
+    print(f"Cached {table} ({rows} rows) from {path} in {time.time() - start_time:.2f}s: {target}")
+    remove_superseded(f"{_cache_prefix(table, path, conform, rule)}_*.arrow", target)
+    return target
+
+def load_table(table, path=None, conform=False, rule=SURVIVORSHIP_RULE):
+    """
+    Load a table's typed data from the columnar cache, converting the source on first use
+
+    The cache file is memory-mapped, so the returned Arrow table references the
+    OS page cache rather than private memory: loading takes milliseconds and
+    every process mapping the same file shares its pages. Converting to pandas
+    makes a private copy; query the Arrow table directly (e.g. with DuckDB) to avoid it.
+
+    Args:
+        table (str): Orders, Customers or Products
+        path (str): Source CSV or Parquet file, or a directory of them (default: the table's file in data/)
+        conform (bool): Keep one row per key using the survivorship rule, as setup_database.py loads it
+        rule (str): Survivorship rule used when conform is True
+
+    Returns:
+        pyarrow.Table with the table's Snowflake column names and types
+    """
+    target = cache_path(table, path, conform, rule)
+    if not os.path.exists(target):
+        target = build_cache(table, path, conform, rule)
+    return map_file(target)
+
+def load_dataframe(table, path=None, conform=False, rule=SURVIVORSHIP_RULE):
+    """Load a table from the columnar cache as a pandas DataFrame (a private copy; see load_table)"""
+    return load_table(table, path, conform, rule).to_pandas()
+
+def clear_cache():
+    """Delete every cache file and the digest index"""
+    for path in glob.glob(os.path.join(CACHE_DIR, '*.arrow')) + [DIGEST_INDEX_PATH]:
+        if os.path.exists(path):
+            os.remove(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar cache and compare CSV parsing with memory-mapped loads")
+    parser.add_argument("path", nargs="?", help="Orders source file or directory (default data/superstore.csv)")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    table = load_table('Orders', args.path)
+    first_seconds = time.time() - start_time
+    del table
+    allocated_before = pa.total_allocated_bytes()
+    start_time = time.time()
+    table = load_table('Orders', args.path)
+    mapped_seconds = time.time() - start_time
+    print(f"Orders: {table.num_rows} rows, {table.nbytes / 1e6:.1f} MB mapped")
+    print(f"First load (hash + convert): {first_seconds:.3f}s")
+    print(f"Cached load (memory-mapped): {mapped_seconds * 1000:.1f} ms")
+    print(f"Private memory allocated by the cached load: {(pa.total_allocated_bytes() - allocated_before) / 1e6:.1f} MB")
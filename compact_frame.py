@@ -0,0 +1,187 @@
+import os
+import time
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from dotenv import load_dotenv
+from preprocess_data import DIMENSION_TABLES, SURVIVORSHIP_RULE
+from columnar_cache import load_table, load_dataframe, cache_path
+
+# Load environment variables
+load_dotenv()
+
+# Decimal places a float column must keep exactly to be stored as float32
+# (Superstore amounts have at most 4; DISCOUNT fits in float32, SALES and PROFIT do not)
+FLOAT32_DECIMALS = int(os.getenv('COMPACT_FLOAT32_DECIMALS', '4'))
+
+# Integer types tried in order for integer columns and date offsets
+NARROW_INTEGER_TYPES = (np.int8, np.int16, np.int32, np.int64)
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+def _narrowest_integer(values):
+    """Smallest integer type holding every value of a numpy integer array"""
+    if len(values) == 0:
+        return np.int8
+    low, high = values.min(), values.max()
+    return next(t for t in NARROW_INTEGER_TYPES if np.iinfo(t).min <= low and high <= np.iinfo(t).max)
+
+def _compact_strings(column):
+    """Dictionary-encode a string column as an ordered categorical with sorted categories"""
+    encoded = pc.dictionary_encode(column).combine_chunks()
+    # Arrow sorts strings several times faster than numpy sorts Python objects
+    order = pc.array_sort_indices(encoded.dictionary).to_numpy()
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    indices = encoded.indices.fill_null(-1).to_numpy()
+    codes = np.where(indices >= 0, rank[np.maximum(indices, 0)], -1)
+    categories = encoded.dictionary.take(pa.array(order)).to_numpy(zero_copy_only=False)
+    # from_codes stores the codes with the narrowest type the category count allows
+    return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories, ordered=True))
+
+def _compact_integers(column, nullable_name):
+    values = column.drop_null().to_numpy()
+    narrow = _narrowest_integer(values)
+    if column.null_count:
+        return pd.array(column.to_pandas(), dtype=nullable_name.format(bits=np.iinfo(narrow).bits))
+    return column.to_numpy().astype(narrow)
+
+def _compact_floats(column):
+    values = column.to_numpy(zero_copy_only=False).astype(np.float64)
+    narrow = values.astype(np.float32)
+    finite = np.isfinite(values)
+    if np.array_equal(np.round(narrow[finite].astype(np.float64), FLOAT32_DECIMALS), np.round(values[finite], FLOAT32_DECIMALS)):
+        return narrow
+    return values
+
+def compact_frame(table):
+    """
+    Convert an Arrow table to a compact pandas DataFrame
+
+    - strings become ordered categoricals with lexically sorted categories and
+      the narrowest integer codes, so comparisons, sorting and MIN/MAX still work
+    - integers use the narrowest type holding their range (nullable if they have nulls)
+    - floats become float32 when every value keeps FLOAT32_DECIMALS decimal places
+    - dates become int32 days since 1970-01-01; see decode_dates and encode_dates
+
+    Args:
+        table (pyarrow.Table): Typed table, e.g. from columnar_cache.load_table
+
+    Returns:
+        pandas.DataFrame with the same column names
+    """
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type) or pa.types.is_dictionary(column.type):
+            columns[name] = _compact_strings(column.cast(pa.string()) if pa.types.is_dictionary(column.type) else column)
+        elif pa.types.is_integer(column.type):
+            columns[name] = _compact_integers(column, 'Int{bits}')
+        elif pa.types.is_floating(column.type):
+            columns[name] = _compact_floats(column)
+        elif pa.types.is_date(column.type):
+            columns[name] = _compact_integers(column.cast(pa.date32()).cast(pa.int32()), 'Int{bits}') \
+                if column.null_count else column.cast(pa.date32()).cast(pa.int32()).to_numpy()
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns)
+
+def decode_dates(days):
+    """Convert int32 day offsets from a compact frame to datetime64[D] (null offsets become NaT)"""
+    values = pd.array(days, dtype='Int64')
+    result = EPOCH + values.to_numpy(dtype=np.int64, na_value=0).astype('timedelta64[D]')
+    result[values.isna()] = np.datetime64('NaT')
+    return result
+
+def encode_dates(value):
+    """Convert a date (or a list of dates) to the int day offsets used by compact frames"""
+    if isinstance(value, (list, tuple)):
+        return [encode_dates(v) for v in value]
+    return int((np.datetime64(value, 'D') - EPOCH).astype(np.int64))
+
+_compact_frames = {}
+_compact_frames_lock = threading.Lock()
+
+def load_compact(table, conform=None, rule=SURVIVORSHIP_RULE):
+    """
+    Load a table from the columnar cache as a compact DataFrame, once per process and source version
+
+    Args:
+        table (str): Orders, Customers or Products
+        conform (bool): Keep one row per key (default: True for dimension tables, as loaded into Snowflake)
+        rule (str): Survivorship rule used when conforming
+
+    Returns:
+        pandas.DataFrame from compact_frame; treat it as read-only since it is shared
+    """
+    conform = table in DIMENSION_TABLES if conform is None else conform
+    key = (table, conform, rule)
+    # The cache file name is a content hash, so a changed source is reloaded
+    source_key = cache_path(table, conform=conform, rule=rule)
+    with _compact_frames_lock:
+        if key not in _compact_frames or _compact_frames[key][0] != source_key:
+            _compact_frames[key] = (source_key, compact_frame(load_table(table, conform=conform, rule=rule)))
+        return _compact_frames[key][1]
+
+def memory_report(frame):
+    """
+    Per-column memory of a DataFrame, counting the Python string objects of object columns
+
+    Returns:
+        dict: columns (name -> dtype and bytes) and total_bytes
+    """
+    usage = frame.memory_usage(deep=True, index=False)
+    return {
+        "columns": {name: {"dtype": str(frame[name].dtype), "bytes": int(usage[name])} for name in frame.columns},
+        "total_bytes": int(usage.sum())
+    }
+
+# Group-bys timed by the benchmark: (keys, aggregations)
+BENCHMARK_GROUPBYS = [
+    (['CATEGORY'], {'SALES': 'sum'}),
+    (['REGION', 'CATEGORY', 'SUB_CATEGORY'], {'SALES': 'sum', 'PROFIT': 'sum', 'QUANTITY': 'sum'}),
+    (['STATE', 'SEGMENT'], {'DISCOUNT': 'mean', 'ORDER_ID': 'nunique'}),
+    (['PRODUCT_NAME'], {'SALES': 'sum'}),
+]
+
+def _best_seconds(function, repeats=3):
+    best = None
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start_time
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare memory and group-by speed of naive and compact Orders frames")
+    parser.add_argument("path", nargs="?", help="Orders source file or directory (default data/superstore.csv)")
+    args = parser.parse_args()
+
+    arrow_orders = load_table('Orders', args.path)
+    start_time = time.time()
+    naive = load_dataframe('Orders', args.path)
+    naive_seconds = time.time() - start_time
+    start_time = time.time()
+    compact = compact_frame(arrow_orders)
+    compact_seconds = time.time() - start_time
+
+    naive_report = memory_report(naive)
+    compact_report = memory_report(compact)
+    print(f"Orders: {len(naive)} rows, Arrow cache {arrow_orders.nbytes / 1e6:.1f} MB")
+    print(f"{'Column':<15} {'Naive dtype':<15} {'MB':>9}   {'Compact dtype':<25} {'MB':>9}")
+    for name in naive.columns:
+        before, after = naive_report["columns"][name], compact_report["columns"][name]
+        print(f"{name:<15} {before['dtype']:<15} {before['bytes'] / 1e6:>9.2f}   {after['dtype']:<25} {after['bytes'] / 1e6:>9.2f}")
+    print(f"{'Total':<15} {'':<15} {naive_report['total_bytes'] / 1e6:>9.2f}   {'':<25} {compact_report['total_bytes'] / 1e6:>9.2f}"
+          f"  ({naive_report['total_bytes'] / compact_report['total_bytes']:.1f}x smaller)")
+    print(f"Load: naive {naive_seconds:.2f}s, compact {compact_seconds:.2f}s")
+
+    print("\nGroup-by (best of 3):")
+    for keys, aggregations in BENCHMARK_GROUPBYS:
+        naive_time = _best_seconds(lambda: naive.groupby(keys, sort=False).agg(aggregations))
+        compact_time = _best_seconds(lambda: compact.groupby(keys, sort=False, observed=True).agg(aggregations))
+        print(f"{', '.join(keys)} -> {', '.join(f'{f}({c})' for c, f in aggregations.items())}: "
+              f"naive {naive_time * 1000:.1f} ms, compact {compact_time * 1000:.1f} ms ({naive_time / compact_time:.1f}x)")
@@ -2,17 +2,31 @@ import os
 import requests
 import json
 import os
+import time
+import datetime
+import threading
+from contextlib import nullcontext
 from dotenv import load_dotenv
 import snowflake.connector
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
 from generate_jwt_final import generate_jwt_token
+from snowflake_connection import SnowflakeConnectionPool
+from query_ledger import build_query_tag, execute_tagged, record_query
+from local_engine import DEFAULT_SQL_BACKEND, SQL_BACKENDS, run_sql
+from cancellation import CANCEL_POLL_SECONDS, RequestCancelled, cancelled_response
 
 # Load environment variables, overriding any existing system variables
 load_dotenv(override=True)
 
+# Re-sign the cached JWT once it is this close to expiring
+JWT_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+# Rows of a locally executed result sent back to the agent in place of a Snowflake query ID
+LOCAL_RESULT_ROW_LIMIT = 1000
+
 class CortexAgent:
-    def __init__(self, account=None, user=None, private_key_path=None, public_key_path=None, database=None, schema=None, timeout=300):
+    def __init__(self, account=None, user=None, private_key_path=None, public_key_path=None, database=None, schema=None, timeout=300, sql_backend=None):
         self.account = account if account else os.getenv('SNOWFLAKE_ACCOUNT')
         self.user = user if user else os.getenv('SNOWFLAKE_USER')
         self.private_key_path = private_key_path if private_key_path else os.getenv('SNOWFLAKE_PRIVATE_KEY_PATH', 'rsa_key.p8')
@@ -20,6 +34,11 @@ class CortexAgent:
         self.database = database if database else os.getenv('SNOWFLAKE_DATABASE', 'SUPERSTOREDB')
         self.schema = schema if schema else os.getenv('SNOWFLAKE_SCHEMA', 'DATA')
         self.timeout = timeout
+        # Where sql_exec queries run (snowflake or local); can be overridden per query
+        self.sql_backend = (sql_backend or DEFAULT_SQL_BACKEND).lower()
+        if self.sql_backend not in SQL_BACKENDS:
+            raise ValueError(f"Unknown SQL backend {self.sql_backend}; expected one of {SQL_BACKENDS}")
+        self.last_sql_execution = None
         self.snowflake_role = os.getenv('SNOWFLAKE_ROLE')
         self.snowflake_warehouse = os.getenv('SNOWFLAKE_WAREHOUSE')
         # self.api_key = os.getenv('CORTEX_API_KEY') # Removed: Token will be generated per request
@@ -39,6 +58,9 @@ class CortexAgent:
         self.conversation_id = None
         self.messages = []
         self.last_raw_response = []  # Store raw response chunks for debugging
+        # Key-pair connections for sql_exec are reused across questions
+        self.connection_pool = SnowflakeConnectionPool(max_size=2, connect_factory=self._get_snowflake_connection)
+        self._jwt_token_data = None
     
     def start_conversation(self):
         """
@@ -82,6 +104,25 @@ class CortexAgent:
             )
         return p_key
 
+    def get_jwt_token(self):
+        """
+        Return a signed JWT for the REST API, reusing the cached token until it nears expiry
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if self._jwt_token_data and self._jwt_token_data['payload']['exp'] - now > JWT_REFRESH_MARGIN:
+            return self._jwt_token_data
+        
+        jwt_token_data = generate_jwt_token(
+            snowflake_account=self.account,
+            user_name=self.user,
+            private_key_path=self.private_key_path,
+            public_key_path=self.public_key_path,
+            private_key_passphrase=os.getenv('SNOWFLAKE_PRIVATE_KEY_PASSPHRASE')
+        )
+        if jwt_token_data and 'token' in jwt_token_data:
+            self._jwt_token_data = jwt_token_data
+        return jwt_token_data
+
     def _get_snowflake_connection(self):
         """Establishes a connection to Snowflake using key-pair authentication."""
         private_key = self._load_private_key()
@@ -106,9 +147,107 @@ class CortexAgent:
             print(f"Snowflake connection failed: {e}")
             raise
 
-    def send_message(self, message, conversation_id=None):
+    def _post_stream(self, headers, payload, tag, submit_time, cancel_token=None):
+        """
+        POST to agent:run with streaming, returning once the response starts
+
+        With a cancel_token the request is made in a daemon thread so a cancel does
+        not wait for the agent to start responding; a response that arrives after
+        the cancel is closed by that thread, and the cancel is recorded in the ledger.
+
+        Raises:
+            RequestCancelled: If cancel_token is cancelled before the response starts
+        """
+        url = f"{self.base_url}/agent:run"
+        if cancel_token is None:
+            return requests.post(url, headers=headers, json=payload, stream=True, timeout=self.timeout)
+
+        cancel_token.raise_if_cancelled()
+        result = {}
+        started = threading.Event()
+
+        def post():
+            try:
+                result["response"] = requests.post(url, headers=headers, json=payload, stream=True, timeout=self.timeout)
+            except Exception as e:
+                result["error"] = e
+            started.set()
+            if cancel_token.cancelled and "response" in result:
+                result["response"].close()
+
+        threading.Thread(target=post, name="agent-request", daemon=True).start()
+        while not started.wait(CANCEL_POLL_SECONDS):
+            if cancel_token.cancelled:
+                record_query(tag, "POST agent:run", status="cancelled", error_message=cancel_token.reason,
+                             submit_time=submit_time, last_row_seconds=time.time() - submit_time)
+                raise RequestCancelled(cancel_token.reason)
+        if "error" in result:
+            raise result["error"]
+        return result["response"]
+
+    def _stream_lines(self, response, tag, submit_time, cancel_token=None):
+        """
+        Yield the lines of a streaming agent response, closing it when done or cancelled
+
+        Cancelling the token closes the response from the cancelling thread, which
+        unblocks the read and releases the connection. The request is recorded in
+        the query ledger with status success, error or cancelled.
+
+        Raises:
+            RequestCancelled: If cancel_token is cancelled before the stream ends
+        """
+        status, error_message, first_line_seconds = "error", None, None
+        try:
+            with response, cancel_token.on_cancel(response.close) if cancel_token is not None else nullcontext():
+                for line in response.iter_lines():
+                    if first_line_seconds is None:
+                        first_line_seconds = time.time() - submit_time
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    yield line
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            status = "success"
+        except GeneratorExit:
+            # The caller stopped reading (DONE signal or a sql_exec tool_use)
+            status = "success"
+            raise
+        except RequestCancelled as e:
+            status, error_message = "cancelled", str(e)
+            raise
+        except Exception as e:
+            # Closing the response mid-read surfaces as a connection error
+            if cancel_token is not None and cancel_token.cancelled:
+                status, error_message = "cancelled", cancel_token.reason
+                raise RequestCancelled(cancel_token.reason) from e
+            error_message = str(e)
+            raise
+        finally:
+            record_query(tag, "POST agent:run", status=status, error_message=error_message,
+                         submit_time=submit_time, first_row_seconds=first_line_seconds,
+                         last_row_seconds=time.time() - submit_time)
+
+    def _discard_unanswered_turn(self):
+        """
+        Drop the last question and everything after it, so a cancelled turn leaves
+        no unanswered question or tool call in the conversation
+        """
+        while len(self.messages) > 1:
+            message = self.messages.pop()
+            if message["role"] == "user" and any(item.get("type") == "text" for item in message["content"]):
+                break
+
+    def send_message(self, message, conversation_id=None, cancel_token=None):
         """
         Send a message to the Cortex Agent
+
+        Args:
+            message (str): The user's question
+            conversation_id (str): Conversation to continue (default the current one)
+            cancel_token (CancelToken): Aborts the request and its response stream when cancelled
+
+        Returns:
+            dict: status complete, pending_sql_execution, cancelled or error, with assistant_response
         """
         if not conversation_id and not self.conversation_id:
             conversation_id = self.start_conversation()
@@ -143,13 +282,7 @@ class CortexAgent:
                 }
             ]
 
-        jwt_token_data = generate_jwt_token(
-            snowflake_account=self.account,
-            user_name=self.user,
-            private_key_path=self.private_key_path,
-            public_key_path=self.public_key_path,
-            private_key_passphrase=os.getenv('SNOWFLAKE_PRIVATE_KEY_PASSPHRASE')
-        )
+        jwt_token_data = self.get_jwt_token()
         if not jwt_token_data or 'token' not in jwt_token_data:
             print("ERROR: CortexAgent - Failed to generate JWT token. Check generate_jwt_final.py and RSA keys.")
             return None
@@ -233,13 +366,9 @@ class CortexAgent:
             print("DEBUG_API_REQUEST: Payload structure:")
             print(json.dumps(debug_payload, indent=2))
             
-            response = requests.post(
-                f"{self.base_url}/agent:run",
-                headers=headers, 
-                json=payload,
-                stream=True,
-                timeout=self.timeout  
-            )
+            tag = build_query_tag("chat_agent_run", conversation_id, message)
+            submit_time = time.time()
+            response = self._post_stream(headers, payload, tag, submit_time, cancel_token)
             print(f"CortexAgent: POST request completed. Status: {response.status_code if response else 'No response object'}")
             response.raise_for_status()
             
@@ -254,7 +383,7 @@ class CortexAgent:
             current_assistant_message_content_parts = []
             assistant_response_text = ""
             
-            for line in response.iter_lines():
+            for line in self._stream_lines(response, tag, submit_time, cancel_token):
                 if line:
                     decoded_line = line.decode('utf-8')
                     if decoded_line.startswith('data:'):
@@ -295,6 +424,10 @@ class CortexAgent:
 
             return {"status": "complete", "assistant_response": assistant_response_text}
 
+        except RequestCancelled:
+            print("CortexAgent: Request cancelled.")
+            self._discard_unanswered_turn()
+            return cancelled_response(cancel_token)
         except requests.exceptions.RequestException as e:
             print(f"Request failed: {e}")
             return {"status": "error", "assistant_response": "", "error_message": str(e)}
@@ -304,27 +437,85 @@ class CortexAgent:
             traceback.print_exc()
             return {"status": "error", "assistant_response": "", "error_message": str(e)}
 
-    def execute_sql_and_get_answer(self, sql_query_to_execute, tool_use_id_for_sql_exec):
-        print(f"Executing SQL: {sql_query_to_execute}")
-        query_id = None
-        try:
-            conn = self._get_snowflake_connection()
+    def _last_user_question(self):
+        """Return the text of the most recent user question in the conversation"""
+        for message in reversed(self.messages):
+            if message["role"] != "user":
+                continue
+            for content_item in message["content"]:
+                if content_item.get("type") == "text":
+                    return content_item["text"]
+        return None
+
+    def _execute_sql(self, sql_query_to_execute, sql_backend, cancel_token=None):
+        """
+        Run the agent's SQL on the chosen backend and return the tool result to send back
+
+        On Snowflake the agent reads the result by query ID. A query answered by the
+        local engine has no query ID, so its rows are sent instead. Local SQL the
+        engine cannot run falls back to Snowflake. A cancelled token stops the
+        statement (by query ID on Snowflake) and raises RequestCancelled.
+
+        Returns:
+            dict: The tool result payload
+        """
+        tag = build_query_tag("chat_sql_exec", self.conversation_id, self._last_user_question())
+        self.last_sql_execution = {"backend": sql_backend, "seconds": None, "fallback_reason": None}
+        start_time = datetime.datetime.now()
+        if sql_backend == "local":
+            try:
+                executed = run_sql(sql_query_to_execute, backend="local", tag=tag, fallback=False, cancel_token=cancel_token)
+            except RequestCancelled:
+                raise
+            except Exception as e:
+                self.last_sql_execution["fallback_reason"] = str(e).splitlines()[0]
+                print(f"Local engine cannot run this query, falling back to Snowflake: {self.last_sql_execution['fallback_reason']}")
+            else:
+                data = executed["data"]
+                self.last_sql_execution["seconds"] = executed["seconds"]
+                print(f"SQL executed locally in {executed['seconds'] * 1000:.1f} ms ({len(data)} rows)")
+                return {
+                    "columns": list(data.columns),
+                    "data": json.loads(data.head(LOCAL_RESULT_ROW_LIMIT).to_json(orient="values", date_format="iso")),
+                    "row_count": len(data)
+                }
+
+        with self.connection_pool.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(sql_query_to_execute)
+            execute_tagged(cursor, sql_query_to_execute, tag, cancel_token=cancel_token)
             query_id = cursor.sfqid
             print(f"SQL executed successfully. Query ID: {query_id}")
             # We don't fetch results here, agent uses query_id to formulate response
             cursor.close()
-            conn.close()
+        self.last_sql_execution.update(backend="snowflake", seconds=(datetime.datetime.now() - start_time).total_seconds())
+        if not query_id:
+            raise RuntimeError("Failed to get Query ID from SQL execution.")
+        return {"query_id": str(query_id)}
+
+    def execute_sql_and_get_answer(self, sql_query_to_execute, tool_use_id_for_sql_exec, sql_backend=None, cancel_token=None):
+        """
+        Execute the SQL the agent asked for and send the result back for the final answer
+
+        Args:
+            sql_query_to_execute (str): SQL from the sql_exec tool_use
+            tool_use_id_for_sql_exec (str): ID of that tool_use
+            sql_backend (str): snowflake or local for this query (default self.sql_backend)
+            cancel_token (CancelToken): Cancels the running statement or aborts the follow-up stream
+        """
+        sql_backend = (sql_backend or self.sql_backend).lower()
+        print(f"Executing SQL ({sql_backend}): {sql_query_to_execute}")
+        try:
+            tool_result = self._execute_sql(sql_query_to_execute, sql_backend, cancel_token)
+        except RequestCancelled:
+            print("SQL execution cancelled.")
+            self._discard_unanswered_turn()
+            return cancelled_response(cancel_token)
         except Exception as e:
             print(f"Error executing SQL: {e}")
             import traceback
             traceback.print_exc()
             return {"status": "error", "assistant_response": "", "error_message": f"SQL execution failed: {e}"}
 
-        if not query_id:
-            return {"status": "error", "assistant_response": "", "error_message": "Failed to get Query ID from SQL execution."}
-
         # Construct the tool_results message for the user role
         tool_results_message = {
             "role": "user",
@@ -333,31 +524,21 @@ class CortexAgent:
                     "type": "tool_results",
                     "tool_results": {
                         "tool_use_id": tool_use_id_for_sql_exec,
-                        "result": { # As per Snowflake documentation for providing query_id
-                            "query_id": str(query_id) 
-                        }
-                        # Optionally, can add "status": "success" or actual data if small and needed by agent
-                        # For now, sticking to query_id as per docs for agent to formulate answer.
+                        # Snowflake: the query_id, as per Snowflake documentation; local: the result rows
+                        "result": tool_result
                     }
                 }
             ]
         }
         self.messages.append(tool_results_message)
 
-        print("Sending SQL execution results (Query ID) back to Cortex Agent...")
+        print("Sending SQL execution results back to Cortex Agent...")
         # Make the second POST request to the agent
         # This is similar to send_message but uses the updated self.messages
         # And the response should be the final textual answer
 
-        # Generate a new JWT token for this request
-        # The user, account, private_key_path, public_key_path are already attributes of self
-        jwt_token_data = generate_jwt_token(
-            snowflake_account=self.account,
-            user_name=self.user,
-            private_key_path=self.private_key_path,
-            public_key_path=self.public_key_path,
-            private_key_passphrase=os.getenv('SNOWFLAKE_PRIVATE_KEY_PASSPHRASE')
-        )
+        # Reuse the cached JWT token (re-signed only when close to expiry)
+        jwt_token_data = self.get_jwt_token()
         if not jwt_token_data or 'token' not in jwt_token_data:
             print("ERROR: Failed to generate JWT token for the second request.")
             return {"status": "error", "assistant_response": "", "error_message": "JWT generation failed for follow-up."}
@@ -402,13 +583,9 @@ class CortexAgent:
             print("DEBUG_API_REQUEST: Follow-up Headers:")
             print(json.dumps(debug_headers, indent=2))
             
-            response = requests.post(
-                f"{self.base_url}/agent:run",
-                headers=headers,
-                json=payload,
-                stream=True,
-                timeout=self.timeout
-            )
+            tag = build_query_tag("chat_agent_run", self.conversation_id, self._last_user_question())
+            submit_time = time.time()
+            response = self._post_stream(headers, payload, tag, submit_time, cancel_token)
             print(f"CortexAgent: FOLLOW-UP POST request completed. Status: {response.status_code if response else 'No response object'}")
             response.raise_for_status()
 
@@ -420,7 +597,7 @@ class CortexAgent:
             final_assistant_text = ""
             chunk_data = {}
             
-            for line in response.iter_lines():
+            for line in self._stream_lines(response, tag, submit_time, cancel_token):
                 if line:
                     decoded_line = line.decode('utf-8')
                     if decoded_line.startswith('data:'):
@@ -481,6 +658,10 @@ class CortexAgent:
 
             return {"status": "complete", "assistant_response": final_assistant_text}
 
+        except RequestCancelled:
+            print("CortexAgent: Follow-up request cancelled.")
+            self._discard_unanswered_turn()
+            return cancelled_response(cancel_token)
         except requests.exceptions.RequestException as e:
             print(f"Follow-up request failed: {e}")
             return {"status": "error", "assistant_response": "", "error_message": str(e)}
@@ -530,11 +711,16 @@ def test_cortex_agent():
         public_key_path=os.getenv('SNOWFLAKE_PUBLIC_KEY_PATH', 'rsa_key.pub'),
         database=os.getenv('SNOWFLAKE_DATABASE', 'SUPERSTOREDB'),
         schema=os.getenv('SNOWFLAKE_SCHEMA', 'DATA')
-        
-        # Example usage
-        message = "What is the top selling category?"
-        print(f"Sending message: '{message}'")
-        response = agent.send_message(message)
+    )
+    
+    # Example usage
+    message = "What is the top selling category?"
+    print(f"Sending message: '{message}'")
+    initial_call_response = agent.send_message(message)
+    
+    if initial_call_response.get("status") == "pending_sql_execution":
+        sql_to_execute = initial_call_response["sql_query"]
+        sql_tool_use_id = initial_call_response["tool_use_id"]
         print(f"SQL to execute: {sql_to_execute}")
         print(f"SQL Tool Use ID: {sql_tool_use_id}")
         
@@ -0,0 +1,229 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from load_manifest import data_version, text_sha256
+from preprocess_data import DIMENSION_TABLES, TABLE_SCHEMAS
+from columnar_cache import cache_path
+from question_router import answer_question, normalize_question, record_cached_answer
+from semantic_query import clear_frames
+from local_engine import reset_local_engine
+from olap_cube import reset_cube
+
+# Load environment variables
+load_dotenv()
+
+# Example questions offered by the Query Builder, by query type
+EXAMPLE_QUERIES = {
+    "Sales Analysis": [
+        "Show me the top 5 products by sales",
+        "What is the total profit by region?",
+        "Which category has the highest discount rate?"
+    ],
+    "Customer Information": [
+        "List all Gold tier customers",
+        "Which customer has spent the most?",
+        "Show me customers managed by Jason Gonzalez"
+    ],
+    "Product Details": [
+        "Which products have an 'A' sustainability rating?",
+        "List all products made of Glass",
+        "What's the average warranty period for Office Supplies?"
+    ],
+}
+
+# Seconds between checks for a new data version (0 computes the answers once)
+PREWARM_POLL_SECONDS = float(os.getenv('PREWARM_POLL_SECONDS', '30'))
+
+_cache_lock = threading.Lock()
+_cache = {}           # normalized question -> {"response", "version", "computed_time", "cold_seconds"}
+_stats = {"warm_hits": 0, "warm_seconds": 0.0, "misses": 0, "cold_answers": 0, "cold_seconds": 0.0,
+          "last_refresh_time": None, "refreshing": False}
+_refresh_requested = threading.Event()
+_prewarm_thread = None
+
+def answers_version():
+    """
+    Token that changes when the data behind any example answer changes: a warehouse
+    reload (load_manifest.data_version) or a local source file in data/
+    """
+    local_sources = [os.path.basename(cache_path(table, conform=table in DIMENSION_TABLES)) for table in TABLE_SCHEMAS]
+    return text_sha256(data_version(), *local_sources)[:16]
+
+def compute_answer(question, agent=None, conversation_id=None):
+    """
+    Answer a question the way the app does: the template router first, then the agent
+
+    The answer is not counted in the router's hit rate; get_cached_answer counts it
+    each time it is served.
+
+    Args:
+        question (str): Question to answer
+        agent (CortexAgent): Agent for questions no template answers; pass one the UI is not using
+        conversation_id (str): Agent conversation to ask in (default: a new one)
+
+    Returns:
+        dict: Response as from question_router.answer_question, or None if the question needs
+              the agent and none was given
+    """
+    if agent is not None and conversation_id is None:
+        conversation_id = agent.start_conversation()
+    response = answer_question(question, agent=agent, conversation_id=conversation_id, record_stats=False)
+    if response and response.get("status") == "pending_sql_execution":
+        response = dict(agent.execute_sql_and_get_answer(response["sql_query"], response["tool_use_id"]), routed=False)
+    return response
+
+def refresh_examples(agent=None, questions=None, force=False):
+    """
+    Compute the answers that are missing or were computed for an older data version
+
+    Args:
+        agent (CortexAgent): Agent for examples the router does not answer (skipped if None)
+        questions (list): Questions to keep warm (default every EXAMPLE_QUERIES entry)
+        force (bool): Recompute every answer even if it is current
+
+    Returns:
+        int: Number of answers computed
+    """
+    questions = questions or [question for group in EXAMPLE_QUERIES.values() for question in group]
+    version = answers_version()
+    with _cache_lock:
+        stale = [q for q in questions if force or _cache.get(normalize_question(q), {}).get("version") != version]
+        if stale and any(entry["version"] != version for entry in _cache.values()):
+            # Data changed: reload the local frames, engine and cube before recomputing
+            clear_frames()
+            reset_local_engine()
+            reset_cube()
+        _stats["refreshing"] = bool(stale)
+
+    computed = 0
+    # Examples the router does not answer share one agent conversation per refresh
+    conversation_id = agent.start_conversation() if agent is not None and stale else None
+    for question in stale:
+        start_time = time.perf_counter()
+        try:
+            response = compute_answer(question, agent, conversation_id)
+        except Exception as e:
+            print(f"Error pre-computing '{question}': {e}")
+            continue
+        seconds = time.perf_counter() - start_time
+        if not response or response.get("status") != "complete":
+            continue
+        with _cache_lock:
+            # Each answer is replaced as soon as it is ready, without waiting for the rest
+            _cache[normalize_question(question)] = {"response": response, "version": version,
+                                                    "computed_time": time.time(), "cold_seconds": seconds}
+            _stats["cold_answers"] += 1
+            _stats["cold_seconds"] += seconds
+        computed += 1
+
+    with _cache_lock:
+        _stats["refreshing"] = False
+        _stats["last_refresh_time"] = time.time()
+    if computed:
+        print(f"Pre-computed {computed} example answers for data version {version}")
+    return computed
+
+def get_cached_answer(question):
+    """
+    Return the pre-computed answer to a question if it is current, without blocking
+
+    A stale answer (computed before the data changed) is not served; the background
+    worker is asked to refresh it instead. A served answer counts in router_stats().
+
+    Returns:
+        dict: The cached response with cached=True and cached_ms, or None
+    """
+    start_time = time.perf_counter()
+    version = answers_version()
+    with _cache_lock:
+        entry = _cache.get(normalize_question(question))
+        if entry is None or entry["version"] != version:
+            _stats["misses"] += 1
+            if entry is not None:
+                _refresh_requested.set()
+            return None
+        seconds = time.perf_counter() - start_time
+        _stats["warm_hits"] += 1
+        _stats["warm_seconds"] += seconds
+        response = entry["response"]
+    record_cached_answer(response, seconds)
+    return dict(response, cached=True, cached_ms=seconds * 1000)
+
+def record_cold_answer(seconds):
+    """Record the latency of an answer the UI had to compute itself, to compare with warm hits"""
+    with _cache_lock:
+        _stats["cold_answers"] += 1
+        _stats["cold_seconds"] += seconds
+
+def example_cache_stats():
+    """
+    Return warm-hit and cold latency and cache freshness for display
+
+    Returns:
+        dict: entries, current (entries for the current data version), warm_hits, misses,
+              avg_warm_ms, avg_cold_ms, last_refresh_time and refreshing
+    """
+    version = answers_version()
+    with _cache_lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_cache)
+        stats["current"] = sum(entry["version"] == version for entry in _cache.values())
+    stats["avg_warm_ms"] = stats.pop("warm_seconds") * 1000 / stats["warm_hits"] if stats["warm_hits"] else None
+    stats["avg_cold_ms"] = stats.pop("cold_seconds") * 1000 / stats["cold_answers"] if stats["cold_answers"] else None
+    return stats
+
+def _prewarm_loop(agent_factory, poll_seconds):
+    agent = None
+    if agent_factory:
+        try:
+            agent = agent_factory()
+        except Exception as e:
+            # Examples the router answers are still pre-computed
+            print(f"Example pre-warm has no agent: {e}")
+    while True:
+        try:
+            refresh_examples(agent)
+        except Exception as e:
+            print(f"Example pre-warm failed: {e}")
+        if not poll_seconds:
+            return
+        _refresh_requested.wait(poll_seconds)
+        _refresh_requested.clear()
+
+def start_example_prewarm(agent_factory=None, poll_seconds=None):
+    """
+    Compute the example answers in a daemon thread, then keep them current
+
+    The thread re-checks the data version every poll_seconds, or sooner when a
+    stale answer is requested, and recomputes only the stale answers; the UI keeps
+    serving current answers meanwhile. Only one thread runs per process.
+
+    Args:
+        agent_factory (callable): Returns a CortexAgent for examples the router does not
+                                  answer; the thread uses its own so it never touches the UI's conversation
+        poll_seconds (float): Seconds between data version checks (default PREWARM_POLL_SECONDS)
+
+    Returns:
+        threading.Thread: The running pre-warm thread
+    """
+    global _prewarm_thread
+    poll_seconds = PREWARM_POLL_SECONDS if poll_seconds is None else poll_seconds
+    with _cache_lock:
+        if _prewarm_thread is None or not _prewarm_thread.is_alive():
+            _prewarm_thread = threading.Thread(
+                target=_prewarm_loop,
+                args=(agent_factory, poll_seconds),
+                name="example-prewarm",
+                daemon=True
+            )
+            _prewarm_thread.start()
+        return _prewarm_thread
+
+if __name__ == "__main__":
+    refresh_examples()
+    for group in EXAMPLE_QUERIES.values():
+        for question in group:
+            cached = get_cached_answer(question)
+            print(f"{question}: {'%.3f ms' % cached['cached_ms'] if cached else 'not cached (needs the agent)'}")
+    print(example_cache_stats())
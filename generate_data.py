@@ -0,0 +1,476 @@
+import os
+import time
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from preprocess_data import TABLE_SCHEMAS, DATA_DIR, PARQUET_COMPRESSION, arrow_schema
+from columnar_cache import load_dataframe
+
+# Default location of generated datasets
+SYNTHETIC_DIR = os.path.join(DATA_DIR, 'synthetic')
+
+# Order lines generated (and written) per chunk; bounds memory independently of the total
+DEFAULT_CHUNK_ROWS = int(os.getenv('GENERATOR_CHUNK_ROWS', '2000000'))
+
+# Independent random streams per entity, so chunk i is identical whatever is generated around it
+STREAM_CUSTOMERS = 1
+STREAM_PRODUCTS = 2
+STREAM_ORDERS = 3
+
+def _probabilities(counts):
+    counts = np.asarray(counts, dtype=np.float64)
+    return counts / counts.sum()
+
+def _conditional_cdf(groups, values, n_groups, n_values, fallback=None):
+    """
+    Build a per-group cumulative distribution over value codes
+
+    Groups without observations use the fallback distribution (or the marginal).
+    """
+    counts = np.zeros((n_groups, n_values), dtype=np.float64)
+    np.add.at(counts, (groups, values), 1)
+    if fallback is None:
+        fallback = counts.sum(axis=0)
+    empty = counts.sum(axis=1) == 0
+    counts[empty] = fallback
+    return np.cumsum(counts / counts.sum(axis=1, keepdims=True), axis=1)
+
+def _sample_conditional(rng, cdf, groups):
+    """Draw one value code per row from the row's group distribution in a single vectorized pass"""
+    u = rng.random(len(groups))
+    codes = (u[:, None] > cdf[groups]).sum(axis=1)
+    return np.minimum(codes, cdf.shape[1] - 1)
+
+def _codes(values):
+    """Return (unique values, integer code per row)"""
+    uniques, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return uniques, codes
+
+def learn_distributions(orders=None, customers=None, products=None):
+    """
+    Learn the distributions the generator samples from
+
+    Everything is derived from the sample data in data/: the product catalog and
+    its popularity, the geography mix, order sizes, ship modes and delays, date
+    seasonality and year-over-year growth, discounts per region and sub-category,
+    and a per-sub-category linear model of profit margin against discount.
+
+    Args:
+        orders (DataFrame): Typed Orders (default load_dataframe('Orders'))
+        customers (DataFrame): Typed Customers (default load_dataframe('Customers'))
+        products (DataFrame): Typed Products (default load_dataframe('Products'))
+
+    Returns:
+        dict: Arrays and lookup tables consumed by the generate_* functions
+    """
+    orders = load_dataframe('Orders') if orders is None else orders
+    customers = load_dataframe('Customers') if customers is None else customers
+    products = load_dataframe('Products') if products is None else products
+    model = {}
+
+    # Customers: identity, segment and how many orders each one places
+    first_lines = orders.drop_duplicates('CUSTOMER_ID').sort_values('CUSTOMER_ID')
+    model["customer_ids"] = first_lines['CUSTOMER_ID'].to_numpy(dtype=object)
+    model["customer_names"] = first_lines['CUSTOMER_NAME'].to_numpy(dtype=object)
+    model["segments"], model["customer_segment"] = _codes(first_lines['SEGMENT'])
+    model["segment_p"] = _probabilities(np.bincount(model["customer_segment"]))
+    orders_per_customer = orders.groupby('CUSTOMER_ID')['ORDER_ID'].nunique()
+    model["customer_activity"] = orders_per_customer.reindex(model["customer_ids"]).to_numpy(dtype=np.float64)
+    name_parts = first_lines['CUSTOMER_NAME'].str.split(' ', n=1, expand=True)
+    model["first_names"] = name_parts[0].unique().astype(object)
+    model["last_names"] = name_parts[1].fillna(name_parts[0]).unique().astype(object)
+
+    # Product catalog, with the unit price and popularity of each product
+    catalog = orders.drop_duplicates('PRODUCT_ID').sort_values('PRODUCT_ID')
+    model["product_ids"] = catalog['PRODUCT_ID'].to_numpy(dtype=object)
+    model["product_names"] = catalog['PRODUCT_NAME'].to_numpy(dtype=object)
+    model["sub_categories"], model["product_sub_category"] = _codes(catalog['SUB_CATEGORY'])
+    sub_to_category = dict(zip(catalog['SUB_CATEGORY'], catalog['CATEGORY']))
+    model["sub_category_category"] = np.array([sub_to_category[s] for s in model["sub_categories"]], dtype=object)
+    model["sub_category_prefix"] = np.array(
+        [catalog.loc[catalog['SUB_CATEGORY'] == s, 'PRODUCT_ID'].iloc[0][:6] for s in model["sub_categories"]],
+        dtype=object
+    )
+    unit_price = orders['SALES'] / (orders['QUANTITY'] * (1 - orders['DISCOUNT']))
+    model["product_price"] = unit_price.groupby(orders['PRODUCT_ID']).median().reindex(model["product_ids"]).to_numpy(dtype=np.float64)
+    model["product_popularity"] = orders['PRODUCT_ID'].value_counts().reindex(model["product_ids"]).to_numpy(dtype=np.float64)
+    model["sub_category_p"] = _probabilities(np.bincount(model["product_sub_category"], minlength=len(model["sub_categories"])))
+
+    # Geography: observed (city, state, postal code, region) combinations and their frequency
+    places = orders.groupby(['CITY', 'STATE', 'POSTAL_CODE', 'REGION']).size().reset_index(name='lines')
+    model["place_city"] = places['CITY'].to_numpy(dtype=object)
+    model["place_state"] = places['STATE'].to_numpy(dtype=object)
+    model["place_postal_code"] = places['POSTAL_CODE'].to_numpy(dtype=object)
+    model["regions"], model["place_region"] = _codes(places['REGION'])
+    model["place_p"] = _probabilities(places['lines'])
+
+    # Order shape: lines per order, ID prefix, ship mode and ship delay per mode
+    lines_per_order = orders.groupby('ORDER_ID').size()
+    model["order_sizes"] = np.arange(1, lines_per_order.max() + 1)
+    model["order_size_p"] = _probabilities(np.bincount(lines_per_order, minlength=lines_per_order.max() + 1)[1:])
+    per_order = orders.drop_duplicates('ORDER_ID')
+    model["order_prefixes"], prefix_codes = _codes(per_order['ORDER_ID'].str[:2])
+    model["order_prefix_p"] = _probabilities(np.bincount(prefix_codes))
+    model["ship_modes"], mode_codes = _codes(per_order['SHIP_MODE'])
+    model["ship_mode_p"] = _probabilities(np.bincount(mode_codes))
+    delays = (np.asarray(per_order['SHIP_DATE'], dtype='datetime64[D]')
+              - np.asarray(per_order['ORDER_DATE'], dtype='datetime64[D]')).astype(np.int64)
+    model["ship_delay_cdf"] = _conditional_cdf(mode_codes, delays, len(model["ship_modes"]), delays.max() + 1)
+
+    # Dates: month seasonality, day-of-week mix and year-over-year growth
+    order_dates = np.asarray(per_order['ORDER_DATE'], dtype='datetime64[D]')
+    years = order_dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = order_dates.astype('datetime64[M]').astype(np.int64) % 12
+    model["month_p"] = _probabilities(np.bincount(months, minlength=12))
+    model["weekday_p"] = _probabilities(np.bincount((order_dates.astype(np.int64) + 3) % 7, minlength=7))
+    year_counts = np.bincount(years - years.min())
+    model["first_year"], model["last_year"] = int(years.min()), int(years.max())
+    model["yearly_growth"] = float((year_counts[-1] / year_counts[0]) ** (1 / max(len(year_counts) - 1, 1)))
+
+    # Quantity and discount; discount levels depend on region and sub-category
+    model["quantities"], quantity_codes = np.unique(orders['QUANTITY'].to_numpy(dtype=np.int64), return_inverse=True)
+    model["quantity_p"] = _probabilities(np.bincount(quantity_codes))
+    model["discounts"], discount_codes = np.unique(orders['DISCOUNT'].to_numpy(dtype=np.float64), return_inverse=True)
+    line_sub = np.searchsorted(model["sub_categories"], orders['SUB_CATEGORY'].to_numpy(dtype=str))
+    line_region = np.searchsorted(model["regions"], orders['REGION'].to_numpy(dtype=str))
+    n_sub = len(model["sub_categories"])
+    model["discount_cdf"] = _conditional_cdf(line_region * n_sub + line_sub, discount_codes,
+                                             len(model["regions"]) * n_sub, len(model["discounts"]))
+
+    # Profit: margin = intercept + slope * discount per sub-category, plus an empirical residual
+    margin = (orders['PROFIT'] / orders['SALES']).to_numpy(dtype=np.float64)
+    discount = orders['DISCOUNT'].to_numpy(dtype=np.float64)
+    model["margin_coef"] = np.zeros((n_sub, 2))
+    residuals = []
+    for s in range(n_sub):
+        mask = line_sub == s
+        design = np.column_stack([np.ones(mask.sum()), discount[mask]])
+        model["margin_coef"][s] = np.linalg.lstsq(design, margin[mask], rcond=None)[0]
+        residuals.append(margin[mask] - design @ model["margin_coef"][s])
+    model["residual_count"] = np.array([len(r) for r in residuals])
+    model["residual_offset"] = np.concatenate([[0], np.cumsum(model["residual_count"])[:-1]])
+    model["residuals"] = np.concatenate(residuals)
+
+    # CRM and product attributes are sampled as whole source rows to keep their correlations
+    model["crm_since"] = np.asarray(customers['CUSTOMER_SINCE'], dtype='datetime64[D]')
+    model["crm_tier"] = customers['CUSTOMER_TIER'].to_numpy(dtype=object)
+    model["crm_account_manager"] = customers['ACCOUNT_MANAGER'].to_numpy(dtype=object)
+    model["crm_email_domain"] = customers['EMAIL'].str.split('@').str[-1].to_numpy(dtype=object)
+    model["product_brand"] = products['BRAND'].to_numpy(dtype=object)
+    model["product_warranty"] = products['WARRANTY_YEARS'].to_numpy(dtype=np.int64)
+    model["product_material"] = products['MATERIAL'].to_numpy(dtype=object)
+    model["product_release"] = np.asarray(products['RELEASE_DATE'], dtype='datetime64[D]')
+    model["product_rating"] = products['SUSTAINABILITY_RATING'].to_numpy(dtype=object)
+    return model
+
+def _take(values, indices):
+    """Vectorized string lookup: values[indices] as an Arrow string array"""
+    return pa.array(values, type=pa.string()).take(pa.array(indices))
+
+def _join(*parts, separator=''):
+    return pc.binary_join_element_wise(*parts, separator)
+
+def _number_strings(numbers, width=0):
+    strings = pc.cast(pa.array(numbers), pa.string())
+    return pc.utf8_lpad(strings, width=width, padding='0') if width else strings
+
+def generate_customers(model, count, seed=0):
+    """
+    Generate the customer dimension
+
+    The sample customers come first, unchanged, so small datasets look like the
+    sample. Additional customers get new IDs and names combined from sample first
+    and last names. The result also carries each customer's name, segment and
+    ordering activity, used when generating orders.
+
+    Returns:
+        dict: table (Arrow table with the Customers schema) plus name, segment and activity arrays
+    """
+    rng = np.random.default_rng([seed, STREAM_CUSTOMERS])
+    n_source = len(model["customer_ids"])
+    n_source_used = min(count, n_source)
+    n_extra = count - n_source_used
+
+    first = rng.integers(0, len(model["first_names"]), n_extra)
+    last = rng.integers(0, len(model["last_names"]), n_extra)
+    extra_first = _take(model["first_names"], first)
+    extra_last = _take(model["last_names"], last)
+    initials = _join(pc.utf8_slice_codeunits(extra_first, 0, 1), pc.utf8_slice_codeunits(extra_last, 0, 1))
+    extra_ids = _join(initials, _number_strings(np.arange(n_extra) + 100000), separator='-')
+
+    ids = pa.concat_arrays([pa.array(model["customer_ids"][:n_source_used], type=pa.string()), extra_ids])
+    names = pa.concat_arrays([
+        pa.array(model["customer_names"][:n_source_used], type=pa.string()),
+        _join(extra_first, extra_last, separator=' ')
+    ])
+    segment = np.concatenate([model["customer_segment"][:n_source_used],
+                              rng.choice(len(model["segments"]), n_extra, p=model["segment_p"])])
+    activity = np.concatenate([model["customer_activity"][:n_source_used],
+                               rng.choice(model["customer_activity"], n_extra)])
+
+    crm_row = rng.integers(0, len(model["crm_tier"]), count)
+    email_user = pc.utf8_lower(pc.replace_substring(names, ' ', '.'))
+    emails = _join(email_user, _number_strings(rng.integers(1, 100, count)), separator='')
+    emails = _join(emails, _take(model["crm_email_domain"], rng.integers(0, len(model["crm_email_domain"]), count)), separator='@')
+    phone_parts = [_number_strings(rng.integers(low, high, count), width) for low, high, width in
+                   ((200, 1000, 3), (200, 1000, 3), (0, 10000, 4))]
+    table = pa.Table.from_arrays([
+        ids,
+        pa.array(model["crm_since"][crm_row]).cast(pa.date32()),
+        emails,
+        _join(*phone_parts, separator='-'),
+        _take(model["crm_tier"], crm_row),
+        _take(model["crm_account_manager"], crm_row),
+    ], schema=arrow_schema('Customers'))
+    return {"table": table, "names": names, "segment": segment, "activity": activity}
+
+def generate_products(model, count, seed=0):
+    """
+    Generate the product dimension
+
+    The sample catalog comes first; additional products are drawn per
+    sub-category with the sub-category mix of the sample, reuse a sample name
+    from that sub-category with a model suffix, and get a price near a sample
+    product of the same sub-category.
+
+    Returns:
+        dict: table (Arrow table with the Products schema) plus name, sub-category, price and popularity arrays
+    """
+    rng = np.random.default_rng([seed, STREAM_PRODUCTS])
+    n_source = len(model["product_ids"])
+    n_source_used = min(count, n_source)
+    n_extra = count - n_source_used
+
+    sub_category = rng.choice(len(model["sub_categories"]), n_extra, p=model["sub_category_p"])
+    # Template product from the same sub-category: the k-th product of that sub-category, k random
+    by_sub = np.argsort(model["product_sub_category"], kind='stable')
+    sub_start = np.searchsorted(model["product_sub_category"][by_sub], np.arange(len(model["sub_categories"])))
+    sub_count = np.bincount(model["product_sub_category"], minlength=len(model["sub_categories"]))
+    template = by_sub[sub_start[sub_category] + (rng.random(n_extra) * sub_count[sub_category]).astype(np.int64)]
+
+    extra_ids = _join(_take(model["sub_category_prefix"], sub_category),
+                      _number_strings(np.arange(n_extra) + 20000000), separator='-')
+    extra_names = _join(_take(model["product_names"], template),
+                        _number_strings(np.arange(n_extra) + 1), separator=' Model ')
+
+    ids = pa.concat_arrays([pa.array(model["product_ids"][:n_source_used], type=pa.string()), extra_ids])
+    names = pa.concat_arrays([pa.array(model["product_names"][:n_source_used], type=pa.string()), extra_names])
+    sub_categories = np.concatenate([model["product_sub_category"][:n_source_used], sub_category])
+    price = np.concatenate([model["product_price"][:n_source_used],
+                            np.round(model["product_price"][template] * rng.lognormal(0, 0.15, n_extra), 2)])
+    popularity = np.concatenate([model["product_popularity"][:n_source_used], model["product_popularity"][template]])
+
+    attribute_row = rng.integers(0, len(model["product_brand"]), count)
+    table = pa.Table.from_arrays([
+        ids,
+        _take(model["product_brand"], attribute_row),
+        pa.array(model["product_warranty"][attribute_row]),
+        _take(model["product_material"], attribute_row),
+        pa.array(model["product_release"][attribute_row]).cast(pa.date32()),
+        _take(model["product_rating"], attribute_row),
+    ], schema=arrow_schema('Products'))
+    return {"table": table, "names": names, "sub_category": sub_categories, "price": price, "popularity": popularity}
+
+def _order_dates(model, rng, count, first_year, last_year):
+    """Sample order dates with the sample's yearly growth, month seasonality and weekday mix"""
+    years = np.arange(first_year, last_year + 1)
+    year = rng.choice(years, count, p=_probabilities(model["yearly_growth"] ** (years - first_year)))
+    month = rng.choice(12, count, p=model["month_p"])
+    month_start = ((year - 1970) * 12 + month).astype('datetime64[M]').astype('datetime64[D]')
+    month_days = ((year - 1970) * 12 + month + 1).astype('datetime64[M]').astype('datetime64[D]') - month_start
+    # Start on a weekday drawn from the sample mix, then move by whole weeks within the month
+    weekday = rng.choice(7, count, p=model["weekday_p"])
+    first_day = (weekday - (month_start.astype(np.int64) + 3)) % 7
+    weeks = (month_days.astype(np.int64) - 1 - first_day) // 7 + 1
+    day = first_day + 7 * (rng.random(count) * weeks).astype(np.int64)
+    return month_start + day
+
+def generate_orders_chunk(model, customers, products, lines, seed=0, chunk_index=0,
+                          first_row_id=1, first_order_number=100000, years=None):
+    """
+    Generate one chunk of order lines, vectorized end to end
+
+    Orders pick a customer by ordering activity, a shipping location, date and
+    ship mode; each line picks a product by popularity, a quantity, a discount
+    for its region and sub-category, and a profit from the sub-category margin
+    model. Every Customer ID and Product ID comes from the given dimensions.
+
+    Args:
+        model (dict): Output of learn_distributions()
+        customers (dict): Output of generate_customers()
+        products (dict): Output of generate_products()
+        lines (int): Number of order lines in the chunk
+        seed (int): Dataset seed
+        chunk_index (int): Position of the chunk, selecting its own random stream
+        first_row_id (int): Row ID of the first line
+        first_order_number (int): Number of the first order in the chunk
+        years (tuple): (first, last) order year (default: the sample's years)
+
+    Returns:
+        tuple: (Arrow table with the Orders schema, number of orders in the chunk)
+    """
+    rng = np.random.default_rng([seed, STREAM_ORDERS, chunk_index])
+    first_year, last_year = years or (model["first_year"], model["last_year"])
+
+    # Order sizes until the chunk is full; the last order is cut to fit
+    sizes = rng.choice(model["order_sizes"], lines, p=model["order_size_p"])
+    n_orders = int(np.searchsorted(np.cumsum(sizes), lines) + 1)
+    sizes = sizes[:n_orders]
+    sizes[-1] -= sizes.sum() - lines
+    line_order = np.repeat(np.arange(n_orders), sizes)
+
+    customer = rng.choice(len(customers["activity"]), n_orders, p=_probabilities(customers["activity"]))
+    place = rng.choice(len(model["place_p"]), n_orders, p=model["place_p"])
+    ship_mode = rng.choice(len(model["ship_modes"]), n_orders, p=model["ship_mode_p"])
+    order_date = _order_dates(model, rng, n_orders, first_year, last_year)
+    ship_date = order_date + _sample_conditional(rng, model["ship_delay_cdf"], ship_mode)
+    prefix = rng.choice(len(model["order_prefixes"]), n_orders, p=model["order_prefix_p"])
+    order_year = order_date.astype('datetime64[Y]').astype(np.int64) + 1970
+    order_ids = _join(_take(model["order_prefixes"], prefix), _number_strings(order_year),
+                      _number_strings(np.arange(n_orders) + first_order_number, 6), separator='-')
+
+    product = rng.choice(len(products["popularity"]), lines, p=_probabilities(products["popularity"]))
+    sub_category = products["sub_category"][product]
+    region = model["place_region"][place][line_order]
+    quantity = model["quantities"][rng.choice(len(model["quantities"]), lines, p=model["quantity_p"])]
+    discount_group = region * len(model["sub_categories"]) + sub_category
+    discount = model["discounts"][_sample_conditional(rng, model["discount_cdf"], discount_group)]
+    sales = np.round(products["price"][product] * quantity * (1 - discount), 4)
+    residual = model["residuals"][model["residual_offset"][sub_category]
+                                  + (rng.random(lines) * model["residual_count"][sub_category]).astype(np.int64)]
+    intercept, slope = model["margin_coef"][sub_category].T
+    profit = np.round(sales * (intercept + slope * discount + residual), 4)
+
+    # Per-order columns are expanded to lines with take() on the order-level arrays
+    line_order_array = pa.array(line_order)
+    columns = [
+        pa.array(np.arange(lines, dtype=np.int64) + first_row_id),
+        order_ids.take(line_order_array),
+        pa.array(order_date[line_order]).cast(pa.date32()),
+        pa.array(ship_date[line_order]).cast(pa.date32()),
+        _take(model["ship_modes"], ship_mode[line_order]),
+        customers["table"].column('CUSTOMER_ID').combine_chunks().take(pa.array(customer[line_order])),
+        customers["names"].take(pa.array(customer[line_order])),
+        _take(model["segments"], customers["segment"][customer[line_order]]),
+        pa.array(np.full(lines, 'United States', dtype=object), type=pa.string()),
+        _take(model["place_city"], place[line_order]),
+        _take(model["place_state"], place[line_order]),
+        _take(model["place_postal_code"], place[line_order]),
+        _take(model["regions"], region),
+        products["table"].column('PRODUCT_ID').combine_chunks().take(pa.array(product)),
+        _take(model["sub_category_category"], sub_category),
+        _take(model["sub_categories"], sub_category),
+        products["names"].take(pa.array(product)),
+        pa.array(sales),
+        pa.array(quantity.astype(np.int64)),
+        pa.array(discount),
+        pa.array(profit),
+    ]
+    return pa.Table.from_arrays(columns, schema=arrow_schema('Orders')), n_orders
+
+def _to_source_csv(table, name):
+    """Rename columns to the source CSV headers and format dates like the source files"""
+    schema = TABLE_SCHEMAS[name]
+    columns = []
+    for header, column, kind in schema['columns']:
+        values = table.column(column)
+        if kind == 'date' and schema['date_format'] == '%m/%d/%Y':
+            # superstore.csv writes dates without leading zeros, e.g. 11/8/2016
+            values = _join(_number_strings(pc.month(values)), _number_strings(pc.day(values)),
+                           _number_strings(pc.year(values)), separator='/')
+        columns.append(values)
+    return pa.Table.from_arrays(columns, names=[header for header, _, _ in schema['columns']])
+
+def write_table(table, name, output_dir, index, file_format):
+    """
+    Write one chunk of a table as Parquet (table columns and types) or CSV (source headers and formats)
+
+    Returns:
+        str: Path of the written file
+    """
+    table_dir = os.path.join(output_dir, name.lower())
+    os.makedirs(table_dir, exist_ok=True)
+    path = os.path.join(table_dir, f"{name.lower()}_{index:05d}.{file_format}")
+    if file_format == 'parquet':
+        pq.write_table(table, path, compression=PARQUET_COMPRESSION)
+    elif file_format == 'csv':
+        pacsv.write_csv(_to_source_csv(table, name), path)
+    else:
+        raise ValueError(f"Unknown format {file_format}; expected parquet or csv")
+    return path
+
+def generate_dataset(order_lines, output_dir=SYNTHETIC_DIR, seed=0, file_format='parquet',
+                     customers=None, products=None, chunk_rows=DEFAULT_CHUNK_ROWS, years=None, model=None):
+    """
+    Generate a synthetic Superstore dataset of any size
+
+    The same seed and arguments always produce identical files. Customers and
+    products are generated once; order lines are generated and written chunk by
+    chunk, so memory use depends on chunk_rows rather than order_lines.
+
+    Args:
+        order_lines (int): Total number of Orders rows
+        output_dir (str): Directory receiving orders/, customers/ and products/ subdirectories
+        seed (int): Random seed
+        file_format (str): 'parquet' (loadable with MATCH_BY_COLUMN_NAME) or 'csv' (source headers, for chunked_loader.py)
+        customers (int): Number of customers (default: the sample's customers per order line)
+        products (int): Number of products (default: the sample catalog, growing with the square root of the scale)
+        chunk_rows (int): Order lines per output file
+        years (tuple): (first, last) order year (default: the sample's years)
+        model (dict): Pre-computed learn_distributions() output
+
+    Returns:
+        dict: order_lines, orders, customers, products, files and seconds
+    """
+    start_time = time.time()
+    model = model or learn_distributions()
+    sample_lines = model["product_popularity"].sum()
+    scale = order_lines / sample_lines
+    customers = customers or max(1, int(round(len(model["customer_ids"]) * scale)))
+    products = products or max(1, int(round(len(model["product_ids"]) * max(scale, 1) ** 0.5)))
+
+    customer_dim = generate_customers(model, customers, seed)
+    product_dim = generate_products(model, products, seed)
+    files = [
+        write_table(customer_dim["table"], 'Customers', output_dir, 0, file_format),
+        write_table(product_dim["table"], 'Products', output_dir, 0, file_format),
+    ]
+
+    n_orders = 0
+    for chunk_index, chunk_start in enumerate(range(0, order_lines, chunk_rows)):
+        lines = min(chunk_rows, order_lines - chunk_start)
+        chunk, chunk_orders = generate_orders_chunk(
+            model, customer_dim, product_dim, lines, seed=seed, chunk_index=chunk_index,
+            first_row_id=chunk_start + 1, first_order_number=100000 + n_orders, years=years
+        )
+        files.append(write_table(chunk, 'Orders', output_dir, chunk_index, file_format))
+        n_orders += chunk_orders
+        elapsed = time.time() - start_time
+        print(f"Generated {chunk_start + lines:,}/{order_lines:,} order lines ({(chunk_start + lines) / elapsed:,.0f} lines/s)")
+
+    return {
+        "order_lines": order_lines,
+        "orders": n_orders,
+        "customers": customers,
+        "products": products,
+        "files": files,
+        "seconds": time.time() - start_time
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Superstore dataset learned from data/")
+    parser.add_argument("rows", type=int, help="Number of order lines")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", default="parquet", choices=["parquet", "csv"])
+    parser.add_argument("--output-dir", default=SYNTHETIC_DIR)
+    parser.add_argument("--customers", type=int, help="Number of customers (default scales with rows)")
+    parser.add_argument("--products", type=int, help="Number of products (default grows with sqrt of scale)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+    result = generate_dataset(args.rows, output_dir=args.output_dir, seed=args.seed, file_format=args.format,
+                              customers=args.customers, products=args.products, chunk_rows=args.chunk_rows)
+    print(f"Wrote {result['order_lines']:,} order lines ({result['orders']:,} orders), {result['customers']:,} customers "
+          f"and {result['products']:,} products to {len(result['files'])} files in {result['seconds']:.1f}s")
@@ -18,6 +18,7 @@ from semantic_model_generator.snowflake_utils.snowflake_connector import (
 )
 from semantic_model_generator.snowflake_utils.utils import create_fqn_table
 from semantic_model_generator.validate.context_length import validate_context_length
+from query_ledger import build_query_tag, set_session_query_tag
 
 _PLACEHOLDER_COMMENT = "  "
 _FILL_OUT_TOKEN = " # <FILL-OUT>"
@@ -188,6 +189,9 @@ def raw_schema_to_semantic_context(
     - AssertionError: If no valid tables are found in the specified schema.
     """
 
+    # The generator library issues its own statements, so tag them at the session level.
+    set_session_query_tag(conn, build_query_tag("model_generation"))
+
     # For FQN tables, create a new snowflake connection per table in case the db/schema is different.
     table_objects = []
     unique_database_schema: List[str] = []
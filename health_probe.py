@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from snowflake_connection import get_connection_pool
+from query_ledger import build_query_tag, execute_tagged
+
+# Load environment variables
+load_dotenv()
+
+# Seconds a health result is served before the next request for it starts a new probe
+HEALTH_PROBE_TTL_SECONDS = float(os.getenv('HEALTH_PROBE_TTL_SECONDS', '60'))
+
+_status_lock = threading.Lock()
+_status = {
+    "state": "unknown",     # unknown, healthy or degraded
+    "checked_time": None,   # time.time() when the last probe finished
+    "checks": {},           # check name -> {"ok", "seconds", "error_message"}
+    "probing": False
+}
+_probe_thread = None
+_probe_agent = None
+
+def _check(function):
+    """Run one check and describe its outcome as a dict"""
+    start_time = time.time()
+    try:
+        function()
+    except Exception as e:
+        return {"ok": False, "seconds": time.time() - start_time, "error_message": str(e)}
+    return {"ok": True, "seconds": time.time() - start_time, "error_message": None}
+
+def _check_snowflake(pool):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        execute_tagged(cursor, "SELECT 1", build_query_tag("health_probe"))
+        cursor.fetchone()
+        cursor.close()
+
+def _check_cortex_agent(agent):
+    if not agent.account:
+        raise RuntimeError("SNOWFLAKE_ACCOUNT is not set")
+    jwt_token_data = agent.get_jwt_token()
+    if not jwt_token_data or 'token' not in jwt_token_data:
+        raise RuntimeError("Could not sign a JWT with the configured key pair")
+
+def probe_health(agent_factory=None, pool=None):
+    """
+    Check Snowflake and the Cortex Agent credentials once and publish the result
+
+    The Snowflake check runs SELECT 1 on a pooled connection; the agent check
+    signs the key-pair JWT the agent:run requests use. The agent comes from
+    agent_factory and is kept for later probes, so its cached JWT is reused.
+
+    Returns:
+        dict: The new status, as from get_health_status
+    """
+    checks = {"snowflake": _check(lambda: _check_snowflake(pool or get_connection_pool()))}
+    if agent_factory is not None:
+        def check_agent():
+            global _probe_agent
+            if _probe_agent is None:
+                _probe_agent = agent_factory()
+            _check_cortex_agent(_probe_agent)
+        checks["cortex_agent"] = _check(check_agent)
+
+    with _status_lock:
+        _status.update(
+            state="healthy" if all(check["ok"] for check in checks.values()) else "degraded",
+            checked_time=time.time(),
+            checks=checks,
+            probing=False
+        )
+    return get_health_status(refresh=False)
+
+def _probe_in_background(agent_factory, pool):
+    try:
+        probe_health(agent_factory, pool)
+    except Exception as e:
+        print(f"Health probe failed: {e}")
+        with _status_lock:
+            _status["probing"] = False
+
+def get_health_status(agent_factory=None, pool=None, ttl_seconds=None, refresh=True):
+    """
+    Return the last health result at once, starting a background probe if it is older than the TTL
+
+    The caller never waits on the network: the first call returns state "unknown"
+    and later calls the cached result (with its age) until a newer probe finishes.
+
+    Args:
+        agent_factory (callable): Returns a CortexAgent for the agent check (skipped if None)
+        pool (SnowflakeConnectionPool): Pool for the Snowflake check (default get_connection_pool())
+        ttl_seconds (float): Maximum age of a served result (default HEALTH_PROBE_TTL_SECONDS)
+        refresh (bool): If False, never start a probe
+
+    Returns:
+        dict: state (unknown, healthy or degraded), checked_time, age_seconds, checks and probing
+    """
+    global _probe_thread
+    ttl_seconds = HEALTH_PROBE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    with _status_lock:
+        checked_time = _status["checked_time"]
+        expired = checked_time is None or time.time() - checked_time >= ttl_seconds
+        if refresh and expired and not _status["probing"]:
+            _status["probing"] = True
+            _probe_thread = threading.Thread(
+                target=_probe_in_background,
+                args=(agent_factory, pool),
+                name="health-probe",
+                daemon=True
+            )
+            _probe_thread.start()
+        status = dict(_status)
+        status["checks"] = {name: dict(check) for name, check in _status["checks"].items()}
+    status["age_seconds"] = time.time() - checked_time if checked_time is not None else None
+    return status
+
+if __name__ == "__main__":
+    from cortex_agent import CortexAgent
+    status = probe_health(agent_factory=CortexAgent)
+    for name, check in status["checks"].items():
+        print(f"{name:<14} {'ok' if check['ok'] else 'FAILED'}  {check['seconds']:.2f}s  {check['error_message'] or ''}")
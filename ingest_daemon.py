@@ -0,0 +1,317 @@
+import os
+import time
+import shutil
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from snowflake_connection import get_connection_pool
+from query_ledger import build_query_tag, execute_tagged
+from load_manifest import load_manifest, record_artifact, record_ingested, file_sha256, text_sha256, data_version
+from preprocess_data import DATA_DIR, INGESTED_ORDERS_DIR, prepare_load_file
+from setup_database import INGEST_STAGE_PREFIX, refresh_product_documents
+
+# Load environment variables
+load_dotenv()
+
+# Directory new order extracts (CSV with superstore.csv headers, optionally .csv.gz) are dropped into
+WATCH_DIR = os.getenv('INGEST_WATCH_DIR', os.path.join(DATA_DIR, 'incoming'))
+
+# Seconds between directory scans
+POLL_SECONDS = float(os.getenv('INGEST_POLL_SECONDS', '5'))
+
+# A file must be unmodified this long before it is picked up, so partially written files are skipped
+SETTLE_SECONDS = float(os.getenv('INGEST_SETTLE_SECONDS', '2'))
+
+# Files loaded together in one COPY when a burst arrives
+MAX_BATCH_FILES = int(os.getenv('INGEST_MAX_BATCH_FILES', '20'))
+
+# Concurrent PUTs within a batch
+UPLOAD_WORKERS = int(os.getenv('INGEST_UPLOAD_WORKERS', '4'))
+
+# Local record of every file seen, keyed by content hash
+INGEST_LEDGER_PATH = os.getenv('INGEST_LEDGER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ingest_ledger.sqlite'))
+
+# Converted files waiting to be staged
+INGEST_WORK_DIR = os.path.join(DATA_DIR, 'ingest')
+
+STAGE = "@SuperstoreDB.data.SUPERSTORE_STAGE"
+STAGE_PREFIX = INGEST_STAGE_PREFIX
+
+INGEST_TAG = build_query_tag("ingest")
+
+# Without FORCE, COPY load metadata skips files it already loaded, so a crash between
+# COPY and the ledger update cannot load a file twice
+COPY_TEMPLATE = """
+    COPY INTO SuperstoreDB.data.Orders
+    FROM {stage}/{prefix}/
+    FILES = ({files})
+    FILE_FORMAT = (TYPE = 'PARQUET')
+    MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+    ON_ERROR = 'ABORT_STATEMENT'
+    """
+
+INGEST_LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_ledger (
+    file_hash TEXT PRIMARY KEY,
+    path TEXT,
+    status TEXT,
+    rows_loaded INTEGER,
+    arrived_time REAL,
+    loaded_time REAL,
+    batch_id TEXT,
+    error_message TEXT
+)
+"""
+
+_ledger_lock = threading.Lock()
+
+def _connect_ledger():
+    ledger = sqlite3.connect(INGEST_LEDGER_PATH, timeout=10)
+    ledger.execute(INGEST_LEDGER_SCHEMA)
+    return ledger
+
+def ledger_status(file_hash):
+    """Return the ledger status of a file (staged, loaded or failed), or None if never seen"""
+    with _ledger_lock:
+        ledger = _connect_ledger()
+        row = ledger.execute("SELECT status FROM ingest_ledger WHERE file_hash = ?", (file_hash,)).fetchone()
+        ledger.close()
+    return row[0] if row else None
+
+def record_file(file_info, status, batch_id=None, rows_loaded=None, error_message=None):
+    """Insert or update a file's ledger entry"""
+    with _ledger_lock:
+        ledger = _connect_ledger()
+        ledger.execute(
+            """
+            INSERT INTO ingest_ledger VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(file_hash) DO UPDATE SET
+                path = excluded.path, status = excluded.status, rows_loaded = excluded.rows_loaded,
+                loaded_time = excluded.loaded_time, batch_id = excluded.batch_id, error_message = excluded.error_message
+            """,
+            (
+                file_info["file_hash"],
+                file_info["path"],
+                status,
+                rows_loaded,
+                file_info["arrived_time"],
+                time.time() if status == "loaded" else None,
+                batch_id,
+                error_message
+            )
+        )
+        ledger.commit()
+        ledger.close()
+
+def freshness_report(since=None):
+    """
+    Summarize end-to-end freshness lag: seconds from a file landing in the watch directory to its rows being queryable
+
+    Returns:
+        dict: files, rows, avg_seconds, p95_seconds and max_seconds over loaded files
+    """
+    with _ledger_lock:
+        ledger = _connect_ledger()
+        rows = ledger.execute(
+            "SELECT loaded_time - arrived_time, rows_loaded FROM ingest_ledger WHERE status = 'loaded' AND loaded_time >= ? "
+            "ORDER BY 1",
+            (since or 0,)
+        ).fetchall()
+        ledger.close()
+
+    lags = [row[0] for row in rows]
+    if not lags:
+        return {"files": 0, "rows": 0, "avg_seconds": None, "p95_seconds": None, "max_seconds": None}
+    return {
+        "files": len(lags),
+        "rows": sum(row[1] or 0 for row in rows),
+        "avg_seconds": sum(lags) / len(lags),
+        "p95_seconds": lags[min(len(lags) - 1, int(len(lags) * 0.95))],
+        "max_seconds": lags[-1]
+    }
+
+def _move(path, watch_dir, folder):
+    target_dir = os.path.join(watch_dir, folder)
+    os.makedirs(target_dir, exist_ok=True)
+    shutil.move(path, os.path.join(target_dir, os.path.basename(path)))
+
+def next_batch(watch_dir=WATCH_DIR, settle_seconds=SETTLE_SECONDS, max_files=MAX_BATCH_FILES):
+    """
+    Pick up to max_files settled order files, oldest first, that have not been loaded yet
+
+    Files whose content was already loaded (same hash, any name) are moved to
+    processed/ without loading them again. A file with the same content as one
+    already in the batch stays in the watch directory: it is moved on a later scan
+    once the original has loaded, or retried if the original fails.
+
+    Returns:
+        list: Dicts with path, file_hash and arrived_time (the file's modification time)
+    """
+    if not os.path.isdir(watch_dir):
+        return []
+    now = time.time()
+    candidates = []
+    for name in os.listdir(watch_dir):
+        path = os.path.join(watch_dir, name)
+        if not os.path.isfile(path) or not name.lower().endswith(('.csv', '.csv.gz')):
+            continue
+        arrived_time = os.path.getmtime(path)
+        if now - arrived_time >= settle_seconds:
+            candidates.append((arrived_time, path))
+
+    batch = []
+    for arrived_time, path in sorted(candidates):
+        file_hash = file_sha256(path)
+        if ledger_status(file_hash) == "loaded":
+            print(f"{path} was already loaded, skipping")
+            _move(path, watch_dir, 'processed')
+            continue
+        if file_hash in (f["file_hash"] for f in batch):
+            continue
+        batch.append({"path": path, "file_hash": file_hash, "arrived_time": arrived_time})
+        if len(batch) >= max_files:
+            break
+    return batch
+
+def _prepare_and_put(pool, file_info):
+    """Validate and convert one file, then PUT it under its content hash; the converted file is kept until the load"""
+    prepared = prepare_load_file('Orders', file_info["path"],
+                                 output_dir=os.path.join(INGEST_WORK_DIR, file_info["file_hash"][:16]))
+    stage_file = f"{file_info['file_hash']}.parquet"
+    staged_path = os.path.join(os.path.dirname(prepared["load_path"]), stage_file)
+    os.replace(prepared["load_path"], staged_path)
+    with pool.connection() as conn:
+        execute_tagged(conn.cursor(), f"PUT file://{staged_path} {STAGE}/{STAGE_PREFIX}/ OVERWRITE=TRUE AUTO_COMPRESS=FALSE", INGEST_TAG)
+    return dict(file_info, stage_file=stage_file, staged_path=staged_path, rows=prepared["rows"])
+
+def keep_ingested_copy(file_info, position):
+    """
+    Move a loaded file's converted Parquet into INGESTED_ORDERS_DIR, named in load order,
+    so local answers (columnar_cache.py) read the same Orders rows as the warehouse
+
+    Args:
+        file_info (dict): Staged file, as from _prepare_and_put
+        position (str): Sortable load position, e.g. load time and index in the batch
+    """
+    os.makedirs(INGESTED_ORDERS_DIR, exist_ok=True)
+    suffix = f"_{file_info['file_hash'][:16]}.parquet"
+    # A file retried after a crash may already have its copy
+    if not any(name.endswith(suffix) for name in os.listdir(INGESTED_ORDERS_DIR)):
+        os.replace(file_info["staged_path"], os.path.join(INGESTED_ORDERS_DIR, f"{position}{suffix}"))
+    shutil.rmtree(os.path.dirname(file_info["staged_path"]), ignore_errors=True)
+
+def load_batch(batch, pool=None, upload_workers=UPLOAD_WORKERS, watch_dir=WATCH_DIR):
+    """
+    Convert, stage and COPY a batch of order files with one COPY statement
+
+    Files are converted and uploaded in parallel; a file that fails validation or
+    upload is moved to failed/ and does not hold back the rest of the batch. After
+    the COPY, Product_Documents is refreshed so search sees the new orders; only
+    then is each file recorded in the ledger as loaded and moved to processed/ (a
+    failed refresh leaves the files to be retried, and COPY skips their rows).
+    Loaded files are recorded in the manifest, so setup_database.py appends them
+    again when it reloads Orders, and their converted copies are kept in
+    INGESTED_ORDERS_DIR, where local answers read them. Finally the data version is
+    bumped so caches keyed on it are invalidated.
+
+    Returns:
+        dict: batch_id, files_loaded, files_failed, rows_loaded, seconds and data_version
+    """
+    pool = pool or get_connection_pool()
+    start_time = time.time()
+    batch_id = text_sha256(*(f["file_hash"] for f in batch))[:16]
+
+    staged = []
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(upload_workers, len(batch)))) as executor:
+        futures = [(file_info, executor.submit(_prepare_and_put, pool, file_info)) for file_info in batch]
+        for file_info, future in futures:
+            try:
+                staged.append(future.result())
+                record_file(file_info, "staged", batch_id)
+            except Exception as e:
+                failed += 1
+                print(f"Error ingesting {file_info['path']}: {e}")
+                record_file(file_info, "failed", batch_id, error_message=str(e))
+                _move(file_info["path"], watch_dir, 'failed')
+
+    rows_loaded = 0
+    if staged:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            files = ", ".join(f"'{f['stage_file']}'" for f in staged)
+            execute_tagged(cursor, COPY_TEMPLATE.format(stage=STAGE, prefix=STAGE_PREFIX, files=files), INGEST_TAG)
+            copy_results = cursor.fetchall()
+            refresh_product_documents(cursor, INGEST_TAG)
+            cursor.close()
+        # One result row per file: (file, status, rows_parsed, rows_loaded, ...); skipped files were loaded before
+        loaded_rows = {os.path.basename(str(row[0])): row[3] for row in copy_results if len(row) > 3}
+        manifest = load_manifest()
+        record_ingested(manifest, [f["stage_file"] for f in staged])
+        loaded_ms = int(time.time() * 1000)
+        for i, file_info in enumerate(staged):
+            rows = loaded_rows.get(file_info["stage_file"], 0)
+            rows_loaded += rows or 0
+            keep_ingested_copy(file_info, f"{loaded_ms:013d}_{i:03d}")
+            record_file(file_info, "loaded", batch_id, rows_loaded=rows)
+            _move(file_info["path"], watch_dir, 'processed')
+
+        record_artifact(manifest, "orders_ingest", text_sha256(manifest["artifacts"].get("orders_ingest"), batch_id))
+
+    return {
+        "batch_id": batch_id,
+        "files_loaded": len(staged),
+        "files_failed": failed,
+        "rows_loaded": rows_loaded,
+        "seconds": time.time() - start_time,
+        "data_version": data_version()
+    }
+
+def run_daemon(watch_dir=WATCH_DIR, poll_seconds=POLL_SECONDS, once=False, pool=None):
+    """
+    Watch a directory and load new order files as they arrive
+
+    Each scan loads at most one micro-batch; a burst larger than MAX_BATCH_FILES is
+    worked off in consecutive batches without waiting for the next poll.
+
+    Args:
+        watch_dir (str): Directory to watch
+        poll_seconds (float): Seconds between scans when there is nothing to load
+        once (bool): Load what is there now and return instead of watching
+        pool (SnowflakeConnectionPool): Pool to load with (default get_connection_pool())
+    """
+    os.makedirs(watch_dir, exist_ok=True)
+    print(f"Watching {watch_dir} for order files...")
+    while True:
+        batch = next_batch(watch_dir)
+        if batch:
+            try:
+                result = load_batch(batch, pool=pool, watch_dir=watch_dir)
+                freshness = freshness_report(since=time.time() - 3600)
+                print(f"Batch {result['batch_id']}: {result['files_loaded']} files / {result['rows_loaded']} rows loaded, "
+                      f"{result['files_failed']} failed in {result['seconds']:.2f}s; data version {result['data_version']}; "
+                      f"freshness lag (last hour) avg {freshness['avg_seconds'] or 0:.1f}s, "
+                      f"p95 {freshness['p95_seconds'] or 0:.1f}s, max {freshness['max_seconds'] or 0:.1f}s")
+            except Exception as e:
+                # Files stay in the watch directory and are retried on the next scan
+                print(f"Error loading batch: {e}")
+                if once:
+                    return
+                time.sleep(poll_seconds)
+            continue
+        if once:
+            return
+        time.sleep(poll_seconds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load order files dropped into a directory into SuperstoreDB.data.Orders")
+    parser.add_argument("--watch-dir", default=WATCH_DIR)
+    parser.add_argument("--once", action="store_true", help="Load the files present now and exit")
+    parser.add_argument("--report", action="store_true", help="Print the freshness lag report and exit")
+    args = parser.parse_args()
+    if args.report:
+        print(freshness_report())
+    else:
+        run_daemon(args.watch_dir, once=args.once)
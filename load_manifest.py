@@ -0,0 +1,101 @@
+import os
+import json
+import hashlib
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Local record of the content hash of every artifact setup has successfully loaded
+MANIFEST_PATH = os.getenv('SETUP_MANIFEST_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.setup_manifest.json'))
+
+def file_sha256(path, chunk_size=1024 * 1024, limit=None):
+    """
+    Return the SHA-256 hex digest of a file, reading it in chunks
+
+    With limit, only the first limit bytes are hashed (e.g. to check that a file only grew)
+    """
+    hasher = hashlib.sha256()
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return hasher.hexdigest()
+
+def text_sha256(*parts):
+    """
+    Return the SHA-256 hex digest of one or more strings (e.g. DDL text or upstream digests)
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(str(part).encode('utf-8'))
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+def _target():
+    """Identify the Snowflake account and database the manifest describes"""
+    return f"{os.getenv('SNOWFLAKE_ACCOUNT')}/{os.getenv('SNOWFLAKE_DATABASE', 'SuperstoreDB')}".upper()
+
+def load_manifest():
+    """
+    Load the manifest for the configured Snowflake target
+
+    A missing or unreadable manifest, or one written for a different account or
+    database, yields an empty manifest so every artifact is treated as changed.
+    """
+    try:
+        with open(MANIFEST_PATH, 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = None
+
+    if not manifest or manifest.get("target") != _target():
+        return {"target": _target(), "artifacts": {}}
+    return manifest
+
+def save_manifest(manifest):
+    """
+    Write the manifest atomically so an interrupted run never leaves it half-written
+    """
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def is_unchanged(manifest, name, digest):
+    """Return True if the artifact was last loaded with exactly this digest"""
+    return manifest["artifacts"].get(name) == digest
+
+def record_artifact(manifest, name, digest):
+    """Record a successfully loaded artifact and persist the manifest immediately"""
+    manifest["artifacts"][name] = digest
+    save_manifest(manifest)
+
+def record_ingested(manifest, stage_files):
+    """
+    Record order files appended to Orders outside setup (ingest_daemon.py), in load order,
+    so a setup reload of Orders can append them again
+    """
+    ingested = manifest.setdefault("ingested_files", [])
+    ingested.extend(stage_file for stage_file in stage_files if stage_file not in ingested)
+    save_manifest(manifest)
+
+def ingested_files(manifest=None):
+    """Return the stage file names of the order files ingest_daemon.py has appended, in load order"""
+    manifest = manifest or load_manifest()
+    return list(manifest.get("ingested_files", []))
+
+def data_version(manifest=None):
+    """
+    Return a short token that changes whenever any loaded artifact changes
+
+    Caches keyed on this token are invalidated automatically after a reload.
+    """
+    manifest = manifest or load_manifest()
+    artifacts = manifest["artifacts"]
+    return text_sha256(*(f"{name}={artifacts[name]}" for name in sorted(artifacts)))[:16]
@@ -0,0 +1,227 @@
+import os
+import re
+import time
+import threading
+import duckdb
+from contextlib import nullcontext
+from dotenv import load_dotenv
+from preprocess_data import DATA_DIR, DIMENSION_TABLES, SURVIVORSHIP_RULE, TABLE_SCHEMAS, source_path
+from columnar_cache import load_table, cache_path
+from query_ledger import build_query_tag, record_query
+from cancellation import RequestCancelled
+from snowflake_connection import query_dataframe
+from setup_database import SUMMARY_TABLES
+
+# Load environment variables
+load_dotenv()
+
+# Where SQL from Cortex Analyst runs:
+#   snowflake - always on the warehouse
+#   local     - on the embedded engine loaded from data/, falling back to Snowflake for SQL it cannot run
+SQL_BACKENDS = ('snowflake', 'local')
+DEFAULT_SQL_BACKEND = os.getenv('CORTEX_SQL_BACKEND', 'snowflake').lower()
+
+# Database and schema the tables are created in, so fully qualified Snowflake names resolve unchanged
+LOCAL_DATABASE = "SuperstoreDB"
+LOCAL_SCHEMA = "data"
+
+# Snowflake functions DuckDB lacks, defined as macros with Snowflake semantics
+SNOWFLAKE_MACROS = [
+    "CREATE MACRO iff(condition, when_true, when_false) AS CASE WHEN condition THEN when_true ELSE when_false END",
+    "CREATE MACRO nvl(value, fallback) AS COALESCE(value, fallback)",
+    "CREATE MACRO nvl2(value, when_not_null, when_null) AS CASE WHEN value IS NOT NULL THEN when_not_null ELSE when_null END",
+    "CREATE MACRO zeroifnull(value) AS COALESCE(value, 0)",
+    "CREATE MACRO div0(dividend, divisor) AS CASE WHEN divisor = 0 THEN 0 ELSE dividend / divisor END",
+    "CREATE MACRO div0null(dividend, divisor) AS CASE WHEN divisor = 0 OR divisor IS NULL THEN 0 ELSE dividend / divisor END",
+    "CREATE MACRO square(value) AS value * value",
+    "CREATE MACRO to_date(value) AS CAST(value AS DATE)",
+    "CREATE MACRO try_to_number(value) AS TRY_CAST(value AS DOUBLE)",
+    "CREATE MACRO try_to_date(value) AS TRY_CAST(value AS DATE)",
+    "CREATE MACRO approx_percentile(value, fraction) AS approx_quantile(value, fraction)",
+    """CREATE MACRO dateadd(part, amount, value) AS CASE lower(part)
+        WHEN 'year' THEN value + to_years(CAST(amount AS INTEGER))
+        WHEN 'quarter' THEN value + to_months(CAST(amount AS INTEGER) * 3)
+        WHEN 'month' THEN value + to_months(CAST(amount AS INTEGER))
+        WHEN 'week' THEN value + to_days(CAST(amount AS INTEGER) * 7)
+        WHEN 'day' THEN value + to_days(CAST(amount AS INTEGER))
+        WHEN 'hour' THEN value + to_hours(CAST(amount AS INTEGER))
+        WHEN 'minute' THEN value + to_minutes(CAST(amount AS INTEGER))
+        ELSE value + to_seconds(CAST(amount AS INTEGER)) END""",
+]
+
+# Functions whose first argument is a bare date part in Snowflake (DATEDIFF(month, ...)) but a string in DuckDB
+DATE_PART_FUNCTIONS = ('DATEADD', 'DATEDIFF', 'DATE_PART', 'DATE_TRUNC', 'TIMESTAMPADD', 'TIMESTAMPDIFF')
+DATE_PART_ARGUMENT = re.compile(r"\b(" + "|".join(DATE_PART_FUNCTIONS) + r")\s*\(\s*([A-Za-z_]+)\s*,", re.IGNORECASE)
+
+def translate_sql(sql):
+    """
+    Translate Snowflake SQL into SQL the embedded engine accepts
+
+    Names need no rewriting: tables live in a SuperstoreDB.data schema and DuckDB
+    resolves identifiers case-insensitively, so "SUPERSTOREDB"."DATA"."ORDERS" and
+    Orders both work. Functions DuckDB lacks are provided as SNOWFLAKE_MACROS.
+    """
+    sql = DATE_PART_ARGUMENT.sub(lambda m: f"{m.group(1)}('{m.group(2).lower()}',", sql)
+    return sql.strip().rstrip(';')
+
+class LocalEngine:
+    """
+    Embedded columnar SQL engine holding Orders, Customers and Products from data/
+
+    Tables are loaded on first use with the same parsing and dimension conforming
+    as setup_database.py, so results match the warehouse. The summary tables are
+    created as views over Orders.
+
+    Tables are views over the memory-mapped columnar cache rather than copies,
+    so each process adds almost nothing to memory and shares pages with others.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, rule=SURVIVORSHIP_RULE):
+        self.data_dir = data_dir
+        self.rule = rule
+        self._conn = None
+        self._arrow_tables = {}
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.loaded_sources = None
+
+    def source_keys(self):
+        """Cache files of the engine's sources; the names change whenever a source changes"""
+        return tuple(cache_path(table, source_path(table, self.data_dir), conform=table in DIMENSION_TABLES, rule=self.rule)
+                     for table in TABLE_SCHEMAS)
+
+    def _load(self):
+        start_time = time.time()
+        conn = duckdb.connect()
+        conn.execute(f"ATTACH ':memory:' AS {LOCAL_DATABASE}")
+        conn.execute(f"CREATE SCHEMA {LOCAL_DATABASE}.{LOCAL_SCHEMA}")
+        conn.execute(f"USE {LOCAL_DATABASE}.{LOCAL_SCHEMA}")
+        for statement in SNOWFLAKE_MACROS:
+            conn.execute(statement)
+        self.loaded_sources = self.source_keys()
+        for table in TABLE_SCHEMAS:
+            self._arrow_tables[f"arrow_{table.lower()}"] = load_table(
+                table, source_path(table, self.data_dir), conform=table in DIMENSION_TABLES, rule=self.rule)
+        self._register(conn)
+        for table in TABLE_SCHEMAS:
+            conn.execute(f"CREATE VIEW {table} AS SELECT * FROM arrow_{table.lower()}")
+        for name, query in SUMMARY_TABLES.items():
+            conn.execute(f"CREATE VIEW {name} AS {query}")
+        self.load_seconds = time.time() - start_time
+        print(f"Loaded local engine from {self.data_dir} in {self.load_seconds:.2f}s")
+        return conn
+
+    def _register(self, conn):
+        # Registered Arrow tables are visible only to the connection they are registered on
+        for name, arrow_table in self._arrow_tables.items():
+            conn.register(name, arrow_table)
+
+    def connection(self):
+        """Return the engine's connection, loading the tables on first use"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._load()
+        return self._conn
+
+    def query(self, sql, as_arrow=False, cancel_token=None):
+        """
+        Run Snowflake SQL locally
+
+        Args:
+            sql (str): Query as generated by Cortex Analyst
+            as_arrow (bool): If True, return a pyarrow.Table instead of a pandas DataFrame
+            cancel_token (CancelToken): Interrupts the query when cancelled
+
+        Returns:
+            pandas.DataFrame or pyarrow.Table with the query result
+
+        Raises:
+            duckdb.Error: If the query uses SQL the engine cannot run
+            RequestCancelled: If cancel_token was cancelled before the query finished
+        """
+        # A cursor is an independent connection to the same database, safe to use from this thread
+        cursor = self.connection().cursor()
+        try:
+            with cancel_token.on_cancel(cursor.interrupt) if cancel_token is not None else nullcontext():
+                cursor.execute(f"USE {LOCAL_DATABASE}.{LOCAL_SCHEMA}")
+                self._register(cursor)
+                result = cursor.execute(translate_sql(sql))
+                return result.to_arrow_table() if as_arrow else result.df()
+        except duckdb.InterruptException as e:
+            if cancel_token is not None and cancel_token.cancelled:
+                raise RequestCancelled(cancel_token.reason) from e
+            raise
+        finally:
+            cursor.close()
+
+_local_engine = None
+_local_engine_lock = threading.Lock()
+
+def get_local_engine():
+    """Return the process-wide local engine, created on first use and again after a source changes"""
+    global _local_engine
+    with _local_engine_lock:
+        if _local_engine is None or (_local_engine.loaded_sources is not None
+                                     and _local_engine.loaded_sources != _local_engine.source_keys()):
+            _local_engine = LocalEngine()
+        return _local_engine
+
+def reset_local_engine():
+    """Discard the process-wide local engine so the next query loads the current data"""
+    global _local_engine
+    with _local_engine_lock:
+        _local_engine = None
+
+def run_sql(sql, backend=None, conn=None, tag=None, fallback=True, cancel_token=None):
+    """
+    Run a query on the chosen backend, falling back from local to Snowflake when needed
+
+    Args:
+        sql (str): Snowflake SQL to run
+        backend (str): snowflake or local (default DEFAULT_SQL_BACKEND)
+        conn: Open Snowflake connection for the Snowflake path (default: a new connection)
+        tag (dict): QUERY_TAG from build_query_tag() naming the calling feature (default "adhoc")
+        fallback (bool): If False, raise instead of falling back to Snowflake
+        cancel_token (CancelToken): Interrupts a local query when cancelled (raising RequestCancelled)
+
+    Returns:
+        dict: data (pandas.DataFrame), backend (where it ran), seconds and
+              fallback_reason (why local execution was not used, or None)
+    """
+    backend = (backend or DEFAULT_SQL_BACKEND).lower()
+    if backend not in SQL_BACKENDS:
+        raise ValueError(f"Unknown SQL backend {backend}; expected one of {SQL_BACKENDS}")
+    tag = tag or build_query_tag("adhoc")
+
+    fallback_reason = None
+    if backend == "local":
+        submit_time = time.time()
+        try:
+            data = get_local_engine().query(sql, cancel_token=cancel_token)
+            seconds = time.time() - submit_time
+            record_query(dict(tag, backend="local"), sql, submit_time=submit_time,
+                         last_row_seconds=seconds, rows_fetched=len(data))
+            return {"data": data, "backend": "local", "seconds": seconds, "fallback_reason": None}
+        except RequestCancelled as e:
+            record_query(dict(tag, backend="local"), sql, status="cancelled", error_message=str(e),
+                         submit_time=submit_time, last_row_seconds=time.time() - submit_time)
+            raise
+        except Exception as e:
+            if not fallback:
+                raise
+            fallback_reason = str(e).splitlines()[0]
+            print(f"Local engine cannot run this query, falling back to Snowflake: {fallback_reason}")
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    submit_time = time.time()
+    data = query_dataframe(sql, conn=conn, tag=tag)
+    return {"data": data, "backend": "snowflake", "seconds": time.time() - submit_time, "fallback_reason": fallback_reason}
+
+if __name__ == "__main__":
+    import sys
+    engine = get_local_engine()
+    query = sys.argv[1] if len(sys.argv) > 1 else "SELECT Category, SUM(Sales) AS Sales FROM SuperstoreDB.data.Orders GROUP BY Category ORDER BY Sales DESC"
+    start_time = time.time()
+    print(engine.query(query))
+    print(f"{(time.time() - start_time) * 1000:.1f} ms")
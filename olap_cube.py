@@ -0,0 +1,358 @@
+import os
+import re
+import time
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from dotenv import load_dotenv
+from load_manifest import file_sha256
+from preprocess_data import source_path
+from columnar_cache import cache_path, load_table, source_files, source_digest
+from local_engine import run_sql
+
+# Load environment variables
+load_dotenv()
+
+# Low-cardinality dimensions from superstore_semantic_model.yaml, plus MONTH derived from ORDER_DATE
+CUBE_DIMENSIONS = ('CATEGORY', 'SUB_CATEGORY', 'REGION', 'SEGMENT', 'SHIP_MODE', 'STATE', 'MONTH')
+
+# Additive Orders columns summed per cell; averages are sums divided by the row count
+CUBE_MEASURES = ('SALES', 'PROFIT', 'QUANTITY', 'DISCOUNT')
+
+# Orders rows encoded and merged into the cells at a time
+APPEND_BATCH_ROWS = 1000000
+
+# Roll-ups over at most this many possible keys use a dense bincount instead of a sort
+DENSE_KEY_LIMIT = 1 << 16
+
+# Aggregates the cube can answer: SUM(x), AVG(x), COUNT(*) or a bare measure name (a sum)
+MEASURE_PATTERN = re.compile(r"^\s*(?:(SUM|AVG|COUNT)\s*\(\s*([A-Z_*]+)\s*\)|([A-Z_]+))\s*$", re.IGNORECASE)
+
+def _month_values(order_dates):
+    """Truncate Arrow or numpy dates to the first day of their month"""
+    return np.asarray(order_dates, dtype='datetime64[D]').astype('datetime64[M]')
+
+class OlapCube:
+    """
+    Pre-aggregated Orders cube: one cell per distinct combination of CUBE_DIMENSIONS
+
+    Each cell holds the row count and the sum of every CUBE_MEASURES column.
+    Dimension values are dictionary-encoded, so slicing and rolling up are
+    integer mask and bincount operations over the cells rather than the rows.
+    """
+
+    def __init__(self, dimensions=CUBE_DIMENSIONS):
+        self.dimensions = tuple(dimensions)
+        self.source_key = None
+        self._reset()
+
+    def _reset(self):
+        self.dictionaries = {dimension: [] for dimension in self.dimensions}
+        self._positions = {dimension: {} for dimension in self.dimensions}
+        self.codes = np.empty((0, len(self.dimensions)), dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.sums = {measure: np.empty(0, dtype=np.float64) for measure in CUBE_MEASURES}
+        self.rows_aggregated = 0
+        # (path, size, sha256) of each source file aggregated by refresh, to recognise a source that only grew
+        self._sources = []
+        # Memoized roll-ups keyed by dimension tuple, cleared whenever cells change
+        self._cuboids = {}
+
+    @classmethod
+    def from_orders(cls, orders, dimensions=CUBE_DIMENSIONS):
+        """Build a cube from a typed Orders table (pyarrow.Table or pandas DataFrame)"""
+        cube = cls(dimensions)
+        cube.append(orders)
+        return cube
+
+    @property
+    def cells(self):
+        return len(self.counts)
+
+    def _encode(self, dimension, column):
+        """Dictionary-encode an Arrow column, appending unseen values so existing codes never change"""
+        encoded = pc.dictionary_encode(column).combine_chunks()
+        positions = self._positions[dimension]
+        dictionary = self.dictionaries[dimension]
+        mapping = np.empty(len(encoded.dictionary), dtype=np.int64)
+        for i, value in enumerate(encoded.dictionary.to_pylist()):
+            if dimension == 'MONTH':
+                value = np.datetime64(value, 'M')
+            if value not in positions:
+                positions[value] = len(dictionary)
+                dictionary.append(value)
+            mapping[i] = positions[value]
+        return mapping[encoded.indices.to_numpy(zero_copy_only=False)]
+
+    def _combine(self, codes, counts, sums, dimension_indexes):
+        """Aggregate cells that share the codes of the given dimensions"""
+        if not dimension_indexes:
+            return (np.zeros((1, 0), dtype=np.int64), np.array([counts.sum()]),
+                    {measure: np.array([values.sum()]) for measure, values in sums.items()})
+        if len(counts) == 0:
+            return codes[:, dimension_indexes], counts, sums
+        sizes = [len(self.dictionaries[self.dimensions[i]]) for i in dimension_indexes]
+        keys = np.ravel_multi_index(tuple(codes[:, i] for i in dimension_indexes), sizes)
+        key_space = int(np.prod(sizes))
+        if key_space <= max(DENSE_KEY_LIMIT, len(keys)):
+            # Small key space: a dense bincount avoids sorting the keys
+            present = np.bincount(keys, minlength=key_space) > 0
+            unique_keys = np.flatnonzero(present)
+            inverse = (np.cumsum(present) - 1)[keys]
+        else:
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+        combined_codes = np.stack(np.unravel_index(unique_keys, sizes), axis=1)
+        return (combined_codes,
+                np.bincount(inverse, weights=counts, minlength=len(unique_keys)).astype(np.int64),
+                {measure: np.bincount(inverse, weights=values, minlength=len(unique_keys)) for measure, values in sums.items()})
+
+    def _encode_batch(self, batch):
+        """Return a batch's dimension codes and measure values as (rows, dimensions) and (rows, measures) arrays"""
+        codes = np.empty((batch.num_rows, len(self.dimensions)), dtype=np.int64)
+        for i, dimension in enumerate(self.dimensions):
+            if dimension == 'MONTH':
+                # First day of the month as a date; formatting month strings costs far more
+                column = pa.chunked_array([_month_values(batch.column('ORDER_DATE')).astype('datetime64[D]')])
+            else:
+                column = batch.column(dimension)
+            codes[:, i] = self._encode(dimension, column)
+        values = np.column_stack([batch.column(measure).to_numpy().astype(np.float64) for measure in CUBE_MEASURES])
+        return codes, values
+
+    def append(self, orders):
+        """
+        Add new Orders rows to the cube
+
+        Rows are aggregated in batches of APPEND_BATCH_ROWS and each batch's cells
+        are merged with the existing ones, so the cost depends on the appended rows
+        and the cell count, not on the rows already in the cube, and memory stays bounded.
+        """
+        if isinstance(orders, pd.DataFrame):
+            orders = pa.Table.from_pandas(orders, preserve_index=False)
+        # Rows from outside refresh are not in the recorded source files
+        self._sources = []
+        for start in range(0, orders.num_rows, APPEND_BATCH_ROWS):
+            batch = orders.slice(start, APPEND_BATCH_ROWS)
+            rows = batch.num_rows
+            new_codes, new_values = self._encode_batch(batch)
+
+            codes = np.concatenate([self.codes, new_codes])
+            counts = np.concatenate([self.counts, np.ones(rows, dtype=np.int64)])
+            sums = {measure: np.concatenate([self.sums[measure], new_values[:, i]])
+                    for i, measure in enumerate(CUBE_MEASURES)}
+            self.codes, self.counts, self.sums = self._combine(codes, counts, sums, list(range(len(self.dimensions))))
+            self.rows_aggregated += rows
+        self._cuboids = {}
+        return self
+
+    def _source_grew(self, files):
+        """
+        True if the source files still start with exactly the files the cube aggregated
+
+        Every aggregated file but the last must be unchanged (a digest lookup, see
+        columnar_cache.source_digest); the last may also have grown, which is checked
+        by hashing only the bytes it had. New files may follow. Nothing is re-read
+        or re-encoded, so the check costs no more than the source that was appended.
+        """
+        if not self._sources or len(files) < len(self._sources):
+            return False
+        for i, (path, size, digest) in enumerate(self._sources):
+            if os.path.abspath(files[i]) != path:
+                return False
+            if source_digest(path) == digest:
+                continue
+            last = i == len(self._sources) - 1
+            if not last or os.path.getsize(path) < size or file_sha256(path, limit=size) != digest:
+                return False
+        return True
+
+    def refresh(self, path=None):
+        """
+        Bring the cube up to date with the Orders source, aggregating only appended rows
+
+        The source is identified by its columnar cache name, a hash of its content,
+        so an unchanged source costs no read. When the content changed, the cube
+        keeps its cells only if the source files still start with the files it
+        has aggregated (see _source_grew) and adds the rows after them; any other
+        change, such as an edited or rewritten file, rebuilds the cube.
+
+        Returns:
+            int: Rows added to the cube
+        """
+        source_key = os.path.basename(cache_path('Orders', path))
+        if source_key == self.source_key:
+            return 0
+        files = source_files(path or source_path('Orders'))
+        sources = [(os.path.abspath(f), os.path.getsize(f), source_digest(f)) for f in files]
+        orders = load_table('Orders', path)
+        if not self._source_grew(files) or orders.num_rows < self.rows_aggregated:
+            self._reset()
+        appended = orders.num_rows - self.rows_aggregated
+        if appended:
+            self.append(orders.slice(self.rows_aggregated))
+        self._sources = sources
+        self.source_key = source_key
+        return appended
+
+    def _mask(self, filters):
+        """Boolean mask of the cells matching {dimension: value or list of values}"""
+        mask = np.ones(self.cells, dtype=bool)
+        for dimension, values in (filters or {}).items():
+            dimension = dimension.upper()
+            if dimension not in self.dimensions:
+                raise ValueError(f"{dimension} is not a cube dimension; expected one of {self.dimensions}")
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            if dimension == 'MONTH':
+                values = _month_values([str(value)[:7] for value in values])
+            positions = self._positions[dimension]
+            wanted = np.zeros(len(self.dictionaries[dimension]), dtype=bool)
+            wanted[[positions[value] for value in values if value in positions]] = True
+            mask &= wanted[self.codes[:, self.dimensions.index(dimension)]]
+        return mask
+
+    def _subcube(self, codes, counts, sums, dimension_indexes):
+        cube = OlapCube([self.dimensions[i] for i in dimension_indexes])
+        for i in dimension_indexes:
+            cube.dictionaries[self.dimensions[i]] = self.dictionaries[self.dimensions[i]]
+            cube._positions[self.dimensions[i]] = self._positions[self.dimensions[i]]
+        cube.codes, cube.counts, cube.sums = codes, counts, sums
+        cube.rows_aggregated = int(counts.sum())
+        return cube
+
+    def slice(self, filters):
+        """Return the sub-cube of cells matching {dimension: value or list of values}"""
+        mask = self._mask(filters)
+        return self._subcube(self.codes[mask], self.counts[mask],
+                             {measure: values[mask] for measure, values in self.sums.items()},
+                             list(range(len(self.dimensions))))
+
+    def rollup(self, dimensions):
+        """Return the cube aggregated to a subset of its dimensions, memoized until the cells change"""
+        dimensions = tuple(dimension.upper() for dimension in dimensions)
+        if dimensions in self._cuboids:
+            return self._cuboids[dimensions]
+        missing = [dimension for dimension in dimensions if dimension not in self.dimensions]
+        if missing:
+            raise ValueError(f"{missing} are not cube dimensions; expected some of {self.dimensions}")
+        indexes = [self.dimensions.index(dimension) for dimension in dimensions]
+        cuboid = self._subcube(*self._combine(self.codes, self.counts, self.sums, indexes), indexes)
+        self._cuboids[dimensions] = cuboid
+        return cuboid
+
+    def query(self, measures, dimensions=(), filters=None, as_frame=True):
+        """
+        Answer an aggregate question from the cube
+
+        Args:
+            measures (list): Aggregates such as "SUM(SALES)", "AVG(DISCOUNT)", "COUNT(*)" or "PROFIT"
+            dimensions (list): Cube dimensions to group by (none for a grand total)
+            filters (dict): Dimension -> value or list of values; MONTH values are "YYYY-MM" or dates
+            as_frame (bool): If False, return a dict of numpy arrays; building the DataFrame
+                             costs more than answering from the cube
+
+        Returns:
+            pandas.DataFrame: One row per group, dimension columns followed by one column per measure
+
+        Raises:
+            ValueError: If a measure, dimension or filter is not covered by the cube
+        """
+        parsed = []
+        for measure in measures:
+            match = MEASURE_PATTERN.match(measure)
+            aggregate, column = (match.group(1), match.group(2)) if match and match.group(1) else ('SUM', match.group(3) if match else None)
+            aggregate, column = aggregate.upper(), (column or '').upper()
+            if not match or (aggregate == 'COUNT' and column != '*') or (aggregate != 'COUNT' and column not in CUBE_MEASURES):
+                raise ValueError(f"{measure} is not covered by the cube; supported: SUM/AVG of {CUBE_MEASURES} and COUNT(*)")
+            parsed.append((measure, aggregate, column))
+
+        # Slice the smallest memoized roll-up that still has every grouped and filtered dimension
+        dimensions = [dimension.upper() for dimension in dimensions]
+        filters = {dimension.upper(): values for dimension, values in (filters or {}).items()}
+        needed = tuple(dimension for dimension in self.dimensions if dimension in dimensions or dimension in filters)
+        unknown = [dimension for dimension in list(dimensions) + list(filters) if dimension not in self.dimensions]
+        if unknown:
+            raise ValueError(f"{unknown} are not cube dimensions; expected some of {self.dimensions}")
+        cuboid = self.rollup(needed)
+        rolled = cuboid.slice(filters).rollup(dimensions) if filters else cuboid.rollup(dimensions)
+        result = {}
+        for i, dimension in enumerate(rolled.dimensions):
+            dictionary = np.asarray(rolled.dictionaries[dimension])
+            result[dimension] = dictionary[rolled.codes[:, i]] if len(dictionary) else np.empty(0, dtype=object)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for label, aggregate, column in parsed:
+                if aggregate == 'COUNT':
+                    result[label] = rolled.counts
+                elif aggregate == 'AVG':
+                    result[label] = rolled.sums[column] / rolled.counts
+                else:
+                    result[label] = rolled.sums[column]
+        return pd.DataFrame(result) if as_frame else result
+
+_cube = None
+_cube_lock = threading.Lock()
+
+def get_cube():
+    """
+    Return the process-wide Orders cube, built from data/ on first use
+
+    Every call refreshes it against the current source (a hash lookup when
+    nothing changed), so appended orders are added and rewritten ones rebuild it.
+    """
+    global _cube
+    with _cube_lock:
+        if _cube is None:
+            _cube = OlapCube()
+        _cube.refresh()
+        return _cube
+
+def reset_cube():
+    """Drop the process-wide cube, so the next get_cube() rebuilds it (e.g. after a data version change)"""
+    global _cube
+    with _cube_lock:
+        _cube = None
+
+def answer(measures, dimensions=(), filters=None, sql=None, backend="local"):
+    """
+    Answer from the cube when it covers the question, otherwise run the equivalent SQL
+
+    Args:
+        measures, dimensions, filters: As for OlapCube.query
+        sql (str): Equivalent SQL, run when the cube cannot answer
+        backend (str): Backend for the SQL, as for local_engine.run_sql (local falls back to Snowflake)
+
+    Returns:
+        dict: data (pandas.DataFrame), source (cube, local or snowflake) and seconds
+    """
+    start_time = time.perf_counter()
+    try:
+        data = get_cube().query(measures, dimensions, filters)
+        return {"data": data, "source": "cube", "seconds": time.perf_counter() - start_time}
+    except ValueError as e:
+        if sql is None:
+            raise
+        print(f"Cube cannot answer this question, running SQL instead: {e}")
+    executed = run_sql(sql, backend=backend)
+    return {"data": executed["data"], "source": executed["backend"], "seconds": time.perf_counter() - start_time}
+
+if __name__ == "__main__":
+    start_time = time.perf_counter()
+    cube = get_cube()
+    print(f"Built cube: {cube.rows_aggregated} rows -> {cube.cells} cells in {time.perf_counter() - start_time:.3f}s")
+    examples = [
+        (["SUM(SALES)"], ["CATEGORY"], None),
+        (["SUM(PROFIT)"], ["REGION"], None),
+        (["AVG(DISCOUNT)"], ["CATEGORY"], None),
+        (["SUM(SALES)", "COUNT(*)"], ["MONTH"], {"REGION": "West"}),
+        (["SUM(SALES)", "SUM(PROFIT)"], ["SEGMENT", "SHIP_MODE"], {"CATEGORY": ["Technology", "Furniture"]}),
+    ]
+    for measures, dimensions, filters in examples:
+        start_time = time.perf_counter()
+        cube.query(measures, dimensions, filters, as_frame=False)
+        cold = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        result = cube.query(measures, dimensions, filters, as_frame=False)
+        warm = time.perf_counter() - start_time
+        print(f"{', '.join(measures)} by {', '.join(dimensions)} {filters or ''}: "
+              f"{len(result[measures[0]])} rows in {cold * 1e6:.0f} µs (first), {warm * 1e6:.0f} µs (memoized roll-up)")
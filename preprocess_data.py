@@ -0,0 +1,287 @@
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Directory holding the source CSV files
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Directory the typed Parquet files are written to before staging
+PARQUET_DIR = os.path.join(DATA_DIR, 'parquet')
+
+# Typed Parquet copies of the order files ingest_daemon.py appended to Orders, named in load order.
+# The default Orders source is superstore.csv followed by these files, as in the warehouse.
+INGESTED_ORDERS_DIR = os.getenv('INGESTED_ORDERS_DIR', os.path.join(DATA_DIR, 'ingested'))
+
+# Parquet codec; Snowflake reads Snappy-compressed Parquet natively
+PARQUET_COMPRESSION = 'snappy'
+
+# Which row survives when a dimension key repeats in its source file:
+#   latest        - the row with the most recent recency_column value (later in the file on ties)
+#   first         - the first row in the file
+#   most_complete - the row with the most non-empty values (then latest)
+SURVIVORSHIP_RULES = ('latest', 'first', 'most_complete')
+SURVIVORSHIP_RULE = os.getenv('SETUP_SURVIVORSHIP_RULE', 'latest').lower()
+
+# Tables conformed to one row per key before loading; Snowflake does not enforce PRIMARY KEY
+DIMENSION_TABLES = ('Customers', 'Products')
+
+# Column layout of each table: (CSV header, table column, type) in table order.
+# Types: int, float, string, date. Date columns are parsed with the table's date_format.
+# key is the column that must be unique once loaded; recency_column orders versions of a dimension row.
+TABLE_SCHEMAS = {
+    'Orders': {
+        'source': 'superstore.csv',
+        'date_format': '%m/%d/%Y',
+        'key': 'ROW_ID',
+        'columns': [
+            ('Row ID', 'ROW_ID', 'int'),
+            ('Order ID', 'ORDER_ID', 'string'),
+            ('Order Date', 'ORDER_DATE', 'date'),
+            ('Ship Date', 'SHIP_DATE', 'date'),
+            ('Ship Mode', 'SHIP_MODE', 'string'),
+            ('Customer ID', 'CUSTOMER_ID', 'string'),
+            ('Customer Name', 'CUSTOMER_NAME', 'string'),
+            ('Segment', 'SEGMENT', 'string'),
+            ('Country', 'COUNTRY', 'string'),
+            ('City', 'CITY', 'string'),
+            ('State', 'STATE', 'string'),
+            ('Postal Code', 'POSTAL_CODE', 'string'),
+            ('Region', 'REGION', 'string'),
+            ('Product ID', 'PRODUCT_ID', 'string'),
+            ('Category', 'CATEGORY', 'string'),
+            ('Sub-Category', 'SUB_CATEGORY', 'string'),
+            ('Product Name', 'PRODUCT_NAME', 'string'),
+            ('Sales', 'SALES', 'float'),
+            ('Quantity', 'QUANTITY', 'int'),
+            ('Discount', 'DISCOUNT', 'float'),
+            ('Profit', 'PROFIT', 'float'),
+        ]
+    },
+    'Customers': {
+        'source': 'superstore_crm_customers.csv',
+        'date_format': '%Y-%m-%d',
+        'key': 'CUSTOMER_ID',
+        'recency_column': 'CUSTOMER_SINCE',
+        'columns': [
+            ('Customer ID', 'CUSTOMER_ID', 'string'),
+            ('Customer Since', 'CUSTOMER_SINCE', 'date'),
+            ('Email', 'EMAIL', 'string'),
+            ('Phone', 'PHONE', 'string'),
+            ('Customer Tier', 'CUSTOMER_TIER', 'string'),
+            ('Account Manager', 'ACCOUNT_MANAGER', 'string'),
+        ]
+    },
+    'Products': {
+        'source': 'superstore_product_descriptions.csv',
+        'date_format': '%Y-%m-%d',
+        'key': 'PRODUCT_ID',
+        'recency_column': 'RELEASE_DATE',
+        'columns': [
+            ('Product ID', 'PRODUCT_ID', 'string'),
+            ('Brand', 'BRAND', 'string'),
+            ('Warranty Years', 'WARRANTY_YEARS', 'int'),
+            ('Material', 'MATERIAL', 'string'),
+            ('Release Date', 'RELEASE_DATE', 'date'),
+            ('Sustainability Rating', 'SUSTAINABILITY_RATING', 'string'),
+        ]
+    }
+}
+
+ARROW_TYPES = {
+    'int': pa.int64(),
+    'float': pa.float64(),
+    'string': pa.string(),
+    'date': pa.date32(),
+}
+
+def arrow_schema(table):
+    """Return the Arrow schema matching a table's Snowflake DDL"""
+    return pa.schema([(column, ARROW_TYPES[kind]) for _, column, kind in TABLE_SCHEMAS[table]['columns']])
+
+def source_path(table, data_dir=DATA_DIR):
+    """Return the path of a table's source CSV file"""
+    return os.path.join(data_dir, TABLE_SCHEMAS[table]['source'])
+
+def normalize_frame(raw, table):
+    """
+    Convert a frame of raw CSV text (CSV headers, str values) into the table's typed columns
+
+    Every column is converted in one vectorized pass. Values that do not parse
+    raise a ValueError instead of being dropped, unlike COPY with ON_ERROR = 'CONTINUE'.
+    """
+    schema = TABLE_SCHEMAS[table]
+    missing = [header for header, _, _ in schema['columns'] if header not in raw.columns]
+    if missing:
+        raise ValueError(f"{table}: source is missing columns {missing}")
+
+    typed = {}
+    for header, column, kind in schema['columns']:
+        values = raw[header].str.strip()
+        if kind == 'int':
+            converted = pd.to_numeric(values, errors='coerce').astype('Int64')
+        elif kind == 'float':
+            converted = pd.to_numeric(values, errors='coerce').astype('float64')
+        elif kind == 'date':
+            converted = pd.to_datetime(values, format=schema['date_format'], errors='coerce').dt.date
+        else:
+            converted = values.replace('', None)
+
+        bad_values = converted.isna() & (values != '')
+        if bad_values.any():
+            examples = values[bad_values].head(3).tolist()
+            raise ValueError(f"{table}.{column}: {int(bad_values.sum())} values are not valid {kind} (e.g. {examples})")
+        typed[column] = converted
+
+    df = pd.DataFrame(typed)
+    if table == 'Orders':
+        # Leading zeros of New England ZIP codes were lost upstream (e.g. 5408 -> 05408)
+        df['POSTAL_CODE'] = df['POSTAL_CODE'].str.zfill(5)
+    return df
+
+def read_typed_csv(table, path=None):
+    """
+    Read a table's source CSV into a typed pandas DataFrame named like the Snowflake table
+
+    The UTF-8 BOM in superstore.csv is stripped, dates are parsed with the table's
+    explicit format and numeric columns are typed.
+
+    Args:
+        table (str): Orders, Customers or Products
+        path (str): CSV to read (default: the table's file in data/)
+    """
+    raw = pd.read_csv(path or source_path(table), encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    return normalize_frame(raw, table)
+
+def to_arrow_table(df, table):
+    """Convert a typed DataFrame to an Arrow table with the table's exact schema"""
+    return pa.Table.from_pandas(df, schema=arrow_schema(table), preserve_index=False)
+
+def conform_dimension(df, table, rule=SURVIVORSHIP_RULE):
+    """
+    Keep exactly one row per key of a dimension table, chosen by a survivorship rule
+
+    The surviving rows keep their original order and index, so the same
+    selection can be applied to the raw CSV rows.
+
+    Args:
+        df (DataFrame): Typed table rows (see normalize_frame)
+        table (str): Customers or Products
+        rule (str): One of SURVIVORSHIP_RULES
+
+    Returns:
+        tuple: (surviving rows, dropped duplicate rows)
+    """
+    if rule not in SURVIVORSHIP_RULES:
+        raise ValueError(f"Unknown survivorship rule {rule}; expected one of {SURVIVORSHIP_RULES}")
+    key = TABLE_SCHEMAS[table]['key']
+    recency_column = TABLE_SCHEMAS[table]['recency_column']
+
+    ranked = df.assign(_position=range(len(df)), _filled=df.notna().sum(axis=1))
+    if rule == 'first':
+        by, ascending = ['_position'], [True]
+    elif rule == 'latest':
+        by, ascending = [recency_column, '_position'], [False, False]
+    else:
+        by, ascending = ['_filled', recency_column, '_position'], [False, False, False]
+    ranked = ranked.sort_values(by, ascending=ascending, na_position='last', kind='stable')
+    survivors = ranked.drop_duplicates(key, keep='first').sort_values('_position').index
+    return df.loc[survivors], df.drop(survivors)
+
+def write_duplicates_report(dropped, table, output_dir=PARQUET_DIR):
+    """
+    Write the dropped duplicate rows of a table, with their line number in the source CSV
+
+    Returns:
+        str: Path of the report
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    report_path = os.path.join(output_dir, f"{table.lower()}_dropped_duplicates.csv")
+    # Line 1 is the header, so data row i is on line i + 2
+    dropped.assign(SOURCE_LINE=dropped.index + 2).to_csv(report_path, index=False)
+    return report_path
+
+def prepare_load_file(table, path=None, output_dir=PARQUET_DIR, file_format='parquet', rule=SURVIVORSHIP_RULE):
+    """
+    Validate a source CSV, conform dimension keys and write the file to stage
+
+    Parquet output is typed and columnar, matching the table schema. CSV output
+    is the source file itself, minus the dropped duplicate rows.
+
+    Args:
+        table (str): Orders, Customers or Products
+        path (str): Source CSV (default: the table's file in data/)
+        output_dir (str): Directory the prepared file is written to
+        file_format (str): parquet or csv
+        rule (str): Survivorship rule for dimension tables (see SURVIVORSHIP_RULES)
+
+    Returns:
+        dict: table, source_path, load_path, rows, source_rows, duplicates_dropped, duplicates_report,
+              csv_bytes, load_bytes and seconds
+    """
+    start_time = time.time()
+    path = path or source_path(table)
+    os.makedirs(output_dir, exist_ok=True)
+    load_path = os.path.join(output_dir, f"{table.lower()}.{file_format}")
+
+    raw = pd.read_csv(path, encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    typed = normalize_frame(raw, table)
+    duplicates_report = None
+    dropped_rows = 0
+    if table in DIMENSION_TABLES:
+        typed, dropped = conform_dimension(typed, table, rule)
+        dropped_rows = len(dropped)
+        duplicates_report = write_duplicates_report(dropped, table, output_dir)
+
+    if file_format == 'parquet':
+        pq.write_table(to_arrow_table(typed, table), load_path, compression=PARQUET_COMPRESSION)
+    elif file_format == 'csv':
+        raw.loc[typed.index].to_csv(load_path, index=False)
+    else:
+        raise ValueError(f"Unknown format {file_format}; expected parquet or csv")
+
+    return {
+        'table': table,
+        'source_path': path,
+        'load_path': load_path,
+        'rows': len(typed),
+        'source_rows': len(raw),
+        'duplicates_dropped': dropped_rows,
+        'duplicates_report': duplicates_report,
+        'csv_bytes': os.path.getsize(path),
+        'load_bytes': os.path.getsize(load_path),
+        'seconds': time.time() - start_time
+    }
+
+def convert_to_parquet(table, path=None, output_dir=PARQUET_DIR, rule=SURVIVORSHIP_RULE):
+    """
+    Convert one source CSV to a compressed, columnar Parquet file matching the table schema
+
+    Dimension tables are conformed to one row per key first (see prepare_load_file).
+
+    Returns:
+        dict: prepare_load_file() result, plus parquet_path and parquet_bytes
+    """
+    result = prepare_load_file(table, path, output_dir, 'parquet', rule)
+    result.update(parquet_path=result['load_path'], parquet_bytes=result['load_bytes'])
+    return result
+
+def print_conversion_report(results):
+    """Print rows, dropped duplicates, CSV bytes against prepared bytes and conversion time per table"""
+    print(f"{'Table':<10} {'Rows':>8} {'Dropped':>8} {'CSV bytes':>12} {'Load bytes':>11} {'Ratio':>6} {'Seconds':>8}")
+    for result in results:
+        ratio = result['load_bytes'] / result['csv_bytes'] if result['csv_bytes'] else 0
+        print(f"{result['table']:<10} {result['rows']:>8} {result['duplicates_dropped']:>8} {result['csv_bytes']:>12} "
+              f"{result['load_bytes']:>11} {ratio:>6.2f} {result['seconds']:>8.3f}")
+    for result in results:
+        if result['duplicates_dropped']:
+            print(f"{result['table']}: kept {result['rows']} of {result['source_rows']} rows, "
+                  f"dropped duplicates listed in {result['duplicates_report']}")
+
+if __name__ == "__main__":
+    print_conversion_report([convert_to_parquet(table) for table in TABLE_SCHEMAS])
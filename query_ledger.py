@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from dotenv import load_dotenv
+from cancellation import CANCEL_POLL_SECONDS, RequestCancelled
+
+# Load environment variables
+load_dotenv()
+
+# Application name written into every QUERY_TAG so our statements are easy to find in QUERY_HISTORY
+QUERY_TAG_APP = "superstore_cortex_poc"
+
+# Local SQLite file holding client-side query timings
+LEDGER_PATH = os.getenv('QUERY_LEDGER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_ledger.sqlite'))
+
+_ledger_lock = threading.Lock()
+_ledger_initialized = False
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_ledger (
+    query_id TEXT,
+    feature TEXT NOT NULL,
+    conversation_id TEXT,
+    question_hash TEXT,
+    query_tag TEXT,
+    statement TEXT,
+    status TEXT,
+    error_message TEXT,
+    submit_time REAL,
+    first_row_seconds REAL,
+    last_row_seconds REAL,
+    rows_fetched INTEGER,
+    bytes_fetched INTEGER
+)
+"""
+
+def build_query_tag(feature, conversation_id=None, question=None):
+    """
+    Build the structured tag attached to a statement
+
+    Args:
+        feature (str): Feature issuing the statement (e.g. "chat_sql_exec", "data_explorer", "setup")
+        conversation_id (str): Cortex Agent conversation the statement belongs to, if any
+        question (str): Natural-language question behind the statement; only its hash is kept
+
+    Returns:
+        dict: Tag with app, feature, conversation_id and question_hash keys
+    """
+    question_hash = hashlib.sha256(question.encode('utf-8')).hexdigest()[:16] if question else None
+    return {
+        "app": QUERY_TAG_APP,
+        "feature": feature,
+        "conversation_id": conversation_id,
+        "question_hash": question_hash
+    }
+
+def tag_statement_params(tag):
+    """Return statement parameters that set QUERY_TAG for a single cursor.execute call"""
+    return {"QUERY_TAG": json.dumps(tag, separators=(',', ':'))}
+
+def set_session_query_tag(conn, tag):
+    """
+    Tag every statement on a connection, for code paths whose statements we do not issue ourselves
+    """
+    cursor = conn.cursor()
+    cursor.execute("ALTER SESSION SET QUERY_TAG = %s", (json.dumps(tag, separators=(',', ':')),))
+    cursor.close()
+
+def _connect_ledger():
+    global _ledger_initialized
+    ledger = sqlite3.connect(LEDGER_PATH, timeout=10)
+    if not _ledger_initialized:
+        ledger.execute(LEDGER_SCHEMA)
+        ledger.commit()
+        _ledger_initialized = True
+    return ledger
+
+def record_query(tag, statement, query_id=None, status="success", error_message=None,
+                 submit_time=None, first_row_seconds=None, last_row_seconds=None,
+                 rows_fetched=None, bytes_fetched=None):
+    """
+    Append one statement's client-side timings to the local ledger
+
+    Timings are seconds relative to submit_time. Recording failures are printed
+    and swallowed so the ledger can never break a query.
+    """
+    try:
+        with _ledger_lock:
+            ledger = _connect_ledger()
+            ledger.execute(
+                "INSERT INTO query_ledger VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    query_id,
+                    tag.get("feature"),
+                    tag.get("conversation_id"),
+                    tag.get("question_hash"),
+                    json.dumps(tag, separators=(',', ':')),
+                    statement.strip()[:1000],
+                    status,
+                    error_message,
+                    submit_time,
+                    first_row_seconds,
+                    last_row_seconds,
+                    rows_fetched,
+                    bytes_fetched
+                )
+            )
+            ledger.commit()
+            ledger.close()
+    except Exception as e:
+        print(f"Error recording query in ledger: {e}")
+
+def cancel_query(conn, query_id):
+    """Stop a running statement in the warehouse by its query ID"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT SYSTEM$CANCEL_QUERY(%s)", (query_id,))
+        print(f"Cancelled query {query_id}: {cursor.fetchone()[0]}")
+    finally:
+        cursor.close()
+
+def execute_tagged(cursor, statement, tag, params=None, timeout=None, cancel_token=None):
+    """
+    Execute a statement with its QUERY_TAG and record its timings in the ledger
+
+    Use this for statements whose results are not fetched as a table (DDL, PUT, COPY, sql_exec).
+
+    With a cancel_token the statement is submitted asynchronously and polled every
+    CANCEL_POLL_SECONDS; if the token is cancelled first, the statement is stopped
+    with SYSTEM$CANCEL_QUERY, recorded with status "cancelled" and
+    RequestCancelled is raised.
+
+    Returns:
+        The cursor, after execution
+    """
+    if cancel_token is not None:
+        return _execute_cancellable(cursor, statement, tag, params, timeout, cancel_token)
+    submit_time = time.time()
+    try:
+        cursor.execute(statement, params, timeout=timeout, _statement_params=tag_statement_params(tag))
+    except Exception as e:
+        record_query(tag, statement, query_id=getattr(cursor, 'sfqid', None), status="error",
+                     error_message=str(e), submit_time=submit_time,
+                     last_row_seconds=time.time() - submit_time)
+        raise
+    elapsed = time.time() - submit_time
+    record_query(tag, statement, query_id=cursor.sfqid, submit_time=submit_time,
+                 first_row_seconds=elapsed, last_row_seconds=elapsed,
+                 rows_fetched=cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else None)
+    return cursor
+
+def _execute_cancellable(cursor, statement, tag, params, timeout, cancel_token):
+    cancel_token.raise_if_cancelled()
+    submit_time = time.time()
+    query_id = None
+    try:
+        cursor.execute_async(statement, params, timeout=timeout, _statement_params=tag_statement_params(tag))
+        query_id = cursor.sfqid
+        conn = cursor.connection
+        while conn.is_still_running(conn.get_query_status(query_id)):
+            if cancel_token.wait(CANCEL_POLL_SECONDS):
+                cancel_query(conn, query_id)
+                record_query(tag, statement, query_id=query_id, status="cancelled",
+                             error_message=cancel_token.reason, submit_time=submit_time,
+                             last_row_seconds=time.time() - submit_time)
+                raise RequestCancelled(cancel_token.reason)
+        # Raises if the statement failed, then attaches its result to the cursor
+        conn.get_query_status_throw_if_error(query_id)
+        cursor.get_results_from_sfqid(query_id)
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        record_query(tag, statement, query_id=query_id, status="error",
+                     error_message=str(e), submit_time=submit_time,
+                     last_row_seconds=time.time() - submit_time)
+        raise
+    elapsed = time.time() - submit_time
+    record_query(tag, statement, query_id=query_id, submit_time=submit_time,
+                 first_row_seconds=elapsed, last_row_seconds=elapsed,
+                 rows_fetched=cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else None)
+    return cursor
+
+def top_slowest_features(n=10, since=None):
+    """
+    Rank features by their average end-to-end query time
+
+    Args:
+        n (int): Number of features to return
+        since (float): Only consider statements submitted after this time.time() value
+
+    Returns:
+        list: Dicts with feature, query_count, error_count, cancelled_count, avg_seconds, max_seconds,
+              total_seconds, rows_fetched and bytes_fetched, slowest first
+    """
+    with _ledger_lock:
+        ledger = _connect_ledger()
+        rows = ledger.execute(
+            """
+            SELECT feature,
+                   COUNT(*),
+                   SUM(CASE WHEN status NOT IN ('success', 'cancelled') THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END),
+                   AVG(last_row_seconds),
+                   MAX(last_row_seconds),
+                   SUM(last_row_seconds),
+                   SUM(rows_fetched),
+                   SUM(bytes_fetched)
+            FROM query_ledger
+            WHERE submit_time >= ?
+            GROUP BY feature
+            ORDER BY AVG(last_row_seconds) DESC
+            LIMIT ?
+            """,
+            (since or 0, n)
+        ).fetchall()
+        ledger.close()
+
+    columns = ["feature", "query_count", "error_count", "cancelled_count", "avg_seconds", "max_seconds",
+               "total_seconds", "rows_fetched", "bytes_fetched"]
+    return [dict(zip(columns, row)) for row in rows]
+
+def feature_latency(feature, statement=None, since=None):
+    """
+    Summarize the recorded times of one feature, e.g. app_rerun for Streamlit rerun latency
+
+    Args:
+        feature (str): Feature to summarize
+        statement (str): Only consider entries with this statement text
+        since (float): Only consider entries submitted after this time.time() value
+
+    Returns:
+        dict: count, p50_seconds, p95_seconds and max_seconds (None when there are no entries)
+    """
+    with _ledger_lock:
+        ledger = _connect_ledger()
+        seconds = sorted(row[0] for row in ledger.execute(
+            """
+            SELECT last_row_seconds FROM query_ledger
+            WHERE feature = ? AND (? IS NULL OR statement = ?) AND submit_time >= ?
+                  AND last_row_seconds IS NOT NULL
+            """,
+            (feature, statement, statement, since or 0)
+        ).fetchall())
+        ledger.close()
+
+    def percentile(fraction):
+        return seconds[min(int(fraction * len(seconds)), len(seconds) - 1)] if seconds else None
+
+    return {"count": len(seconds), "p50_seconds": percentile(0.5), "p95_seconds": percentile(0.95),
+            "max_seconds": seconds[-1] if seconds else None}
+
+def slowest_queries(n=10, feature=None):
+    """
+    Return the n slowest recorded statements, optionally for one feature
+
+    The query_id column matches QUERY_HISTORY.QUERY_ID for joining warehouse-side statistics.
+    """
+    with _ledger_lock:
+        ledger = _connect_ledger()
+        ledger.row_factory = sqlite3.Row
+        rows = ledger.execute(
+            """
+            SELECT * FROM query_ledger
+            WHERE (? IS NULL OR feature = ?)
+            ORDER BY last_row_seconds DESC
+            LIMIT ?
+            """,
+            (feature, feature, n)
+        ).fetchall()
+        ledger.close()
+    return [dict(row) for row in rows]
+
+if __name__ == "__main__":
+    print("=== Slowest features ===")
+    for row in top_slowest_features():
+        print(f"{row['feature']:<20} {row['query_count']:>6} queries  {row['cancelled_count']:>4} cancelled  avg {row['avg_seconds'] or 0:.3f}s  max {row['max_seconds'] or 0:.3f}s")
@@ -0,0 +1,400 @@
+import os
+import re
+import json
+import time
+import difflib
+import threading
+from dotenv import load_dotenv
+from preprocess_data import TABLE_SCHEMAS
+from semantic_query import compile_query, execute_plan, plan_to_sql, table_frame, get_semantic_model
+from olap_cube import CUBE_DIMENSIONS, CUBE_MEASURES, get_cube
+from local_engine import run_sql
+from query_ledger import build_query_tag
+
+# Load environment variables
+load_dotenv()
+
+# Questions matched with a lower confidence go to the Cortex Agent instead
+ROUTER_MIN_CONFIDENCE = float(os.getenv('ROUTER_MIN_CONFIDENCE', '0.85'))
+
+# Where routed questions run:
+#   local     - the structured query compiler over data/ (no warehouse round trip)
+#   snowflake - the compiled SQL on the warehouse
+ROUTER_BACKEND = os.getenv('ROUTER_BACKEND', 'local').lower()
+
+# Words for the measures a question can ask about: (column, aggregate)
+MEASURE_WORDS = {
+    'sales': ('SALES', 'SUM'),
+    'revenue': ('SALES', 'SUM'),
+    'profit': ('PROFIT', 'SUM'),
+    'quantity': ('QUANTITY', 'SUM'),
+    'units': ('QUANTITY', 'SUM'),
+    'discount': ('DISCOUNT', 'AVG'),
+    'discount rate': ('DISCOUNT', 'AVG'),
+}
+
+# Words for the dimensions a question can group by, as ORDERS columns or TABLE.COLUMN
+DIMENSION_WORDS = {
+    'region': 'REGION',
+    'state': 'STATE',
+    'city': 'CITY',
+    'segment': 'SEGMENT',
+    'ship mode': 'SHIP_MODE',
+    'category': 'CATEGORY',
+    'sub-category': 'SUB_CATEGORY',
+    'sub category': 'SUB_CATEGORY',
+    'product': 'PRODUCT_NAME',
+    'customer': 'CUSTOMER_NAME',
+    'customer tier': 'CUSTOMERS.CUSTOMER_TIER',
+    'tier': 'CUSTOMERS.CUSTOMER_TIER',
+    'account manager': 'CUSTOMERS.ACCOUNT_MANAGER',
+    'brand': 'PRODUCTS.BRAND',
+    'material': 'PRODUCTS.MATERIAL',
+    'sustainability rating': 'PRODUCTS.SUSTAINABILITY_RATING',
+}
+
+# Columns returned when a question lists customers or products
+CUSTOMER_COLUMNS = ['CUSTOMER_ID', 'CUSTOMER_TIER', 'ACCOUNT_MANAGER', 'EMAIL', 'PHONE']
+PRODUCT_COLUMNS = ['PRODUCT_ID', 'BRAND', 'MATERIAL', 'SUSTAINABILITY_RATING', 'WARRANTY_YEARS']
+
+def _top_n(slots):
+    column, aggregate = slots["measure"]
+    measure = f"{aggregate}({column})"
+    return {"measures": [measure], "dimensions": [slots["entity"]],
+            "order_by": [{"column": measure, "direction": "desc"}], "limit": int(slots["n"])}
+
+def _measure_by_dimension(slots):
+    column, aggregate = slots["measure"]
+    aggregate = {'average': 'AVG', 'avg': 'AVG', 'total': 'SUM'}.get(slots.get("aggregate"), aggregate)
+    return {"measures": [f"{aggregate}({column})"], "dimensions": [slots["dimension"]]}
+
+def _extreme(slots):
+    column, aggregate = slots["measure"]
+    measure = f"{aggregate}({column})"
+    direction = 'asc' if slots["direction"] in ('lowest', 'least') else 'desc'
+    return {"measures": [measure], "dimensions": [slots["dimension"]],
+            "order_by": [{"column": measure, "direction": direction}], "limit": 1}
+
+def _top_spender(slots):
+    direction = 'asc' if slots["direction"] == 'least' else 'desc'
+    return {"measures": ["SUM(SALES)"], "dimensions": [slots["dimension"]],
+            "order_by": [{"column": "SUM(SALES)", "direction": direction}], "limit": 1}
+
+def _customers_where(column):
+    return lambda slots: {"table": "CUSTOMERS", "dimensions": CUSTOMER_COLUMNS,
+                          "filters": [{"column": column, "op": "=", "value": slots["value"]}]}
+
+def _products_where(column):
+    return lambda slots: {"table": "PRODUCTS", "dimensions": PRODUCT_COLUMNS,
+                          "filters": [{"column": column, "op": "=", "value": slots["value"]}]}
+
+def _average_warranty(slots):
+    return {"table": "PRODUCT_SUMMARY", "measures": ["AVG(PRODUCTS.WARRANTY_YEARS)"],
+            "filters": [{"column": "CATEGORY", "op": "=", "value": slots["value"]}]}
+
+# Question shapes the router answers without the LLM. Patterns match the normalized question
+# (lower case, no quotes or trailing punctuation). Slots are resolved by the kind in "slots":
+#   measure / dimension - a MEASURE_WORDS / DIMENSION_WORDS entry
+#   (TABLE, COLUMN)     - a value present in that column of the data
+# Other named groups (n, direction, aggregate) are passed through as matched.
+QUESTION_TEMPLATES = [
+    {
+        "name": "top_n_by_measure",
+        "pattern": r"(?:show me |list |what are )?(?:the )?top (?P<n>\d{1,3}) (?P<entity>[a-z -]+?) by (?P<measure>[a-z ]+)",
+        "slots": {"entity": "dimension", "measure": "measure"},
+        "build": _top_n,
+    },
+    {
+        "name": "extreme_dimension",
+        "pattern": r"which (?P<dimension>[a-z -]+?) (?:has|had|have) the (?P<direction>highest|lowest|most|least) (?:total |average )?(?P<measure>[a-z ]+)",
+        "slots": {"dimension": "dimension", "measure": "measure"},
+        "build": _extreme,
+    },
+    {
+        "name": "top_spender",
+        "pattern": r"which (?P<dimension>customer|segment|state|city|region) (?:has )?spent the (?P<direction>most|least)",
+        "slots": {"dimension": "dimension"},
+        "build": _top_spender,
+    },
+    {
+        "name": "measure_by_dimension",
+        "pattern": r"(?:what (?:is|are) |what's |show me |show )?(?:the )?(?P<aggregate>total |average |avg )?(?P<measure>[a-z ]+?) (?:by|per|for each) (?P<dimension>[a-z -]+)",
+        "slots": {"measure": "measure", "dimension": "dimension"},
+        "build": _measure_by_dimension,
+    },
+    {
+        "name": "customers_by_tier",
+        "pattern": r"(?:list|show)(?: me)?(?: all)?(?: the)? (?P<value>[a-z]+) tier customers",
+        "slots": {"value": ("CUSTOMERS", "CUSTOMER_TIER")},
+        "build": _customers_where("CUSTOMER_TIER"),
+    },
+    {
+        "name": "customers_by_manager",
+        "pattern": r"(?:list|show)(?: me)?(?: all)?(?: the)? customers (?:managed|handled) by (?P<value>[a-z .'-]+)",
+        "slots": {"value": ("CUSTOMERS", "ACCOUNT_MANAGER")},
+        "build": _customers_where("ACCOUNT_MANAGER"),
+    },
+    {
+        "name": "products_by_rating",
+        "pattern": r"(?:which|what|list(?: all)?|show(?: me)?(?: all)?) products (?:have|with) (?:an? )?(?P<value>[a-z]) sustainability rating",
+        "slots": {"value": ("PRODUCTS", "SUSTAINABILITY_RATING")},
+        "build": _products_where("SUSTAINABILITY_RATING"),
+    },
+    {
+        "name": "products_by_material",
+        "pattern": r"(?:list|show)(?: me)?(?: all)?(?: the)? products made (?:of|from) (?P<value>[a-z -]+)",
+        "slots": {"value": ("PRODUCTS", "MATERIAL")},
+        "build": _products_where("MATERIAL"),
+    },
+    {
+        "name": "average_warranty_by_category",
+        "pattern": r"what(?: is|'s) the average warranty(?: period| length)? (?:for|of|in) (?P<value>[a-z -]+)",
+        "slots": {"value": ("PRODUCT_SUMMARY", "CATEGORY")},
+        "build": _average_warranty,
+    },
+]
+
+_compiled_patterns = [(template, re.compile(rf"^{template['pattern']}$")) for template in QUESTION_TEMPLATES]
+
+# Compiled plans and SQL per distinct request, so a repeated question skips validation
+_plans = {}
+_plans_lock = threading.Lock()
+
+_stats = {"questions": 0, "routed": 0, "fallbacks": 0, "routed_seconds": 0.0, "by_template": {}}
+_stats_lock = threading.Lock()
+
+def normalize_question(question):
+    """Lower-case a question and drop quotes, trailing punctuation and repeated spaces"""
+    text = question.lower().replace('"', '').replace('’', "'")
+    text = re.sub(r"(?<![a-z])'|'(?![a-z])", '', text)
+    return re.sub(r"\s+", ' ', text).strip(' ?.!')
+
+def _closest(text, choices):
+    """Best match for text among choices (case-insensitive): (choice, similarity 0-1), or (None, 0)"""
+    lowered = {choice.lower(): choice for choice in choices}
+    if text in lowered:
+        return lowered[text], 1.0
+    # Plural nouns in a question ("products", "categories") name singular dimensions
+    for singular in (re.sub(r"ies$", "y", text), re.sub(r"s$", "", text)):
+        if singular in lowered:
+            return lowered[singular], 1.0
+    matches = difflib.get_close_matches(text, list(lowered), n=1, cutoff=0)
+    if not matches:
+        return None, 0.0
+    return lowered[matches[0]], difflib.SequenceMatcher(None, text, matches[0]).ratio()
+
+def known_values(table, column):
+    """Distinct values of a column in the local data, used to resolve value slots"""
+    values = table_frame(get_semantic_model(), table)[column]
+    return [str(value) for value in values.cat.categories] if hasattr(values, 'cat') else [str(v) for v in values.dropna().unique()]
+
+def _resolve(kind, text):
+    """Resolve a slot's text to its value: (value, confidence)"""
+    text = text.strip()
+    if kind == 'measure':
+        word, score = _closest(text, MEASURE_WORDS)
+        return (MEASURE_WORDS[word] if word else None), score
+    if kind == 'dimension':
+        word, score = _closest(text, DIMENSION_WORDS)
+        return (DIMENSION_WORDS[word] if word else None), score
+    return _closest(text, known_values(*kind))
+
+def route(question):
+    """
+    Match a question against QUESTION_TEMPLATES
+
+    Every template whose pattern matches is scored by its weakest slot (1.0 when
+    every slot names a known measure, dimension or data value exactly, lower for
+    near misses); the best one is returned.
+
+    Returns:
+        dict: template, confidence, slots and request (a semantic_query request), or None if no template matches
+    """
+    text = normalize_question(question)
+    best = None
+    for template, pattern in _compiled_patterns:
+        match = pattern.match(text)
+        if not match:
+            continue
+        slots = {name: (value or '').strip() for name, value in match.groupdict().items()}
+        confidence = 1.0
+        for name, kind in template["slots"].items():
+            slots[name], score = _resolve(kind, slots[name])
+            confidence = min(confidence, score)
+        if best is None or confidence > best["confidence"]:
+            best = {"template": template["name"], "confidence": confidence, "slots": slots, "build": template["build"]}
+    if best is None:
+        return None
+    try:
+        best["request"] = best.pop("build")(best["slots"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return best
+
+def _plan(request):
+    key = json.dumps(request, sort_keys=True)
+    with _plans_lock:
+        if key not in _plans:
+            plan = compile_query(request)
+            _plans[key] = (plan, plan_to_sql(plan))
+        return _plans[key]
+
+# Orders columns whose sums the warehouse returns as integers
+INTEGER_COLUMNS = {column for _, column, column_type in TABLE_SCHEMAS['Orders']['columns'] if column_type == 'int'}
+
+def _cube_query(plan):
+    """
+    Answer a plan from the OLAP cube: (data), or None if the cube does not cover it
+
+    Covered plans are sums, averages and counts of CUBE_MEASURES on Orders,
+    grouped by and filtered (=, in) on CUBE_DIMENSIONS, with no joins or time grains.
+    """
+    if plan["table"] != 'ORDERS' or plan["joins"]:
+        return None
+    measures = []
+    for measure in plan["measures"]:
+        if "metric" in measure or measure["aggregate"] not in ('SUM', 'AVG', 'COUNT'):
+            return None
+        if measure["column"] is None:
+            measures.append("COUNT(*)")
+        elif measure["aggregate"] != 'COUNT' and measure["column"] in CUBE_MEASURES:
+            measures.append(f"{measure['aggregate']}({measure['column']})")
+        else:
+            return None
+    if any(dimension["grain"] or dimension["column"] not in CUBE_DIMENSIONS for dimension in plan["dimensions"]):
+        return None
+    filters = {}
+    for condition in plan["filters"]:
+        if condition["op"] not in ('=', 'in') or condition["column"] not in CUBE_DIMENSIONS or condition["column"] in filters:
+            return None
+        filters[condition["column"]] = condition["value"]
+
+    data = get_cube().query(measures, [dimension["column"] for dimension in plan["dimensions"]], filters)
+    data.columns = [dimension["name"] for dimension in plan["dimensions"]] + [measure["name"] for measure in plan["measures"]]
+    for measure in plan["measures"]:
+        if measure["aggregate"] == 'SUM' and measure["column"] in INTEGER_COLUMNS:
+            data[measure["name"]] = data[measure["name"]].round().astype('int64')
+    if plan["order_by"]:
+        data = data.sort_values([column for column, _ in plan["order_by"]],
+                                ascending=[ascending for _, ascending in plan["order_by"]], kind='stable')
+    if plan["limit"]:
+        data = data.head(plan["limit"])
+    return data.reset_index(drop=True)
+
+def _summary(data):
+    """One-line answer text for a routed result"""
+    if data.empty:
+        return "No matching rows."
+    if len(data) == 1:
+        return ", ".join(f"{column}: {value}" for column, value in data.iloc[0].items())
+    return f"{len(data)} rows"
+
+def _count(outcome, template=None, seconds=0.0):
+    with _stats_lock:
+        _stats["questions"] += 1
+        _stats[outcome] += 1
+        if template:
+            _stats["by_template"][template] = _stats["by_template"].get(template, 0) + 1
+            _stats["routed_seconds"] += seconds
+
+def record_cached_answer(response, seconds):
+    """
+    Count a question answered from stored answers (see example_cache.py) in the hit-rate metrics
+
+    Args:
+        response (dict): The stored response, as from answer_question
+        seconds (float): Time taken to serve it
+    """
+    if response.get("routed"):
+        _count("routed", response["template"], seconds)
+    else:
+        _count("fallbacks")
+
+def answer_question(question, agent=None, conversation_id=None, min_confidence=None, backend=None, record_stats=True):
+    """
+    Answer a question from a template when one matches confidently, otherwise with the Cortex Agent
+
+    Args:
+        question (str): Natural-language question
+        agent (CortexAgent): Agent used when no template applies (no fallback if None)
+        conversation_id (str): Agent conversation to continue on fallback
+        min_confidence (float): Lowest template confidence answered directly (default ROUTER_MIN_CONFIDENCE)
+        backend (str): local or snowflake (default ROUTER_BACKEND); local questions the
+                       OLAP cube covers are answered from it
+        record_stats (bool): Count the question in router_stats(); False for answers computed
+                             ahead of time, which are counted when served
+
+    Returns:
+        dict: status and assistant_response like CortexAgent.send_message, plus routed (bool),
+              and for routed questions template, confidence, data, sql, source (cube, local
+              or snowflake) and seconds.
+              None if no template applies and there is no agent.
+    """
+    min_confidence = ROUTER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    backend = (backend or ROUTER_BACKEND).lower()
+    start_time = time.perf_counter()
+    match = route(question)
+    if match and match["confidence"] >= min_confidence:
+        try:
+            plan, sql = _plan(match["request"])
+            source = backend
+            if backend == 'local':
+                data = _cube_query(plan)
+                if data is None:
+                    data = execute_plan(plan)
+                else:
+                    source = "cube"
+            else:
+                data = run_sql(sql, backend=backend, tag=build_query_tag("router", conversation_id, question))["data"]
+            seconds = time.perf_counter() - start_time
+            if record_stats:
+                _count("routed", match["template"], seconds)
+            return {"status": "complete", "assistant_response": _summary(data), "routed": True,
+                    "template": match["template"], "confidence": match["confidence"], "data": data, "sql": sql,
+                    "source": source, "seconds": seconds}
+        except Exception as e:
+            print(f"Routed question failed, falling back to the agent: {e}")
+
+    if record_stats:
+        _count("fallbacks")
+    if agent is None:
+        return None
+    response = agent.send_message(question, conversation_id)
+    return dict(response or {"status": "error", "assistant_response": ""}, routed=False)
+
+def router_stats():
+    """
+    Hit-rate metrics since the process started
+
+    Returns:
+        dict: questions, routed, fallbacks, hit_rate, avg_routed_ms and routed counts by template
+    """
+    with _stats_lock:
+        stats = dict(_stats, by_template=dict(_stats["by_template"]))
+    stats["hit_rate"] = stats["routed"] / stats["questions"] if stats["questions"] else None
+    stats["avg_routed_ms"] = stats.pop("routed_seconds") * 1000 / stats["routed"] if stats["routed"] else None
+    return stats
+
+if __name__ == "__main__":
+    import sys
+    questions = sys.argv[1:] or [
+        "Show me the top 5 products by sales",
+        "What is the total profit by region?",
+        "Which category has the highest discount rate?",
+        "List all Gold tier customers",
+        "Which customer has spent the most?",
+        "Show me customers managed by Jason Gonzalez",
+        "Which products have an 'A' sustainability rating?",
+        "List all products made of Glass",
+        "What's the average warranty period for Office Supplies?",
+        "Why did profit drop in 2017?",
+    ]
+    for question in questions:
+        result = answer_question(question)
+        if result is None:
+            print(f"{question} -> no template, would go to the Cortex Agent")
+            continue
+        print(f"{question} -> {result['template']} ({result['confidence']:.2f}) in {result['seconds'] * 1000:.1f} ms")
+        print(result["data"].head(5).to_string())
+        print()
+    print(router_stats())
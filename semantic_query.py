@@ -0,0 +1,589 @@
+import re
+import time
+import datetime
+import threading
+import yaml
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from compact_frame import load_compact, compact_frame, decode_dates, encode_dates
+from wide_table import WIDE_TABLE_ENABLED, WIDE_DIMENSIONS, load_wide_table, wide_table_path, row_column
+from preprocess_data import TABLE_SCHEMAS
+from columnar_cache import cache_path
+from setup_database import SEMANTIC_MODEL_PATH, SUMMARY_TABLES
+
+# Load environment variables
+load_dotenv()
+
+# Aggregations a measure may use; count and count_distinct also apply to dimensions
+AGGREGATIONS = {
+    'SUM': 'sum',
+    'AVG': 'mean',
+    'MIN': 'min',
+    'MAX': 'max',
+    'MEDIAN': 'median',
+    'COUNT': 'count',
+    'COUNT_DISTINCT': 'nunique',
+}
+
+# Time grains and the pandas period each truncates to (weeks start on Monday, as DATE_TRUNC does)
+TIME_GRAINS = {
+    'day': 'D',
+    'week': 'W-SUN',
+    'month': 'M',
+    'quarter': 'Q',
+    'year': 'Y',
+}
+
+FILTER_OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'in', 'not in', 'between')
+
+# A measure in a request: AGG(COLUMN), AGG(TABLE.COLUMN) or COUNT(*)
+MEASURE_PATTERN = re.compile(r"^\s*([A-Z_]+)\s*\(\s*(\*|[A-Z_]+(?:\.[A-Z_]+)?)\s*\)\s*$", re.IGNORECASE)
+
+# Aggregate calls inside a model metric expression such as SUM(PROFIT) / NULLIF(SUM(SALES), 0)
+METRIC_AGGREGATE = re.compile(r"\b(SUM|AVG|MIN|MAX|MEDIAN|COUNT)\s*\(\s*(DISTINCT\s+)?([A-Z_]+)\s*\)", re.IGNORECASE)
+
+# What a metric expression may contain once its aggregates are replaced by placeholders
+METRIC_REMAINDER = re.compile(r"^(?:\s|_m\d+|NULLIF|\d+(?:\.\d+)?|[-+*/(),])*$")
+
+def load_semantic_model(path=SEMANTIC_MODEL_PATH):
+    """
+    Parse a Cortex Analyst semantic model into lookup tables
+
+    Returns:
+        dict: tables (name -> dict with columns, metrics and source), relationships (list)
+    """
+    with open(path, 'r') as f:
+        raw = yaml.safe_load(f)
+
+    tables = {}
+    for table in raw.get('tables', []):
+        columns = {}
+        for section, kind in (('dimensions', 'dimension'), ('time_dimensions', 'time_dimension'), ('facts', 'fact')):
+            for column in table.get(section, []):
+                columns[column['name'].upper()] = {"kind": kind, "expr": column['expr'].upper(), "data_type": column.get('data_type')}
+        tables[table['name'].upper()] = {
+            "name": table['name'].upper(),
+            "source": table['base_table']['table'].upper(),
+            "qualified_name": ".".join(table['base_table'][part].upper() for part in ('database', 'schema', 'table')),
+            "columns": columns,
+            "metrics": {metric['name'].upper(): metric['expr'] for metric in table.get('metrics', [])},
+        }
+
+    relationships = []
+    for relationship in raw.get('relationships', []):
+        relationships.append({
+            "name": relationship['name'],
+            "left_table": relationship['left_table'].upper(),
+            "right_table": relationship['right_table'].upper(),
+            "columns": [(pair['left_column'].upper(), pair['right_column'].upper()) for pair in relationship['relationship_columns']],
+            "relationship_type": relationship.get('relationship_type', 'many_to_one'),
+            "join_type": relationship.get('join_type', 'inner'),
+        })
+    return {"tables": tables, "relationships": relationships}
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_semantic_model():
+    """Return the parsed superstore_semantic_model.yaml, loaded on first use"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = load_semantic_model()
+        return _model
+
+def _resolve_column(model, base, reference, errors):
+    """
+    Find the table and column a reference (COLUMN or TABLE.COLUMN) names
+
+    Unqualified names resolve to the base table first, then to tables joined to it.
+    Only many_to_one and one_to_one relationships are followed, so a join never
+    duplicates base rows.
+
+    Returns:
+        tuple: (table name, column name, column dict), or None with a message added to errors
+    """
+    reference = reference.upper()
+    joinable = [base] + [r["right_table"] for r in model["relationships"]
+                         if r["left_table"] == base and r["relationship_type"] in ('many_to_one', 'one_to_one')]
+    if '.' in reference:
+        table, column = reference.split('.', 1)
+        if table not in joinable:
+            errors.append(f"{reference}: table {table} is not {base} or related to it")
+            return None
+        candidates = [table]
+    else:
+        column = reference
+        candidates = [table for table in joinable if column in model["tables"][table]["columns"]]
+        if base in candidates:
+            candidates = [base]
+    candidates = [table for table in candidates if column in model["tables"][table]["columns"]]
+    if not candidates:
+        errors.append(f"{reference}: no such column in {base} or the tables related to it")
+        return None
+    if len(candidates) > 1:
+        errors.append(f"{reference} is ambiguous; qualify it with one of {candidates}")
+        return None
+    return candidates[0], column, model["tables"][candidates[0]]["columns"][column]
+
+def compile_query(request, model=None):
+    """
+    Validate a structured query against the semantic model and resolve it into a plan
+
+    A request is a dict with:
+        table (str): Logical table the query is about (default ORDERS)
+        measures (list): "SUM(SALES)", "COUNT_DISTINCT(ORDER_ID)", "COUNT(*)" or a metric name
+                         declared on the table, e.g. "PROFIT_MARGIN"
+        dimensions (list): Columns to group by, "COLUMN" or "TABLE.COLUMN" of a related table
+        time_dimension (str): Time column to group by, truncated to time_grain
+        time_grain (str): day, week, month, quarter or year (default month)
+        filters (list): Dicts with column, op (=, !=, <, <=, >, >=, in, not in, between) and value
+        order_by (list): Dicts with column (a dimension or measure as written) and direction (asc or desc)
+        limit (int): Maximum rows returned
+
+    Returns:
+        dict: The plan consumed by execute_plan() and plan_to_sql()
+
+    Raises:
+        ValueError: Listing every problem found in the request
+    """
+    model = model or get_semantic_model()
+    errors = []
+    base = request.get('table', 'ORDERS').upper()
+    if base not in model["tables"]:
+        raise ValueError(f"Unknown table {base}; expected one of {sorted(model['tables'])}")
+    joins = set()
+
+    def resolve(reference):
+        resolved = _resolve_column(model, base, reference, errors)
+        if resolved and resolved[0] != base:
+            joins.add(resolved[0])
+        return resolved
+
+    measures = []
+    for measure in request.get('measures', []):
+        metric = model["tables"][base]["metrics"].get(measure.upper())
+        if metric:
+            aggregates = []
+            for aggregate, distinct, column in METRIC_AGGREGATE.findall(metric):
+                resolved = resolve(column)
+                if resolved:
+                    aggregates.append(('COUNT_DISTINCT' if distinct else aggregate.upper(), resolved[0], resolved[1]))
+            measures.append({"name": measure.upper(), "metric": metric, "aggregates": aggregates})
+            continue
+        match = MEASURE_PATTERN.match(measure)
+        if not match or match.group(1).upper() not in AGGREGATIONS:
+            errors.append(f"{measure}: expected AGG(COLUMN) with AGG one of {sorted(AGGREGATIONS)}, or a metric of {base}")
+            continue
+        aggregate, reference = match.group(1).upper(), match.group(2)
+        if reference == '*':
+            if aggregate != 'COUNT':
+                errors.append(f"{measure}: only COUNT(*) may use *")
+                continue
+            measures.append({"name": "COUNT(*)", "aggregate": aggregate, "table": base, "column": None})
+            continue
+        resolved = resolve(reference)
+        if not resolved:
+            continue
+        if resolved[2]["kind"] != 'fact' and aggregate not in ('COUNT', 'COUNT_DISTINCT', 'MIN', 'MAX'):
+            errors.append(f"{measure}: {reference} is not a fact; only COUNT, COUNT_DISTINCT, MIN and MAX apply to it")
+            continue
+        measures.append({"name": f"{aggregate}({reference.upper()})", "aggregate": aggregate, "table": resolved[0], "column": resolved[1]})
+
+    dimensions = []
+    for reference in request.get('dimensions', []):
+        resolved = resolve(reference)
+        if resolved:
+            dimensions.append({"name": resolved[1], "table": resolved[0], "column": resolved[1], "grain": None})
+
+    if request.get('time_dimension'):
+        grain = request.get('time_grain', 'month').lower()
+        resolved = resolve(request['time_dimension'])
+        if grain not in TIME_GRAINS:
+            errors.append(f"time_grain {grain}: expected one of {list(TIME_GRAINS)}")
+        elif resolved and resolved[2]["kind"] != 'time_dimension':
+            errors.append(f"{request['time_dimension']} is not a time dimension")
+        elif resolved:
+            dimensions.append({"name": f"{resolved[1]}_{grain.upper()}", "table": resolved[0], "column": resolved[1], "grain": grain})
+
+    filters = []
+    for condition in request.get('filters', []):
+        op = condition.get('op', '=').lower()
+        value = condition.get('value')
+        if op not in FILTER_OPERATORS:
+            errors.append(f"Filter on {condition.get('column')}: operator {op} is not one of {FILTER_OPERATORS}")
+            continue
+        if op in ('in', 'not in', 'between') and not isinstance(value, (list, tuple)):
+            errors.append(f"Filter on {condition.get('column')}: {op} needs a list value")
+            continue
+        if op == 'between' and len(value) != 2:
+            errors.append(f"Filter on {condition.get('column')}: between needs [low, high]")
+            continue
+        resolved = resolve(condition.get('column', ''))
+        if resolved:
+            if resolved[2]["kind"] == 'time_dimension':
+                value = [pd.Timestamp(v).date() for v in value] if isinstance(value, (list, tuple)) else pd.Timestamp(value).date()
+            filters.append({"table": resolved[0], "column": resolved[1], "op": op, "value": value})
+
+    if not measures and not dimensions:
+        errors.append("A query needs at least one measure or dimension")
+
+    output_names = [dimension["name"] for dimension in dimensions] + [measure["name"] for measure in measures]
+    order_by = []
+    for order in request.get('order_by', []):
+        column = order.get('column', '').upper()
+        direction = order.get('direction', 'asc').lower()
+        if column not in output_names:
+            errors.append(f"order_by {column}: must be one of the query's dimensions or measures {output_names}")
+        elif direction not in ('asc', 'desc'):
+            errors.append(f"order_by {column}: direction must be asc or desc")
+        else:
+            order_by.append((column, direction == 'asc'))
+
+    limit = request.get('limit')
+    if limit is not None and (not isinstance(limit, int) or limit < 1):
+        errors.append(f"limit {limit}: must be a positive integer")
+
+    if errors:
+        raise ValueError("Invalid query: " + "; ".join(errors))
+
+    join_plan = []
+    for relationship in model["relationships"]:
+        if relationship["left_table"] == base and relationship["right_table"] in joins:
+            join_plan.append(relationship)
+    return {"table": base, "joins": join_plan, "measures": measures, "dimensions": dimensions,
+            "filters": filters, "order_by": order_by, "limit": limit}
+
+# Frames derived from the local data: name -> (cache file of the data they were built from, frame)
+_frames = {}
+_frames_lock = threading.Lock()
+
+# _frames entry holding the Orders wide table
+WIDE_FRAME_KEY = "ORDERS_WIDE"
+
+def table_frame(model, table):
+    """
+    Return a logical table's rows as a compact DataFrame (see compact_frame)
+
+    Dimensions are conformed to one row per key and summary tables are computed
+    from Orders, as in Snowflake. Frames are loaded once per source version: a
+    changed source file gives a new cache file name, and the frame is rebuilt.
+    """
+    source = model["tables"][table]["source"]
+    schema_name = next((name for name in TABLE_SCHEMAS if name.upper() == source), None)
+    if schema_name:
+        # load_compact keeps one frame per source version itself
+        return load_compact(schema_name)
+    if source not in (name.upper() for name in SUMMARY_TABLES):
+        raise ValueError(f"No local data for table {source}")
+    source_key = cache_path('Orders')
+    with _frames_lock:
+        if source not in _frames or _frames[source][0] != source_key:
+            from local_engine import get_local_engine
+            name = next(name for name in SUMMARY_TABLES if name.upper() == source)
+            summary = get_local_engine().query(f"SELECT * FROM {name}", as_arrow=True)
+            _frames[source] = (source_key, compact_frame(summary.rename_columns([column.upper() for column in summary.column_names])))
+        return _frames[source][1]
+
+def clear_frames():
+    """Drop the frames loaded so far, so the next query reads the current local data"""
+    with _frames_lock:
+        _frames.clear()
+
+def _aggregate_label(aggregate, table, column):
+    """Name of the intermediate column holding one aggregate"""
+    return "COUNT(*)" if column is None else f"{aggregate}({table}.{column})"
+
+def _filter_mask(values, condition):
+    """Boolean array of the values matching a filter condition"""
+    op, value = condition["op"], condition["value"]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Evaluate on the categories once, then look the answer up by code
+        categories = pd.Series(values.cat.categories)
+        matches = np.append(_filter_mask(categories, condition), False)
+        return matches[values.cat.codes.to_numpy()]
+    if isinstance(value, datetime.date) or (isinstance(value, (list, tuple)) and value and isinstance(value[0], datetime.date)):
+        # Compact frames hold dates as day offsets
+        value = encode_dates(value)
+    if op == '=':
+        mask = values == value
+    elif op == '!=':
+        mask = values != value
+    elif op == '<':
+        mask = values < value
+    elif op == '<=':
+        mask = values <= value
+    elif op == '>':
+        mask = values > value
+    elif op == '>=':
+        mask = values >= value
+    elif op == 'in':
+        mask = values.isin(value)
+    elif op == 'not in':
+        mask = ~values.isin(value)
+    else:
+        mask = (values >= value[0]) & (values <= value[1])
+    return np.asarray(mask, dtype=bool)
+
+def _truncate(days, grain):
+    """Truncate day offsets to the date starting their day, week, month, quarter or year"""
+    # Only the distinct days are truncated, then mapped back to the rows
+    unique_days, inverse = np.unique(np.asarray(days), return_inverse=True)
+    starts = pd.Series(decode_dates(unique_days)).dt.to_period(TIME_GRAINS[grain]).dt.start_time.dt.date
+    return pd.Series(starts.to_numpy()[inverse], index=days.index)
+
+def execute_plan(plan, model=None):
+    """
+    Run a compiled plan with vectorized pandas operations over the local datasets
+
+    Filters on the base table are applied before joining, and only the columns
+    the query needs are carried through the joins. Orders questions about
+    customer or product attributes are answered from the Orders wide table
+    without joining when it is enabled (LOCAL_WIDE_TABLE).
+
+    Returns:
+        pandas.DataFrame: Dimension columns followed by measure columns, named as in the plan
+    """
+    model = model or get_semantic_model()
+    base = plan["table"]
+    referenced = {base: set()}
+    for item in plan["dimensions"] + plan["filters"] + [m for m in plan["measures"] if m.get("column")]:
+        referenced.setdefault(item["table"], set()).add(item["column"])
+    for measure in plan["measures"]:
+        for _, table, column in measure.get("aggregates", []):
+            referenced.setdefault(table, set()).add(column)
+    needed = {table: set(columns) for table, columns in referenced.items()}
+    for join in plan["joins"]:
+        needed[base].update(left for left, _ in join["columns"])
+        needed.setdefault(join["right_table"], set()).update(right for _, right in join["columns"])
+
+    wide_columns = _wide_columns(plan, model, referenced)
+    if wide_columns:
+        # Customer and product attributes are already gathered onto each order: no join needed
+        wide = wide_frame()
+        mask = np.ones(len(wide), dtype=bool)
+        for join in plan["joins"]:
+            if join["join_type"] != 'left_outer':
+                mask &= wide[row_column(model["tables"][join["right_table"]]["source"])].notna().to_numpy()
+        for condition in plan["filters"]:
+            mask &= _filter_mask(wide[wide_columns[f"{condition['table']}.{condition['column']}"]], condition)
+        rows = wide.loc[mask, sorted(set(wide_columns.values()))]
+        frame = pd.DataFrame({name: rows[column] for name, column in wide_columns.items()})
+        return _aggregate(plan, model, frame)
+
+    frame = table_frame(model, base)
+    mask = np.ones(len(frame), dtype=bool)
+    for condition in plan["filters"]:
+        if condition["table"] == base:
+            mask &= _filter_mask(frame[condition["column"]], condition)
+    frame = frame.loc[mask, sorted(needed[base])]
+    frame.columns = [f"{base}.{column}" for column in frame.columns]
+
+    for join in plan["joins"]:
+        right = join["right_table"]
+        right_frame = table_frame(model, right)[sorted(needed[right])]
+        right_frame.columns = [f"{right}.{column}" for column in right_frame.columns]
+        for left_column, right_column in join["columns"]:
+            left_key, right_key = f"{base}.{left_column}", f"{right}.{right_column}"
+            if isinstance(frame[left_key].dtype, pd.CategoricalDtype) and isinstance(right_frame[right_key].dtype, pd.CategoricalDtype):
+                # Recode the right keys onto the left categories so the merge compares integer codes
+                recoded = right_frame[right_key].cat.set_categories(frame[left_key].cat.categories)
+                right_frame = right_frame[recoded.notna().to_numpy()].assign(**{right_key: recoded[recoded.notna()]})
+        frame = frame.merge(
+            right_frame,
+            how='left' if join["join_type"] == 'left_outer' else 'inner',
+            left_on=[f"{base}.{left}" for left, _ in join["columns"]],
+            right_on=[f"{right}.{right_column}" for _, right_column in join["columns"]]
+        )
+        for condition in plan["filters"]:
+            if condition["table"] == right:
+                frame = frame[_filter_mask(frame[f"{right}.{condition['column']}"], condition)]
+    return _aggregate(plan, model, frame)
+
+def _wide_columns(plan, model, referenced):
+    """
+    Map the plan's TABLE.COLUMN references to Orders wide table columns, or return None
+    if the plan cannot be answered from it (not on Orders, no joins, or joins it does not hold)
+    """
+    base = plan["table"]
+    if not WIDE_TABLE_ENABLED or not plan["joins"] or model["tables"][base]["source"] != 'ORDERS':
+        return None
+    dimensions = {table.upper(): foreign_key for table, foreign_key in WIDE_DIMENSIONS.items()}
+    columns = {f"{base}.{column}": column for column in referenced[base]}
+    for join in plan["joins"]:
+        right = join["right_table"]
+        source = model["tables"][right]["source"]
+        if source not in dimensions or join["columns"] != [(dimensions[source], dimensions[source])]:
+            return None
+        # A dimension's key is null in SQL when an order has no match; the wide table only has the Orders key
+        if dimensions[source] in referenced.get(right, ()):
+            return None
+        columns.update({f"{right}.{column}": column for column in referenced.get(right, ())})
+    return columns
+
+def wide_frame():
+    """
+    Return the Orders wide table (see wide_table.py) as a compact DataFrame, loaded once per
+    version of its sources (the wide table file name changes with any of them)
+    """
+    source_key = wide_table_path()
+    with _frames_lock:
+        if WIDE_FRAME_KEY not in _frames or _frames[WIDE_FRAME_KEY][0] != source_key:
+            _frames[WIDE_FRAME_KEY] = (source_key, compact_frame(load_wide_table()))
+        return _frames[WIDE_FRAME_KEY][1]
+
+def _aggregate(plan, model, frame):
+    """Group the joined, filtered rows (columns named TABLE.COLUMN) and compute the plan's output"""
+    group_keys = []
+    for dimension in plan["dimensions"]:
+        source = frame[f"{dimension['table']}.{dimension['column']}"]
+        frame[dimension["name"]] = _truncate(source, dimension["grain"]) if dimension["grain"] else source
+        group_keys.append(dimension["name"])
+
+    aggregations = {}
+    for measure in plan["measures"]:
+        parts = measure.get("aggregates") or [(measure["aggregate"], measure["table"], measure["column"])]
+        for aggregate, table, column in parts:
+            if column is None:
+                aggregations[_aggregate_label(aggregate, table, column)] = (frame.columns[0], 'size')
+            else:
+                aggregations[_aggregate_label(aggregate, table, column)] = (f"{table}.{column}", AGGREGATIONS[aggregate])
+
+    if group_keys:
+        grouped = frame.groupby(group_keys, sort=False, dropna=False, observed=True)
+        result = grouped.agg(**aggregations).reset_index() if aggregations else grouped.size().reset_index()[group_keys]
+    else:
+        result = pd.DataFrame({label: [len(frame) if function == 'size' else getattr(frame[column], function)()]
+                               for label, (column, function) in aggregations.items()})
+
+    for measure in plan["measures"]:
+        if "metric" in measure:
+            result[measure["name"]] = _evaluate_metric(measure, result)
+        else:
+            result[measure["name"]] = result[_aggregate_label(measure["aggregate"], measure["table"], measure["column"])]
+    result = result[[dimension["name"] for dimension in plan["dimensions"]] + [measure["name"] for measure in plan["measures"]]]
+
+    # Give the (small) result plain values: category labels, dates and float64 measures
+    for dimension in plan["dimensions"]:
+        values = result[dimension["name"]]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            result[dimension["name"]] = values.astype(values.cat.categories.dtype)
+        elif not dimension["grain"] and model["tables"][dimension["table"]]["columns"][dimension["column"]]["kind"] == 'time_dimension':
+            result[dimension["name"]] = pd.Series(decode_dates(values)).dt.date
+    for measure in plan["measures"]:
+        if result[measure["name"]].dtype == np.float32:
+            result[measure["name"]] = result[measure["name"]].astype(np.float64)
+
+    if plan["order_by"]:
+        result = result.sort_values([column for column, _ in plan["order_by"]],
+                                    ascending=[ascending for _, ascending in plan["order_by"]], kind='stable')
+    if plan["limit"]:
+        result = result.head(plan["limit"])
+    return result.reset_index(drop=True)
+
+def _evaluate_metric(measure, result):
+    """Evaluate a metric expression over the per-group aggregates it references"""
+    namespace = {"NULLIF": lambda value, other: value.where(value != other)}
+    for i, (aggregate, table, column) in enumerate(measure["aggregates"]):
+        namespace[f"_m{i}"] = result[_aggregate_label(aggregate, table, column)].astype(float)
+    placeholders = iter(range(len(measure["aggregates"])))
+    expression = METRIC_AGGREGATE.sub(lambda _: f"_m{next(placeholders)}", measure["metric"])
+    # Only placeholders, numbers, arithmetic and NULLIF remain, so eval cannot reach anything else
+    if not METRIC_REMAINDER.match(expression):
+        raise ValueError(f"Metric {measure['name']} uses an expression the local compiler cannot evaluate: {measure['metric']}")
+    return eval(expression, {"__builtins__": {}}, namespace)
+
+def _sql_literal(value):
+    if isinstance(value, (list, tuple)):
+        return "(" + ", ".join(_sql_literal(v) for v in value) + ")"
+    if isinstance(value, datetime.date):
+        return f"'{value.isoformat()}'::DATE"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+def plan_to_sql(plan, model=None):
+    """
+    Render a compiled plan as equivalent Snowflake SQL, for display or to run it on the warehouse
+    """
+    model = model or get_semantic_model()
+    base = plan["table"]
+
+    def ref(table, column):
+        return f"{table}.{column}"
+
+    select = []
+    for dimension in plan["dimensions"]:
+        column = ref(dimension["table"], dimension["column"])
+        if dimension["grain"]:
+            column = f"DATE_TRUNC('{dimension['grain'].upper()}', {column})"
+        select.append(f'{column} AS "{dimension["name"]}"')
+    for measure in plan["measures"]:
+        if "metric" in measure:
+            resolved = iter(measure["aggregates"])
+            expression = METRIC_AGGREGATE.sub(
+                lambda match: f"{match.group(1).upper()}({match.group(2) or ''}{ref(*next(resolved)[1:])})", measure["metric"])
+        elif measure["column"] is None:
+            expression = "COUNT(*)"
+        elif measure["aggregate"] == 'COUNT_DISTINCT':
+            expression = f"COUNT(DISTINCT {ref(measure['table'], measure['column'])})"
+        else:
+            expression = f"{measure['aggregate']}({ref(measure['table'], measure['column'])})"
+        select.append(f'{expression} AS "{measure["name"]}"')
+
+    sql = f"SELECT {', '.join(select)}\nFROM {model['tables'][base]['qualified_name']} AS {base}"
+    for join in plan["joins"]:
+        right = join["right_table"]
+        conditions = " AND ".join(f"{ref(base, left)} = {ref(right, right_column)}" for left, right_column in join["columns"])
+        join_keyword = "LEFT OUTER JOIN" if join["join_type"] == 'left_outer' else "INNER JOIN"
+        sql += f"\n{join_keyword} {model['tables'][right]['qualified_name']} AS {right} ON {conditions}"
+
+    conditions = []
+    for condition in plan["filters"]:
+        column = ref(condition["table"], condition["column"])
+        if condition["op"] == 'between':
+            conditions.append(f"{column} BETWEEN {_sql_literal(condition['value'][0])} AND {_sql_literal(condition['value'][1])}")
+        else:
+            conditions.append(f"{column} {condition['op'].upper()} {_sql_literal(condition['value'])}")
+    if conditions:
+        sql += "\nWHERE " + " AND ".join(conditions)
+    if plan["dimensions"] and plan["measures"]:
+        sql += "\nGROUP BY " + ", ".join(str(i + 1) for i in range(len(plan["dimensions"])))
+    elif plan["dimensions"]:
+        sql = sql.replace("SELECT ", "SELECT DISTINCT ", 1)
+    if plan["order_by"]:
+        sql += "\nORDER BY " + ", ".join(f'"{column}" {"ASC" if ascending else "DESC"}' for column, ascending in plan["order_by"])
+    if plan["limit"]:
+        sql += f"\nLIMIT {plan['limit']}"
+    return sql
+
+def run_structured_query(request):
+    """
+    Compile and run a structured query locally, without an LLM or the warehouse
+
+    Returns:
+        dict: data (pandas.DataFrame), sql (the equivalent Snowflake SQL) and seconds
+
+    Raises:
+        ValueError: If the request does not validate against the semantic model
+    """
+    start_time = time.perf_counter()
+    plan = compile_query(request)
+    data = execute_plan(plan)
+    return {"data": data, "sql": plan_to_sql(plan), "seconds": time.perf_counter() - start_time}
+
+if __name__ == "__main__":
+    examples = [
+        {"measures": ["SUM(SALES)"], "dimensions": ["CATEGORY"], "order_by": [{"column": "SUM(SALES)", "direction": "desc"}]},
+        {"measures": ["SUM(PROFIT)", "COUNT_DISTINCT(ORDER_ID)"], "dimensions": ["CUSTOMER_TIER"]},
+        {"measures": ["SUM(SALES)"], "time_dimension": "ORDER_DATE", "time_grain": "quarter",
+         "filters": [{"column": "REGION", "op": "=", "value": "West"}], "order_by": [{"column": "ORDER_DATE_QUARTER"}], "limit": 4},
+        {"table": "PRODUCT_SUMMARY", "measures": ["PROFIT_MARGIN"], "dimensions": ["PRODUCT_NAME"],
+         "order_by": [{"column": "PROFIT_MARGIN", "direction": "desc"}], "limit": 3},
+    ]
+    for request in examples:
+        result = run_structured_query(request)
+        print(result["sql"])
+        print(result["data"].to_string())
+        print(f"{result['seconds'] * 1000:.1f} ms\n")
@@ -1,49 +1,76 @@
 import os
+import sys
+import time
 import snowflake.connector
-import pandas as pd
 from dotenv import load_dotenv
-from snowflake_connection import get_snowflake_connection
+from snowflake_connection import get_snowflake_connection, SnowflakeConnectionPool
+from query_ledger import build_query_tag, execute_tagged
+from load_manifest import load_manifest, ingested_files, file_sha256, text_sha256
+from setup_executor import run_steps, print_step_report, incomplete_steps
+from preprocess_data import TABLE_SCHEMAS, DIMENSION_TABLES, SURVIVORSHIP_RULE, source_path, prepare_load_file
 
 # Load environment variables
 load_dotenv()
 
-def setup_database():
-    """
-    Set up the Snowflake database with Superstore data
-    """
-    # Use initial connection mode to avoid requiring database and warehouse
-    conn = get_snowflake_connection(initial_connection=True)
-    if not conn:
-        print("Failed to connect to Snowflake. Please check your credentials.")
-        return False
-    
-    try:
-        cursor = conn.cursor()
-        
-        # Execute setup commands
-        setup_commands = [
-            "USE ROLE sysadmin",
-            
-            # Create database
-            "CREATE DATABASE IF NOT EXISTS SuperstoreDB",
-            
-            # Create schema
-            "CREATE SCHEMA IF NOT EXISTS SuperstoreDB.data",
-            
-            # Create warehouse
-            """
-            CREATE WAREHOUSE IF NOT EXISTS SuperstoreWarehouse
-                WITH WAREHOUSE_SIZE = 'XSMALL'
-                AUTO_SUSPEND = 300
-                AUTO_RESUME = TRUE
-                INITIALLY_SUSPENDED = TRUE
+# QUERY_TAG attached to every setup statement
+SETUP_TAG = build_query_tag("setup")
+
+# File format staged and loaded by setup: parquet (typed, preprocessed locally) or csv (raw files)
+LOAD_FORMAT = os.getenv('SETUP_LOAD_FORMAT', 'parquet').lower()
+
+# Reload a table from its staged file. FORCE because a changed file replaces the table contents
+COPY_TEMPLATES = {
+    'csv': """
+            COPY INTO SuperstoreDB.data.{table}
+            FROM @SuperstoreDB.data.SUPERSTORE_STAGE/{stage_name}
+            FILE_FORMAT = (TYPE = 'CSV' FIELD_OPTIONALLY_ENCLOSED_BY = '"' SKIP_HEADER = 1)
+            ON_ERROR = 'CONTINUE'
+            FORCE = TRUE
             """,
-            
-            # Set warehouse for use
-            "USE WAREHOUSE SuperstoreWarehouse",
-            
-            # Create Orders table (from superstore.csv)
+    # Parquet columns carry the table's names and types, so a bad file aborts instead of dropping rows
+    'parquet': """
+            COPY INTO SuperstoreDB.data.{table}
+            FROM @SuperstoreDB.data.SUPERSTORE_STAGE/{stage_name}
+            FILE_FORMAT = (TYPE = 'PARQUET')
+            MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+            ON_ERROR = 'ABORT_STATEMENT'
+            FORCE = TRUE
             """
+}
+
+# Number of threads each PUT uses to upload its file (Snowflake PARALLEL option, 1-99)
+PUT_PARALLEL = int(os.getenv('SETUP_PUT_PARALLEL', '4'))
+
+# Number of setup steps run at once, each on its own pooled connection
+SETUP_WORKERS = int(os.getenv('SETUP_WORKERS', '4'))
+
+# Statements that must run in order before anything else: each depends on the one before
+BOOTSTRAP_COMMANDS = [
+    "USE ROLE sysadmin",
+    
+    # Create database
+    "CREATE DATABASE IF NOT EXISTS SuperstoreDB",
+    
+    # Create schema
+    "CREATE SCHEMA IF NOT EXISTS SuperstoreDB.data",
+    
+    # Create warehouse
+    """
+    CREATE WAREHOUSE IF NOT EXISTS SuperstoreWarehouse
+        WITH WAREHOUSE_SIZE = 'XSMALL'
+        AUTO_SUSPEND = 300
+        AUTO_RESUME = TRUE
+        INITIALLY_SUSPENDED = TRUE
+    """,
+    
+    # Set warehouse for use
+    "USE WAREHOUSE SuperstoreWarehouse"
+]
+
+# Independent DDL that only needs the schema to exist, keyed by setup step name
+OBJECT_COMMANDS = {
+    # Create Orders table (from superstore.csv)
+    "create_orders": """
             CREATE TABLE IF NOT EXISTS SuperstoreDB.data.Orders (
                 Row_ID INT,
                 Order_ID STRING,
@@ -68,9 +95,9 @@ def setup_database():
                 Profit FLOAT
             )
             """,
-            
-            # Create Customers table (from superstore_crm_customers.csv)
-            """
+    
+    # Create Customers table (from superstore_crm_customers.csv)
+    "create_customers": """
             CREATE TABLE IF NOT EXISTS SuperstoreDB.data.Customers (
                 Customer_ID STRING PRIMARY KEY,
                 Customer_Since DATE,
@@ -80,9 +107,9 @@ def setup_database():
                 Account_Manager STRING
             )
             """,
-            
-            # Create Products table (from superstore_product_descriptions.csv)
-            """
+    
+    # Create Products table (from superstore_product_descriptions.csv)
+    "create_products": """
             CREATE TABLE IF NOT EXISTS SuperstoreDB.data.Products (
                 Product_ID STRING PRIMARY KEY,
                 Brand STRING,
@@ -92,143 +119,534 @@ def setup_database():
                 Sustainability_Rating STRING
             )
             """,
-            
-            # Create stage for data files
-            "CREATE STAGE IF NOT EXISTS SuperstoreDB.data.SUPERSTORE_STAGE FILE_FORMAT = (TYPE = 'CSV' FIELD_OPTIONALLY_ENCLOSED_BY = '\"' SKIP_HEADER = 1)"
-        ]
-        
-        # Execute each command
-        for command in setup_commands:
-            try:
-                cursor.execute(command)
-                print(f"Successfully executed: {command[:50]}...")
-            except Exception as e:
-                print(f"Error executing command: {command[:50]}...")
-                print(f"Error details: {e}")
-        
-        # Upload local CSV files to Snowflake stage
-        print("\nUploading CSV files to Snowflake stage...")
-        
-        # Get the current directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        data_dir = os.path.join(current_dir, 'data')
-        
-        # List of files to upload
-        files_to_upload = [
-            {'local_path': os.path.join(data_dir, 'superstore.csv'), 'stage_name': 'orders.csv'},
-            {'local_path': os.path.join(data_dir, 'superstore_crm_customers.csv'), 'stage_name': 'customers.csv'},
-            {'local_path': os.path.join(data_dir, 'superstore_product_descriptions.csv'), 'stage_name': 'products.csv'}
-        ]
-        
-        # Upload each file to the stage
-        for file_info in files_to_upload:
-            try:
-                # Use PUT command to upload file to stage
-                put_command = f"PUT file://{file_info['local_path']} @SuperstoreDB.data.SUPERSTORE_STAGE/{file_info['stage_name']} OVERWRITE=TRUE AUTO_COMPRESS=TRUE"
-                cursor.execute(put_command)
-                print(f"Successfully uploaded {file_info['local_path']} to stage as {file_info['stage_name']}")
-            except Exception as e:
-                print(f"Error uploading {file_info['local_path']}: {e}")
-        
-        # Load data from stage into tables
-        print("\nLoading data from stage into tables...")
-        
-        load_commands = [
+    
+    # Create the per-product search documents table (change tracking lets Cortex Search refresh incrementally)
+    "create_product_documents": """
+            CREATE TABLE IF NOT EXISTS SuperstoreDB.data.Product_Documents (
+                Product_ID STRING PRIMARY KEY,
+                Product_Name STRING,
+                Category STRING,
+                Sub_Category STRING,
+                Material STRING,
+                Brand STRING,
+                Sustainability_Rating STRING
+            ) CHANGE_TRACKING = TRUE
+            """,
+    
+    # Create stage for data files
+    "create_stage": "CREATE STAGE IF NOT EXISTS SuperstoreDB.data.SUPERSTORE_STAGE FILE_FORMAT = (TYPE = 'CSV' FIELD_OPTIONALLY_ENCLOSED_BY = '\"' SKIP_HEADER = 1)"
+}
+
+# How stale the summary tables may get behind Orders before Snowflake refreshes them
+SUMMARY_TARGET_LAG = os.getenv('SUMMARY_TARGET_LAG', '1 hour')
+
+# Pre-aggregated Orders at the grains most questions ask for, exposed as logical tables in the
+# semantic model. Distinct order counts are not additive, so only the per-customer grain carries them.
+SUMMARY_TABLES = {
+    "Daily_Sales_Summary": """
+            SELECT
+                Order_Date,
+                Category,
+                Sub_Category,
+                Region,
+                Segment,
+                Ship_Mode,
+                COUNT(*) AS Order_Lines,
+                SUM(Sales) AS Sales,
+                SUM(Quantity) AS Quantity,
+                SUM(Profit) AS Profit,
+                SUM(Discount) AS Discount_Total
+            FROM SuperstoreDB.data.Orders
+            GROUP BY Order_Date, Category, Sub_Category, Region, Segment, Ship_Mode
+            """,
+    "Customer_Summary": """
+            SELECT
+                Customer_ID,
+                MIN(Customer_Name) AS Customer_Name,
+                MIN(Segment) AS Segment,
+                COUNT(DISTINCT Order_ID) AS Order_Count,
+                COUNT(*) AS Order_Lines,
+                SUM(Sales) AS Sales,
+                SUM(Quantity) AS Quantity,
+                SUM(Profit) AS Profit,
+                MIN(Order_Date) AS First_Order_Date,
+                MAX(Order_Date) AS Last_Order_Date
+            FROM SuperstoreDB.data.Orders
+            GROUP BY Customer_ID
+            """,
+    "Product_Summary": """
+            SELECT
+                Product_ID,
+                MIN(Product_Name) AS Product_Name,
+                MIN(Category) AS Category,
+                MIN(Sub_Category) AS Sub_Category,
+                COUNT(*) AS Order_Lines,
+                SUM(Sales) AS Sales,
+                SUM(Quantity) AS Quantity,
+                SUM(Profit) AS Profit,
+                SUM(Discount) AS Discount_Total
+            FROM SuperstoreDB.data.Orders
+            GROUP BY Product_ID
             """
+}
+
+# Dynamic tables are maintained by Snowflake; REFRESH_MODE = AUTO refreshes incrementally where the query allows
+SUMMARY_TABLE_TEMPLATE = """
+        CREATE OR REPLACE DYNAMIC TABLE SuperstoreDB.data.{name}
+          TARGET_LAG = '{target_lag}'
+          WAREHOUSE = SuperstoreWarehouse
+          REFRESH_MODE = AUTO
+          AS {query}
+        """
+
+SEMANTIC_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'superstore_semantic_model.yaml')
+
+REGISTER_SEMANTIC_MODEL_COMMAND = """
+        CREATE OR REPLACE CORTEX ANALYST MODEL superstore_analyst_model
+        FROM @SuperstoreDB.data.SEMANTIC_MODELS/superstore_semantic_model.yaml
+        WAREHOUSE = SuperstoreWarehouse
+        """
+
+# Stage prefix of the order files ingest_daemon.py appends to Orders, named by content hash
+INGEST_STAGE_PREFIX = "ingest"
+
+# Appends ingested order files to Orders again after setup reloads it. FORCE because the
+# reload's TRUNCATE removed their rows; COPY takes at most 1000 named files per statement.
+INGESTED_COPY_TEMPLATE = """
             COPY INTO SuperstoreDB.data.Orders
-            FROM @SuperstoreDB.data.SUPERSTORE_STAGE/orders.csv
-            FILE_FORMAT = (TYPE = 'CSV' FIELD_OPTIONALLY_ENCLOSED_BY = '"' SKIP_HEADER = 1)
-            ON_ERROR = 'CONTINUE'
-            """,
-            
+            FROM @SuperstoreDB.data.SUPERSTORE_STAGE/{prefix}/
+            FILES = ({files})
+            FILE_FORMAT = (TYPE = 'PARQUET')
+            MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+            ON_ERROR = 'ABORT_STATEMENT'
+            FORCE = TRUE
             """
-            COPY INTO SuperstoreDB.data.Customers
-            FROM @SuperstoreDB.data.SUPERSTORE_STAGE/customers.csv
-            FILE_FORMAT = (TYPE = 'CSV' FIELD_OPTIONALLY_ENCLOSED_BY = '"' SKIP_HEADER = 1)
-            ON_ERROR = 'CONTINUE'
-            """,
-            
+INGESTED_COPY_MAX_FILES = 1000
+
+def reappend_ingested_orders(cursor, tag=SETUP_TAG):
+    """
+    Append the order files ingest_daemon.py loaded (recorded in the manifest) to a freshly reloaded Orders
+
+    Without this, reloading Orders from superstore.csv would drop every ingested row.
+
+    Returns:
+        int: Number of files appended
+    """
+    files = ingested_files()
+    for start in range(0, len(files), INGESTED_COPY_MAX_FILES):
+        names = ", ".join(f"'{name}'" for name in files[start:start + INGESTED_COPY_MAX_FILES])
+        execute_tagged(cursor, INGESTED_COPY_TEMPLATE.format(prefix=INGEST_STAGE_PREFIX, files=names), tag)
+    return len(files)
+
+def upload_file(cursor, local_path, stage_name, auto_compress=True, parallel=PUT_PARALLEL):
+    """
+    PUT one local file to the data stage
+    
+    Args:
+        cursor: Cursor to run the PUT on
+        local_path (str): File to upload
+        stage_name (str): Name of the file in the stage
+        auto_compress (bool): Gzip the file while uploading (False for already-compressed files)
+        parallel (int): PARALLEL degree of the PUT
+    """
+    put_command = (
+        f"PUT file://{local_path} @SuperstoreDB.data.SUPERSTORE_STAGE/{stage_name} "
+        f"OVERWRITE=TRUE AUTO_COMPRESS={str(auto_compress).upper()} PARALLEL={parallel}"
+    )
+    execute_tagged(cursor, put_command, SETUP_TAG)
+
+# One search document per product: its name, chosen by the same rule as Product_Summary
+# (MIN over its order lines), plus its description.
+# The document count follows the catalog size instead of the order volume.
+PRODUCT_DOCUMENTS_QUERY = """
+            SELECT
+                o.Product_ID,
+                MIN(o.Product_Name) AS Product_Name,
+                MIN(o.Category) AS Category,
+                MIN(o.Sub_Category) AS Sub_Category,
+                ANY_VALUE(p.Material) AS Material,
+                ANY_VALUE(p.Brand) AS Brand,
+                ANY_VALUE(p.Sustainability_Rating) AS Sustainability_Rating
+            FROM SuperstoreDB.data.Orders o
+            JOIN SuperstoreDB.data.Products p ON o.Product_ID = p.Product_ID
+            GROUP BY o.Product_ID
             """
-            COPY INTO SuperstoreDB.data.Products
-            FROM @SuperstoreDB.data.SUPERSTORE_STAGE/products.csv
-            FILE_FORMAT = (TYPE = 'CSV' FIELD_OPTIONALLY_ENCLOSED_BY = '"' SKIP_HEADER = 1)
-            ON_ERROR = 'CONTINUE'
+
+# Only changed documents are written, so the search service refresh stays incremental
+PRODUCT_DOCUMENTS_MERGE = f"""
+        MERGE INTO SuperstoreDB.data.Product_Documents d
+        USING ({PRODUCT_DOCUMENTS_QUERY}) s
+        ON d.Product_ID = s.Product_ID
+        WHEN MATCHED AND (
+            d.Product_Name IS DISTINCT FROM s.Product_Name
+            OR d.Category IS DISTINCT FROM s.Category
+            OR d.Sub_Category IS DISTINCT FROM s.Sub_Category
+            OR d.Material IS DISTINCT FROM s.Material
+            OR d.Brand IS DISTINCT FROM s.Brand
+            OR d.Sustainability_Rating IS DISTINCT FROM s.Sustainability_Rating
+        ) THEN UPDATE SET
+            Product_Name = s.Product_Name,
+            Category = s.Category,
+            Sub_Category = s.Sub_Category,
+            Material = s.Material,
+            Brand = s.Brand,
+            Sustainability_Rating = s.Sustainability_Rating
+        WHEN NOT MATCHED THEN INSERT
+            (Product_ID, Product_Name, Category, Sub_Category, Material, Brand, Sustainability_Rating)
+            VALUES (s.Product_ID, s.Product_Name, s.Category, s.Sub_Category, s.Material, s.Brand, s.Sustainability_Rating)
+        """
+
+# Documents of products that no longer have order lines or a description
+PRODUCT_DOCUMENTS_PRUNE = f"""
+        DELETE FROM SuperstoreDB.data.Product_Documents d
+        WHERE NOT EXISTS (SELECT 1 FROM ({PRODUCT_DOCUMENTS_QUERY}) s WHERE s.Product_ID = d.Product_ID)
+        """
+
+def refresh_product_documents(cursor, tag=SETUP_TAG):
+    """
+    Bring Product_Documents up to date with Orders and Products
+
+    Product_Documents is a plain table, so every load into Orders or Products
+    (setup, ingest_daemon.py) runs this afterwards; only changed documents are written.
+
+    Args:
+        cursor: Cursor to run the MERGE and DELETE on
+        tag (str): Query tag for both statements
+    """
+    execute_tagged(cursor, PRODUCT_DOCUMENTS_MERGE, tag)
+    execute_tagged(cursor, PRODUCT_DOCUMENTS_PRUNE, tag)
+
+SEARCH_SERVICE_TEMPLATE = """
+        CREATE OR REPLACE CORTEX SEARCH SERVICE {name}
+          ON Product_Name, Material, Brand
+          ATTRIBUTES Product_ID, Category, Sub_Category, Sustainability_Rating
+          WAREHOUSE = SuperstoreWarehouse
+          TARGET_LAG = '1 hour'
+          AS ({source})
+        """
+
+SEARCH_SERVICE_SOURCE = """
+            SELECT Product_Name, Material, Brand, Product_ID, Category, Sub_Category, Sustainability_Rating
+            FROM SuperstoreDB.data.Product_Documents
             """
-        ]
-        
-        for command in load_commands:
-            try:
-                cursor.execute(command)
-                print(f"Successfully loaded data with: {command[:50]}...")
-            except Exception as e:
-                print(f"Error loading data: {command[:50]}...")
-                print(f"Error details: {e}")
-                
-        # Create Cortex Search service for product descriptions
-        print("\nSetting up Cortex Search service...")
-        try:
-            search_service_command = """
-            CREATE OR REPLACE CORTEX SEARCH SERVICE superstore_product_search
-              ON Product_Name, Material, Brand
-              ATTRIBUTES Product_ID, Category, Sub_Category, Sustainability_Rating
-              WAREHOUSE = SuperstoreWarehouse
-              TARGET_LAG = '1 hour'
-              AS (
-                SELECT
-                    o.Product_Name,
-                    p.Material,
-                    p.Brand,
-                    o.Product_ID,
-                    o.Category,
-                    o.Sub_Category,
-                    p.Sustainability_Rating
-                FROM SuperstoreDB.data.Orders o
-                JOIN SuperstoreDB.data.Products p ON o.Product_ID = p.Product_ID
-              )
+
+# Previous definition, one document per order line; kept for benchmark_search_index.py
+LEGACY_SEARCH_SERVICE_SOURCE = """
+            SELECT
+                o.Product_Name,
+                p.Material,
+                p.Brand,
+                o.Product_ID,
+                o.Category,
+                o.Sub_Category,
+                p.Sustainability_Rating
+            FROM SuperstoreDB.data.Orders o
+            JOIN SuperstoreDB.data.Products p ON o.Product_ID = p.Product_ID
             """
-            cursor.execute(search_service_command)
-            print("Successfully created Cortex Search service for product search")
-        except Exception as e:
-            print(f"Error creating Cortex Search service: {e}")
-            
-        # Upload and register semantic model for Cortex Analyst
-        print("\nUploading semantic model for Cortex Analyst...")
+
+def search_source_rows(cursor, service_name):
+    """
+    Return the number of source documents indexed by a Cortex Search service, or None if unavailable
+    """
+    try:
+        execute_tagged(cursor, f"DESCRIBE CORTEX SEARCH SERVICE {service_name}", SETUP_TAG)
+        columns = [desc[0].lower() for desc in cursor.description]
+        row = cursor.fetchone()
+        if row and 'source_data_num_rows' in columns:
+            return row[columns.index('source_data_num_rows')]
+    except Exception as e:
+        print(f"Error describing {service_name}: {e}")
+    return None
+
+def print_search_index_report(cursor, timings):
+    """
+    Print search documents under the previous per-order-line definition against the per-product table
+    
+    Args:
+        cursor: Cursor on the setup connection
+        timings (dict): Step name -> seconds for the steps that ran (document refresh, service build)
+    """
+    execute_tagged(
+        cursor,
+        f"SELECT (SELECT COUNT(*) FROM ({LEGACY_SEARCH_SERVICE_SOURCE})), (SELECT COUNT(*) FROM SuperstoreDB.data.Product_Documents)",
+        SETUP_TAG
+    )
+    legacy_documents, product_documents = cursor.fetchone()
+    indexed = search_source_rows(cursor, "superstore_product_search")
+    print(f"Search documents: {legacy_documents} per order line before, {product_documents} per product now"
+          f"{f' ({indexed} indexed)' if indexed is not None else ''}")
+    for step, elapsed in timings.items():
+        print(f"  {step}: {elapsed:.2f}s")
+
+# Row count against distinct key count; equal when the table holds one row per key
+KEY_UNIQUENESS_QUERY = "SELECT COUNT(*), COUNT(DISTINCT {key}) FROM SuperstoreDB.data.{table}"
+
+def verify_key_uniqueness(cursor, table):
+    """
+    Check after load that a table holds exactly one row per key
+    
+    Joins declared many_to_one in the semantic model fan out (and double-count)
+    if a dimension key repeats, because Snowflake does not enforce PRIMARY KEY.
+    
+    Returns:
+        int: Number of rows in the table
+    
+    Raises:
+        ValueError: If the key is not unique
+    """
+    key = TABLE_SCHEMAS[table]['key']
+    execute_tagged(cursor, KEY_UNIQUENESS_QUERY.format(key=key, table=table), SETUP_TAG)
+    rows, keys = (int(value) for value in cursor.fetchone())
+    if rows != keys:
+        raise ValueError(f"{table} has {rows} rows for {keys} distinct {key} values")
+    print(f"{table}: {rows} rows, one per {key}")
+    return rows
+
+def print_load_report(loaded_files):
+    """
+    Print staged bytes and per-phase timings of each loaded file against its source CSV
+    """
+    print(f"\n{'Table':<10} {'Format':<8} {'Rows':>7} {'Dropped':>8} {'CSV bytes':>12} {'Staged bytes':>13} "
+          f"{'Prep s':>7} {'PUT s':>7} {'COPY s':>7}")
+    for f in loaded_files:
+        print(f"{f['table']:<10} {LOAD_FORMAT:<8} {f['rows']:>7} {f.get('duplicates_dropped', 0):>8} "
+              f"{os.path.getsize(f['csv_path']):>12} {f.get('staged_bytes', 0):>13} {f.get('preprocess_seconds', 0):>7.2f} "
+              f"{f.get('upload_seconds', 0):>7.2f} {f.get('copy_seconds', 0):>7.2f}")
+    for f in loaded_files:
+        if f.get('duplicates_dropped'):
+            print(f"{f['table']}: dropped {f['duplicates_dropped']} duplicate rows ({SURVIVORSHIP_RULE} survives), "
+                  f"see {f['duplicates_report']}")
+        if f.get('ingested_files'):
+            print(f"{f['table']}: appended {f['ingested_files']} files loaded by ingest_daemon.py again after the reload")
+
+def build_setup_steps(conn, pool, loaded_files, search_timings):
+    """
+    Declare every setup step with its dependencies and input digest for setup_executor.run_steps()
+    
+    Args:
+        conn: Initial connection; the ordered bootstrap runs on it
+        pool (SnowflakeConnectionPool): Pool the other steps run on, one connection per step
+        loaded_files (list): Receives one dict per table loaded, for print_load_report()
+        search_timings (dict): Receives search refresh and build timings, for print_search_index_report()
+    
+    Returns:
+        list: Step dicts
+    """
+    def run_pooled(*statements):
+        def run():
+            with pool.connection() as pooled_conn:
+                cursor = pooled_conn.cursor()
+                for statement in statements:
+                    execute_tagged(cursor, statement, SETUP_TAG)
+                cursor.close()
+        return run
+    
+    def bootstrap():
+        cursor = conn.cursor()
+        for command in BOOTSTRAP_COMMANDS:
+            execute_tagged(cursor, command, SETUP_TAG)
+        cursor.close()
+    
+    steps = [{"name": "bootstrap", "run": bootstrap, "digest": None}]
+    for name, command in OBJECT_COMMANDS.items():
+        steps.append({"name": name, "run": run_pooled(command), "depends_on": ["bootstrap"], "digest": text_sha256(command)})
+    
+    # Per table: validate and stage the file, then reload the table from it
+    prepared = {}
+    for table in TABLE_SCHEMAS:
+        csv_path = source_path(table)
+        stage_name = f"{table.lower()}.{LOAD_FORMAT}"
+        
+        def stage(table=table, csv_path=csv_path, stage_name=stage_name):
+            start_time = time.time()
+            result = prepare_load_file(table, csv_path, file_format=LOAD_FORMAT)
+            file_info = dict(
+                table=table,
+                csv_path=csv_path,
+                rows=result['rows'],
+                duplicates_dropped=result['duplicates_dropped'],
+                duplicates_report=result['duplicates_report'],
+                staged_bytes=result['load_bytes'],
+                preprocess_seconds=time.time() - start_time
+            )
+            start_time = time.time()
+            with pool.connection() as pooled_conn:
+                # Parquet is already compressed; CSV is gzipped on upload
+                upload_file(pooled_conn.cursor(), result['load_path'], stage_name, auto_compress=LOAD_FORMAT != 'parquet')
+            file_info['upload_seconds'] = time.time() - start_time
+            prepared[table] = file_info
+            print(f"Successfully uploaded {result['load_path']} to stage as {stage_name} ({file_info['upload_seconds']:.2f}s)")
+        
+        def load(table=table, csv_path=csv_path, stage_name=stage_name):
+            file_info = prepared.get(table, dict(table=table, csv_path=csv_path))
+            start_time = time.time()
+            with pool.connection() as pooled_conn:
+                cursor = pooled_conn.cursor()
+                # A changed file replaces the table contents rather than appending to them
+                execute_tagged(cursor, f"TRUNCATE TABLE IF EXISTS SuperstoreDB.data.{table}", SETUP_TAG)
+                execute_tagged(cursor, COPY_TEMPLATES[LOAD_FORMAT].format(table=table, stage_name=stage_name), SETUP_TAG)
+                file_info['copy_seconds'] = time.time() - start_time
+                # The load only counts once the key is verified unique, so a bad load is retried
+                file_info['rows'] = verify_key_uniqueness(cursor, table)
+                if table == 'Orders':
+                    file_info['ingested_files'] = reappend_ingested_orders(cursor)
+                cursor.close()
+            loaded_files.append(file_info)
+        
+        # The digest covers the source content and how it is prepared and loaded
+        stage_digest = text_sha256(file_sha256(csv_path), LOAD_FORMAT, TABLE_SCHEMAS[table],
+                                   SURVIVORSHIP_RULE if table in DIMENSION_TABLES else None)
+        steps.append({"name": f"stage_{table.lower()}", "run": stage, "depends_on": ["create_stage"], "digest": stage_digest})
+        steps.append({
+            "name": f"load_{table.lower()}",
+            "run": load,
+            "depends_on": [f"create_{table.lower()}", f"stage_{table.lower()}"],
+            "digest": text_sha256(COPY_TEMPLATES[LOAD_FORMAT], KEY_UNIQUENESS_QUERY,
+                                   INGESTED_COPY_TEMPLATE if table == 'Orders' else None)
+        })
+    
+    # Maintain one search document per product; the service refreshes from it incrementally
+    def product_documents():
+        start_time = time.time()
+        with pool.connection() as pooled_conn:
+            cursor = pooled_conn.cursor()
+            refresh_product_documents(cursor)
+            cursor.close()
+        search_timings["product documents refresh"] = time.time() - start_time
+    
+    search_service_command = SEARCH_SERVICE_TEMPLATE.format(name="superstore_product_search", source=SEARCH_SERVICE_SOURCE)
+    
+    def build_search_service():
+        start_time = time.time()
+        run_pooled(search_service_command)()
+        search_timings["search service build"] = time.time() - start_time
+    
+    steps.append({
+        "name": "product_documents",
+        "run": product_documents,
+        "depends_on": ["create_product_documents", "load_orders", "load_products"],
+        "digest": text_sha256(PRODUCT_DOCUMENTS_MERGE, PRODUCT_DOCUMENTS_PRUNE)
+    })
+    # Data changes reach the service through its TARGET_LAG refresh; only a new definition needs a rebuild
+    steps.append({
+        "name": "search_service",
+        "run": build_search_service,
+        "after": ["product_documents"],
+        "digest": text_sha256(search_service_command)
+    })
+    
+    # Summary tables are created once Orders is loaded, then refreshed right after every reload
+    # instead of waiting for their TARGET_LAG
+    summary_steps = []
+    for name, query in SUMMARY_TABLES.items():
+        command = SUMMARY_TABLE_TEMPLATE.format(name=name, target_lag=SUMMARY_TARGET_LAG, query=query)
+        summary_steps.append(f"create_{name.lower()}")
+        steps.append({
+            "name": summary_steps[-1],
+            "run": run_pooled(command),
+            "depends_on": ["create_orders"],
+            "after": ["load_orders"],
+            "digest": text_sha256(command)
+        })
+    steps.append({
+        "name": "refresh_summaries",
+        "run": run_pooled(*(f"ALTER DYNAMIC TABLE SuperstoreDB.data.{name} REFRESH" for name in SUMMARY_TABLES)),
+        "depends_on": ["load_orders"],
+        "after": summary_steps,
+        "digest": text_sha256(*SUMMARY_TABLES)
+    })
+    
+    # Upload and register semantic model for Cortex Analyst
+    def register_semantic_model():
         try:
-            # Create a stage for semantic models if it doesn't exist
-            cursor.execute("CREATE STAGE IF NOT EXISTS SuperstoreDB.data.SEMANTIC_MODELS")
-            
-            # Upload the semantic model YAML file to the stage
-            semantic_model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'superstore_semantic_model.yaml')
-            put_command = f"PUT file://{semantic_model_path} @SuperstoreDB.data.SEMANTIC_MODELS/ OVERWRITE=TRUE AUTO_COMPRESS=TRUE"
-            cursor.execute(put_command)
-            print("Successfully uploaded semantic model YAML file to Snowflake stage")
-            
-            # Register the semantic model with Cortex Analyst
+            run_pooled(REGISTER_SEMANTIC_MODEL_COMMAND)()
+        except Exception:
+            print("Note: Registering the semantic model may fail if your Snowflake account doesn't have Cortex Analyst enabled yet.")
+            print("You can still use the Cortex Agent functionality through the API.")
+            raise
+    
+    # The model references the summary tables, so it is published once they exist. The uncompressed
+    # copy on SUPERSTORE_STAGE is the semantic_model_file the Cortex Agent reads.
+    steps.append({
+        "name": "upload_semantic_model",
+        "run": run_pooled(
+            "CREATE STAGE IF NOT EXISTS SuperstoreDB.data.SEMANTIC_MODELS",
+            f"PUT file://{SEMANTIC_MODEL_PATH} @SuperstoreDB.data.SEMANTIC_MODELS/ OVERWRITE=TRUE AUTO_COMPRESS=TRUE",
+            f"PUT file://{SEMANTIC_MODEL_PATH} @SuperstoreDB.data.SUPERSTORE_STAGE/ OVERWRITE=TRUE AUTO_COMPRESS=FALSE"
+        ),
+        "depends_on": ["bootstrap", "create_stage"],
+        "after": summary_steps,
+        "digest": file_sha256(SEMANTIC_MODEL_PATH)
+    })
+    steps.append({
+        "name": "register_semantic_model",
+        "run": register_semantic_model,
+        "depends_on": ["upload_semantic_model"],
+        "digest": text_sha256(REGISTER_SEMANTIC_MODEL_COMMAND),
+        "optional": True
+    })
+    return steps
+
+def setup_database(force=False):
+    """
+    Set up the Snowflake database with Superstore data
+    
+    Setup is a graph of steps (see build_setup_steps): tables before their
+    COPY, COPY before the search documents, and so on. Independent steps run in
+    parallel on pooled connections. Completed steps are checkpointed in the
+    manifest (load_manifest.py), so a re-run skips unchanged steps and resumes
+    from the first failure.
+    
+    Args:
+        force (bool): If True, ignore the checkpoints and redo every step
+    
+    Returns:
+        bool: True if every required step succeeded or was already up to date
+    """
+    # Use initial connection mode to avoid requiring database and warehouse
+    conn = get_snowflake_connection(initial_connection=True)
+    if not conn:
+        print("Failed to connect to Snowflake. Please check your credentials.")
+        return False
+    
+    manifest = load_manifest()
+    if force:
+        manifest["artifacts"] = {}
+    
+    # Connections are opened on first use, after bootstrap has created the warehouse
+    setup_pool = SnowflakeConnectionPool(
+        max_size=SETUP_WORKERS,
+        initial_connection=True,
+        init_statements=["USE ROLE sysadmin", "USE WAREHOUSE SuperstoreWarehouse"]
+    )
+    try:
+        loaded_files = []
+        search_timings = {}
+        steps = build_setup_steps(conn, setup_pool, loaded_files, search_timings)
+        results = run_steps(steps, manifest, max_workers=SETUP_WORKERS)
+        
+        print_step_report(steps, results)
+        if loaded_files:
+            print_load_report(loaded_files)
+        if search_timings:
             try:
-                register_command = """
-                CREATE OR REPLACE CORTEX ANALYST MODEL superstore_analyst_model
-                FROM @SuperstoreDB.data.SEMANTIC_MODELS/superstore_semantic_model.yaml
-                WAREHOUSE = SuperstoreWarehouse
-                """
-                cursor.execute(register_command)
-                print("Successfully registered semantic model with Cortex Analyst")
+                with setup_pool.connection() as pooled_conn:
+                    print_search_index_report(pooled_conn.cursor(), search_timings)
             except Exception as e:
-                print(f"Error registering semantic model with Cortex Analyst: {e}")
-                print("Note: This may be expected if your Snowflake account doesn't have Cortex Analyst enabled yet.")
-                print("You can still use the Cortex Agent functionality through the API.")
-        except Exception as e:
-            print(f"Error uploading semantic model: {e}")
+                print(f"Error reporting search index size: {e}")
         
-        cursor.close()
-        conn.close()
+        if incomplete_steps(steps, results):
+            print("Database setup incomplete; run it again to resume.")
+            return False
         print("Database setup completed!")
         return True
     
     except Exception as e:
         print(f"Error setting up database: {e}")
-        if conn:
-            conn.close()
         return False
+    finally:
+        setup_pool.close_all()
+        conn.close()
 
 if __name__ == "__main__":
-    setup_database()
+    setup_database(force='--force' in sys.argv)
@@ -0,0 +1,182 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from load_manifest import is_unchanged, record_artifact, save_manifest, text_sha256
+
+# Prefix of step checkpoints in the load manifest
+CHECKPOINT_PREFIX = "step:"
+
+def _validate_steps(steps):
+    """
+    Check step names and dependencies and return the steps in a dependency-respecting order
+
+    Raises:
+        ValueError: On duplicate names, unknown dependencies or a dependency cycle
+    """
+    by_name = {}
+    for step in steps:
+        if step["name"] in by_name:
+            raise ValueError(f"Duplicate setup step {step['name']}")
+        by_name[step["name"]] = step
+    for step in steps:
+        for dependency in step.get("depends_on", []) + step.get("after", []):
+            if dependency not in by_name:
+                raise ValueError(f"Setup step {step['name']} depends on unknown step {dependency}")
+
+    ordered = []
+    state = {}  # name -> "visiting" or "done"
+
+    def visit(name, chain):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Setup steps have a dependency cycle: {' -> '.join(chain + [name])}")
+        state[name] = "visiting"
+        step = by_name[name]
+        for dependency in step.get("depends_on", []) + step.get("after", []):
+            visit(dependency, chain + [name])
+        state[name] = "done"
+        ordered.append(step)
+
+    for step in steps:
+        visit(step["name"], [])
+    return ordered
+
+def _checkpoint_key(step, keys):
+    """Checkpoint digest of a step: its own inputs plus the checkpoints of the steps it depends on"""
+    if step.get("digest") is None:
+        return None
+    return text_sha256(step["digest"], *(keys[name] for name in step.get("depends_on", [])))
+
+def run_steps(steps, manifest, max_workers=4):
+    """
+    Run setup steps in parallel as their dependencies complete, resuming from the last failure
+
+    Each step is a dict with:
+        name (str): Unique step name
+        run (callable): Called with no arguments; raises on failure
+        depends_on (list): Steps that must succeed first. A change in any of them reruns this step
+        after (list): Steps that must succeed first, without a change in them rerunning this step
+        digest (str): Content hash of the step's own inputs; None means the step always runs
+        optional (bool): A failure is reported as a warning and does not make the setup incomplete
+
+    A step whose checkpoint (its digest chained with its dependencies' checkpoints)
+    matches the manifest is skipped, so re-running after a failure resumes at the
+    failed step. A failed step blocks only the steps that need it; independent
+    branches still run.
+
+    Args:
+        steps (list): Step dicts as above
+        manifest (dict): Load manifest from load_manifest.load_manifest(); checkpoints are saved to it
+        max_workers (int): Maximum steps running at once
+
+    Returns:
+        dict: Step name -> dict with status (success, skipped, failed or blocked), start, end,
+              elapsed and error_message
+    """
+    ordered = _validate_steps(steps)
+    results = {}
+    keys = {}
+    start_time = time.time()
+
+    def mark(name, status, error_message=None, started=None):
+        now = time.time() - start_time
+        results[name] = {
+            "status": status,
+            "start": now if started is None else started,
+            "end": now,
+            "elapsed": 0 if started is None else now - started,
+            "error_message": error_message
+        }
+
+    starts = {}
+
+    def run_step(step):
+        starts[step["name"]] = time.time() - start_time
+        step["run"]()
+
+    remaining = list(ordered)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while remaining or running:
+            for step in list(remaining):
+                prerequisites = step.get("depends_on", []) + step.get("after", [])
+                if any(name not in results for name in prerequisites):
+                    continue
+                remaining.remove(step)
+
+                failed = [name for name in prerequisites if results[name]["status"] in ("failed", "blocked")]
+                if failed:
+                    mark(step["name"], "blocked", f"needs {', '.join(failed)}")
+                    print(f"Skipping {step['name']}: blocked by {', '.join(failed)}")
+                    continue
+
+                keys[step["name"]] = _checkpoint_key(step, keys)
+                checkpoint = CHECKPOINT_PREFIX + step["name"]
+                if keys[step["name"]] is not None and is_unchanged(manifest, checkpoint, keys[step["name"]]):
+                    mark(step["name"], "skipped")
+                    print(f"Skipping {step['name']}: unchanged since last successful run")
+                    continue
+                running[executor.submit(run_step, step)] = step
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            # Checkpoints are recorded from this thread only, so the manifest is never written concurrently
+            for future in done:
+                step = running.pop(future)
+                try:
+                    future.result()
+                    mark(step["name"], "success", started=starts[step["name"]])
+                    if keys[step["name"]] is not None:
+                        record_artifact(manifest, CHECKPOINT_PREFIX + step["name"], keys[step["name"]])
+                    print(f"Completed {step['name']} ({results[step['name']]['elapsed']:.2f}s)")
+                except Exception as e:
+                    mark(step["name"], "failed", str(e), started=starts.get(step["name"]))
+                    # A failed step must run again, along with everything that depends on it
+                    manifest["artifacts"].pop(CHECKPOINT_PREFIX + step["name"], None)
+                    save_manifest(manifest)
+                    print(f"{'Warning' if step.get('optional') else 'Error'} in setup step {step['name']}: {e}")
+    return results
+
+def incomplete_steps(steps, results):
+    """Return the names of required steps that failed or were blocked"""
+    return [step["name"] for step in steps
+            if not step.get("optional") and results.get(step["name"], {}).get("status") in ("failed", "blocked")]
+
+def critical_path(steps, results):
+    """
+    Return the chain of steps that determined the total setup time
+
+    Walks back from the step that finished last through the prerequisite that
+    finished last, which is the one each step was waiting on.
+    """
+    by_name = {step["name"]: step for step in steps}
+    name = max(results, key=lambda n: results[n]["end"], default=None)
+    path = []
+    while name is not None:
+        path.append(name)
+        prerequisites = [n for n in by_name[name].get("depends_on", []) + by_name[name].get("after", []) if n in results]
+        name = max(prerequisites, key=lambda n: results[n]["end"], default=None)
+    return list(reversed(path))
+
+def print_step_report(steps, results):
+    """
+    Print each step's status and timing, then the critical path with its share of the total time
+    """
+    total = max((result["end"] for result in results.values()), default=0)
+    print(f"\n{'Step':<30} {'Status':<8} {'Start s':>8} {'Elapsed s':>10}")
+    for step in steps:
+        result = results.get(step["name"])
+        if result:
+            print(f"{step['name']:<30} {result['status']:<8} {result['start']:>8.2f} {result['elapsed']:>10.2f}")
+
+    path = critical_path(steps, results)
+    print(f"\nCritical path ({total:.2f}s total):")
+    for name in path:
+        elapsed = results[name]["elapsed"]
+        share = elapsed / total * 100 if total else 0
+        print(f"  {name:<28} {elapsed:>8.2f}s {share:>5.1f}%")
+
+    failed = incomplete_steps(steps, results)
+    if failed:
+        print(f"\n{len(failed)} steps did not complete: {', '.join(failed)}. Re-run to resume from the first failure.")
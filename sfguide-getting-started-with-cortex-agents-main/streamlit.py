@@ -166,16 +166,22 @@ def main():
                     st.markdown(text.replace("•", "\n\n"))
                     if citations:
                         st.write("Citations:")
+                        # Submit every transcript lookup at once, then gather the results
+                        transcript_jobs = {}
                         for citation in citations:
                             doc_id = citation.get("doc_id", "")
-                            if doc_id:
+                            if doc_id and doc_id not in transcript_jobs:
                                 query = f"SELECT transcript_text FROM sales_conversations WHERE conversation_id = '{doc_id}'"
-                                result = run_snowflake_query(query)
-                                result_df = result.to_pandas()
-                                if not result_df.empty:
-                                    transcript_text = result_df.iloc[0, 0]
-                                else:
-                                    transcript_text = "No transcript available"
+                                transcript_jobs[doc_id] = session.sql(query).collect_nowait()
+                        
+                        for citation in citations:
+                            doc_id = citation.get("doc_id", "")
+                            if doc_id:
+                                try:
+                                    rows = transcript_jobs[doc_id].result()
+                                    transcript_text = rows[0][0] if rows else "No transcript available"
+                                except Exception as e:
+                                    transcript_text = f"Error loading transcript: {str(e)}"
                     
                                 with st.expander(f"[{citation.get('source_id', '')}]"):
                                     st.write(transcript_text)
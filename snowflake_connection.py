@@ -1,10 +1,28 @@
 import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import snowflake.connector
+from snowflake.connector.errors import NotSupportedError
+import pandas as pd
+import pyarrow as pa
 from dotenv import load_dotenv
+from query_ledger import build_query_tag, tag_statement_params, record_query
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Number of threads the connector uses to download result chunks in parallel
+DEFAULT_PREFETCH_THREADS = int(os.getenv('SNOWFLAKE_PREFETCH_THREADS', '4'))
+
+# Maximum number of connections kept open by a connection pool
+DEFAULT_POOL_SIZE = int(os.getenv('SNOWFLAKE_POOL_SIZE', '4'))
+
+# Snowflake error code for a statement cancelled by the client-side timeout
+QUERY_CANCELLED_ERRNO = 604
+
 def get_snowflake_connection(initial_connection=False):
     """
     Create a connection to Snowflake using environment variables
@@ -49,6 +67,271 @@ def get_snowflake_connection(initial_connection=False):
         print("3. Ensure your IP is allowlisted if IP restrictions are enabled")
         return None
 
+def _empty_arrow_table(cursor):
+    """Build a zero-row Arrow table carrying the column names of the last result."""
+    return pa.table({desc[0]: pa.array([], type=pa.null()) for desc in cursor.description or []})
+
+def fetch_arrow_batches(query, conn=None, params=None, prefetch_threads=None, tag=None):
+    """
+    Execute a query and stream the result as Arrow record batches
+    
+    Batches are yielded as the connector downloads them, so large results never
+    have to be held in memory at once. Statements whose results are not returned
+    in Arrow format (SHOW, DESCRIBE, ...) are yielded as a single batch.
+    
+    Args:
+        query (str): SQL statement to execute
+        conn: Open Snowflake connection. If None, a connection is opened and closed here
+        params: Optional bind parameters passed to cursor.execute
+        prefetch_threads (int): Number of result download threads (default DEFAULT_PREFETCH_THREADS)
+        tag (dict): QUERY_TAG from build_query_tag() naming the calling feature (default "adhoc")
+    
+    Yields:
+        pyarrow.Table: One table per downloaded result chunk
+    """
+    tag = tag or build_query_tag("adhoc")
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_snowflake_connection()
+        if not conn:
+            raise ConnectionError("Failed to connect to Snowflake")
+    
+    conn.client_prefetch_threads = prefetch_threads or DEFAULT_PREFETCH_THREADS
+    cursor = conn.cursor()
+    submit_time = time.time()
+    first_row_seconds = None
+    rows_fetched = 0
+    bytes_fetched = 0
+    try:
+        cursor.execute(query, params, _statement_params=tag_statement_params(tag))
+        try:
+            batches = cursor.fetch_arrow_batches()
+            for batch in batches:
+                if first_row_seconds is None:
+                    first_row_seconds = time.time() - submit_time
+                rows_fetched += batch.num_rows
+                bytes_fetched += batch.nbytes
+                yield batch
+        except NotSupportedError:
+            # Result came back as JSON rather than Arrow (e.g. SHOW commands)
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+            batch = pa.Table.from_pandas(pd.DataFrame(rows, columns=columns), preserve_index=False)
+            first_row_seconds = time.time() - submit_time
+            rows_fetched, bytes_fetched = batch.num_rows, batch.nbytes
+            yield batch
+        record_query(tag, query, query_id=cursor.sfqid, submit_time=submit_time,
+                     first_row_seconds=first_row_seconds, last_row_seconds=time.time() - submit_time,
+                     rows_fetched=rows_fetched, bytes_fetched=bytes_fetched)
+    except Exception as e:
+        record_query(tag, query, query_id=cursor.sfqid, status="error", error_message=str(e),
+                     submit_time=submit_time, last_row_seconds=time.time() - submit_time)
+        raise
+    finally:
+        cursor.close()
+        if owns_connection:
+            conn.close()
+
+def query_dataframe(query, conn=None, params=None, prefetch_threads=None, as_arrow=False, timeout=None, tag=None):
+    """
+    Execute a query and return the full result without per-row Python tuples
+    
+    Args:
+        query (str): SQL statement to execute
+        conn: Open Snowflake connection. If None, a connection is opened and closed here
+        params: Optional bind parameters passed to cursor.execute
+        prefetch_threads (int): Number of result download threads (default DEFAULT_PREFETCH_THREADS)
+        as_arrow (bool): If True, return a pyarrow.Table instead of a pandas DataFrame
+        timeout (int): Seconds after which the statement is cancelled (default: no timeout)
+        tag (dict): QUERY_TAG from build_query_tag() naming the calling feature (default "adhoc")
+    
+    Returns:
+        pandas.DataFrame or pyarrow.Table with the query result
+    """
+    tag = tag or build_query_tag("adhoc")
+    owns_connection = conn is None
+    if owns_connection:
+        conn = get_snowflake_connection()
+        if not conn:
+            raise ConnectionError("Failed to connect to Snowflake")
+    
+    conn.client_prefetch_threads = prefetch_threads or DEFAULT_PREFETCH_THREADS
+    cursor = conn.cursor()
+    submit_time = time.time()
+    try:
+        cursor.execute(query, params, timeout=timeout, _statement_params=tag_statement_params(tag))
+        first_row_seconds = time.time() - submit_time
+        try:
+            table = cursor.fetch_arrow_all()
+            if table is None:
+                # The connector returns None for empty results
+                table = _empty_arrow_table(cursor)
+        except NotSupportedError:
+            # Result came back as JSON rather than Arrow (e.g. SHOW commands)
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+            table = pa.Table.from_pandas(pd.DataFrame(rows, columns=columns), preserve_index=False)
+        record_query(tag, query, query_id=cursor.sfqid, submit_time=submit_time,
+                     first_row_seconds=first_row_seconds, last_row_seconds=time.time() - submit_time,
+                     rows_fetched=table.num_rows, bytes_fetched=table.nbytes)
+    except Exception as e:
+        record_query(tag, query, query_id=cursor.sfqid, status="error", error_message=str(e),
+                     submit_time=submit_time, last_row_seconds=time.time() - submit_time)
+        raise
+    finally:
+        cursor.close()
+        if owns_connection:
+            conn.close()
+    
+    return table if as_arrow else table.to_pandas()
+
+class SnowflakeConnectionPool:
+    """
+    Thread-safe pool of reusable Snowflake connections
+    
+    Connections are opened lazily up to max_size and handed back to the pool
+    after use, so concurrent callers do not pay login and TLS setup per statement.
+    """
+    def __init__(self, max_size=None, initial_connection=False, init_statements=None, connect_factory=None):
+        """
+        Args:
+            max_size (int): Maximum number of open connections (default DEFAULT_POOL_SIZE)
+            initial_connection (bool): If True, connect without specifying database and warehouse
+            init_statements (list): Statements run once on every new connection (e.g. "USE ROLE sysadmin")
+            connect_factory (callable): Opens a new connection. Defaults to get_snowflake_connection,
+                                        use it for other authentication methods such as key-pair
+        """
+        self.max_size = max_size or DEFAULT_POOL_SIZE
+        self.initial_connection = initial_connection
+        self.connect_factory = connect_factory
+        self.init_statements = list(init_statements or [])
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+    
+    def _open(self):
+        conn = None
+        try:
+            if self.connect_factory:
+                conn = self.connect_factory()
+            else:
+                conn = get_snowflake_connection(initial_connection=self.initial_connection)
+            if not conn:
+                raise ConnectionError("Failed to connect to Snowflake")
+            cursor = conn.cursor()
+            for statement in self.init_statements:
+                cursor.execute(statement)
+            cursor.close()
+            return conn
+        except Exception:
+            if conn:
+                conn.close()
+            with self._lock:
+                self._opened -= 1
+            raise
+    
+    def acquire(self, timeout=None):
+        """Borrow a connection, opening a new one if the pool is not yet full"""
+        try:
+            conn = self._idle.get_nowait()
+            if not conn.is_closed():
+                return conn
+            with self._lock:
+                self._opened -= 1
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            can_open = self._opened < self.max_size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            return self._open()
+        return self._idle.get(timeout=timeout)
+    
+    def release(self, conn):
+        """Return a borrowed connection to the pool"""
+        if conn.is_closed():
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(conn)
+    
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that borrows a connection and always returns it"""
+        conn = self.acquire(timeout=timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+    
+    def close_all(self):
+        """Close every idle connection held by the pool"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    """
+    Return the process-wide connection pool for the SuperstoreDB database
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SnowflakeConnectionPool()
+        return _default_pool
+
+def _run_pooled_statement(pool, statement, timeout, tag):
+    """Run one statement on a pooled connection and describe its outcome as a dict"""
+    result = {"statement": statement, "status": "success", "data": None, "error_message": None}
+    start_time = time.time()
+    try:
+        with pool.connection() as conn:
+            result["data"] = query_dataframe(statement, conn=conn, timeout=timeout, tag=tag)
+    except Exception as e:
+        is_timeout = getattr(e, 'errno', None) == QUERY_CANCELLED_ERRNO
+        result["status"] = "timeout" if is_timeout else "error"
+        result["error_message"] = str(e)
+    result["elapsed"] = time.time() - start_time
+    return result
+
+def execute_concurrently(statements, pool=None, timeout=None, max_workers=None, tag=None):
+    """
+    Execute independent statements concurrently on pooled connections
+    
+    Statements are submitted together, so a batch costs roughly the latency of
+    its slowest statement rather than the sum of all of them. A failing or timed
+    out statement does not affect the others.
+    
+    Args:
+        statements (list): SQL statements with no ordering dependencies between them
+        pool (SnowflakeConnectionPool): Pool to borrow connections from (default get_connection_pool())
+        timeout (int): Per-statement timeout in seconds (default: no timeout)
+        max_workers (int): Maximum statements in flight at once (default: the pool size)
+        tag (dict): QUERY_TAG from build_query_tag() applied to every statement
+    
+    Returns:
+        list: One dict per statement, in input order, with keys statement, status
+        ("success", "error" or "timeout"), data (pandas DataFrame), error_message and elapsed
+    """
+    pool = pool or get_connection_pool()
+    if not statements:
+        return []
+    
+    workers = min(max_workers or pool.max_size, len(statements))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_pooled_statement, pool, statement, timeout, tag) for statement in statements]
+        return [future.result() for future in futures]
+
 def test_connection():
     """
     Test the Snowflake connection by running a simple query
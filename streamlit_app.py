@@ -2,6 +2,7 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from cortex_agent import CortexAgent
+from warmup import start_background_warmup
 
 # Load environment variables
 load_dotenv()
@@ -43,6 +44,9 @@ def get_agent():
 
 agent = get_agent()
 
+# Pre-connect, sign the JWT and resume the warehouse in the background
+start_background_warmup(agent=agent)
+
 # Chat message history
 if "messages" not in st.session_state:
     st.session_state.messages = []
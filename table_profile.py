@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import decimal
+import datetime
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from load_manifest import data_version
+from preprocess_data import DIMENSION_TABLES, TABLE_SCHEMAS
+import columnar_cache
+from columnar_cache import cache_path, remove_superseded
+from query_ledger import build_query_tag
+from local_engine import DEFAULT_SQL_BACKEND, SQL_BACKENDS, run_sql
+
+# Load environment variables
+load_dotenv()
+
+# Most frequent values kept per column
+PROFILE_TOP_K = int(os.getenv('PROFILE_TOP_K', '10'))
+
+# Columns with more (approximate) distinct values than this get no top values:
+# grouping by a near-unique column costs a full shuffle and its top values all have count 1
+PROFILE_TOP_K_MAX_DISTINCT = int(os.getenv('PROFILE_TOP_K_MAX_DISTINCT', '10000'))
+
+# Quantiles estimated for numeric columns, as (output name, fraction)
+PROFILE_QUANTILES = [('P25', 0.25), ('P50', 0.5), ('P75', 0.75)]
+
+NUMERIC_TYPES = ('int', 'float')
+
+# Bump when the profile layout changes so stored profiles are recomputed
+PROFILE_FORMAT_VERSION = 1
+
+def _alias(column, statistic):
+    return f'"{column}__{statistic}"'
+
+def stats_sql(table):
+    """
+    Build one aggregate statement returning every column statistic of a table in a single scan
+
+    Every column gets COUNT (non-null), MIN, MAX and APPROX_COUNT_DISTINCT;
+    numeric columns also get AVG and APPROX_PERCENTILE at PROFILE_QUANTILES.
+    """
+    selects = ['COUNT(*) AS "ROWS"']
+    for _, column, column_type in TABLE_SCHEMAS[table]['columns']:
+        selects += [
+            f"COUNT({column}) AS {_alias(column, 'COUNT')}",
+            f"MIN({column}) AS {_alias(column, 'MIN')}",
+            f"MAX({column}) AS {_alias(column, 'MAX')}",
+            f"APPROX_COUNT_DISTINCT({column}) AS {_alias(column, 'DISTINCT')}",
+        ]
+        if column_type in NUMERIC_TYPES:
+            selects.append(f"AVG({column}) AS {_alias(column, 'MEAN')}")
+            selects += [f"APPROX_PERCENTILE({column}, {fraction}) AS {_alias(column, name)}"
+                        for name, fraction in PROFILE_QUANTILES]
+    return f"SELECT {', '.join(selects)}\nFROM SuperstoreDB.data.{table}"
+
+def top_values_sql(table, columns, k=PROFILE_TOP_K):
+    """
+    Build one statement returning the k most frequent non-null values of several columns
+
+    Each column is counted in its own UNION ALL branch; a columnar warehouse reads
+    only that column per branch, so the whole statement reads each column once.
+    """
+    branches = [
+        f"""SELECT '{column}' AS "COLUMN_NAME", CAST({column} AS VARCHAR) AS "VALUE", COUNT(*) AS "COUNT"
+FROM SuperstoreDB.data.{table}
+WHERE {column} IS NOT NULL
+GROUP BY {column}
+QUALIFY ROW_NUMBER() OVER (ORDER BY COUNT(*) DESC, CAST({column} AS VARCHAR)) <= {k}"""
+        for column in columns
+    ]
+    return "\nUNION ALL\n".join(branches)
+
+def _plain(value):
+    """Convert a result value to a JSON-friendly Python value"""
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+        return None
+    if isinstance(value, np.generic):
+        return _plain(value.item())
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, datetime.datetime):
+        # DATE columns can come back as midnight timestamps
+        return value.date().isoformat() if value.time() == datetime.time() else value.isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+def profile_version(table, backend):
+    """
+    Token that changes when the data behind a table's profile changes: a warehouse
+    reload (load_manifest.data_version) or, for the local engine, the source file
+    """
+    if backend == "local":
+        return os.path.basename(cache_path(table, conform=table in DIMENSION_TABLES))[:-len(".arrow")]
+    return data_version()
+
+def compute_profile(table, backend=None, conn=None):
+    """
+    Profile every column of a table with aggregate SQL over all its rows
+
+    Runs two statements where the data lives: one aggregate scan for the column
+    statistics, then one statement counting the top values of the columns with
+    at most PROFILE_TOP_K_MAX_DISTINCT distinct values.
+
+    Args:
+        table (str): Orders, Customers or Products
+        backend (str): snowflake or local (default DEFAULT_SQL_BACKEND)
+        conn: Open Snowflake connection (default: a new connection per statement)
+
+    Returns:
+        dict: table, backend, rows, seconds and columns, a list of dicts with name,
+              type, count, nulls, null_fraction, min, max, approx_distinct, mean,
+              the PROFILE_QUANTILES (p25, p50, p75; numeric columns only) and top_values
+              (list of {value, count}, or None when the column has too many distinct values)
+    """
+    backend = (backend or DEFAULT_SQL_BACKEND).lower()
+    tag = build_query_tag("data_explorer_profile")
+    start_time = time.time()
+    stats = run_sql(stats_sql(table), backend=backend, conn=conn, tag=tag, fallback=False)["data"]
+    stats = {name.upper(): _plain(value) for name, value in stats.iloc[0].items()}
+    rows = stats["ROWS"]
+
+    columns = []
+    for _, column, column_type in TABLE_SCHEMAS[table]['columns']:
+        count = stats[f"{column}__COUNT"]
+        profile = {
+            "name": column,
+            "type": column_type,
+            "count": count,
+            "nulls": rows - count,
+            "null_fraction": (rows - count) / rows if rows else None,
+            "min": stats[f"{column}__MIN"],
+            "max": stats[f"{column}__MAX"],
+            # Sketch estimates can exceed the exact count on small tables
+            "approx_distinct": min(stats[f"{column}__DISTINCT"], count) if count else 0,
+            "top_values": None,
+        }
+        if column_type in NUMERIC_TYPES:
+            profile["mean"] = stats[f"{column}__MEAN"]
+            profile.update({name.lower(): stats[f"{column}__{name}"] for name, _ in PROFILE_QUANTILES})
+        columns.append(profile)
+
+    key = TABLE_SCHEMAS[table]['key']
+    # Near-unique columns (keys, emails) are skipped too: their top values all have count 1
+    candidates = [profile["name"] for profile in columns
+                  if profile["type"] != 'float' and profile["name"] != key
+                  and profile["approx_distinct"] <= min(PROFILE_TOP_K_MAX_DISTINCT, 0.9 * profile["count"])]
+    if candidates:
+        top = run_sql(top_values_sql(table, candidates), backend=backend, conn=conn, tag=tag, fallback=False)["data"]
+        top.columns = [name.upper() for name in top.columns]
+        top = top.sort_values(["COLUMN_NAME", "COUNT", "VALUE"], ascending=[True, False, True])
+        for profile in columns:
+            if profile["name"] in candidates:
+                matching = top[top["COLUMN_NAME"] == profile["name"]]
+                profile["top_values"] = [{"value": _plain(value), "count": _plain(count)}
+                                         for value, count in zip(matching["VALUE"], matching["COUNT"])]
+
+    return {"table": table, "backend": backend, "rows": rows,
+            "seconds": time.time() - start_time, "columns": columns}
+
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+def profile_path(table, backend, version):
+    """File holding a table's profile for one data version"""
+    return os.path.join(columnar_cache.CACHE_DIR, f"profile_v{PROFILE_FORMAT_VERSION}_{table.lower()}_{backend}_{version}.json")
+
+def get_profile(table, backend=None, conn=None, refresh=False):
+    """
+    Return a table's profile, computed once per data version
+
+    Profiles are kept in memory and written next to the columnar cache, so after
+    the first computation for a data version every render (and every restart) reads
+    the stored result instead of scanning the table again. A reload gives a new
+    version, so an outdated profile is never returned; its file is removed when
+    the new profile is written.
+
+    Args:
+        table (str): Orders, Customers or Products
+        backend (str): snowflake or local (default DEFAULT_SQL_BACKEND)
+        conn: Open Snowflake connection used if the profile has to be computed
+        refresh (bool): Recompute even if a profile for the current version exists
+
+    Returns:
+        dict: The profile from compute_profile, plus version, computed_time and cached
+              (True when it was not computed by this call)
+    """
+    backend = (backend or DEFAULT_SQL_BACKEND).lower()
+    if backend not in SQL_BACKENDS:
+        raise ValueError(f"Unknown SQL backend {backend}; expected one of {SQL_BACKENDS}")
+    version = profile_version(table, backend)
+    key = (table, backend, version)
+    path = profile_path(table, backend, version)
+
+    with _profiles_lock:
+        if not refresh and key not in _profiles and os.path.exists(path):
+            with open(path) as f:
+                _profiles[key] = json.load(f)
+        if not refresh and key in _profiles:
+            return dict(_profiles[key], cached=True)
+
+    profile = compute_profile(table, backend, conn)
+    profile.update(version=version, computed_time=time.time())
+    # Round-trip through JSON so fresh and stored profiles have identical values
+    profile = json.loads(json.dumps(profile))
+
+    os.makedirs(columnar_cache.CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f)
+    os.replace(tmp_path, path)
+    remove_superseded(f"profile_v*_{table.lower()}_{backend}_*.json", path)
+    with _profiles_lock:
+        _profiles[key] = profile
+    return dict(profile, cached=False)
+
+def profile_frame(profile):
+    """
+    Return a profile's column statistics as a DataFrame with one row per column, for display
+    """
+    rows = []
+    for column in profile["columns"]:
+        row = {name: value for name, value in column.items() if name != "top_values"}
+        row["top_value"] = column["top_values"][0]["value"] if column["top_values"] else None
+        rows.append(row)
+    order = ["name", "type", "count", "nulls", "null_fraction", "approx_distinct", "min", "max", "mean"] + \
+            [name.lower() for name, _ in PROFILE_QUANTILES] + ["top_value"]
+    return pd.DataFrame(rows).reindex(columns=order).set_index("name")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile a table with aggregate SQL over all its rows")
+    parser.add_argument("table", nargs="?", default="Orders", choices=list(TABLE_SCHEMAS))
+    parser.add_argument("--backend", choices=SQL_BACKENDS, help="Where the SQL runs (default CORTEX_SQL_BACKEND)")
+    parser.add_argument("--refresh", action="store_true", help="Recompute even if a profile for this data version exists")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    profile = get_profile(args.table, args.backend, refresh=args.refresh)
+    print(f"{args.table}: {profile['rows']} rows, {'cached' if profile['cached'] else 'computed'} "
+          f"in {time.time() - start_time:.3f}s (version {profile['version']})")
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(profile_frame(profile))
@@ -0,0 +1,131 @@
+import os
+import time
+import datetime
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import query_ledger
+from cancellation import CancelToken, RequestCancelled
+from cortex_agent import CortexAgent
+from local_engine import get_local_engine
+
+class SlowStreamHandler(BaseHTTPRequestHandler):
+    """Serves agent:run as an SSE stream that sends a chunk every 0.1 s for 30 s"""
+    disconnected = threading.Event()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            for _ in range(300):
+                self.wfile.write(b'data: {"object": "message.delta", "delta": {"content": [{"type": "text", "text": "."}]}}\n\n')
+                self.wfile.flush()
+                time.sleep(0.1)
+        except (BrokenPipeError, ConnectionResetError):
+            SlowStreamHandler.disconnected.set()
+
+    def log_message(self, *args):
+        pass
+
+class SlowCursor:
+    """Stands in for a Snowflake cursor whose statement keeps running until cancelled"""
+    def __init__(self, connection):
+        self.connection = connection
+        self.sfqid = None
+        self.rowcount = None
+
+    def execute_async(self, statement, params=None, timeout=None, _statement_params=None):
+        self.sfqid = "01-slow-query"
+        self.connection.running[self.sfqid] = True
+
+    def execute(self, statement, params=None, **kwargs):
+        self.connection.cancelled.append(params[0])
+        self.connection.running[params[0]] = False
+
+    def fetchone(self):
+        return ("Identified SQL statement is being canceled.",)
+
+    def close(self):
+        pass
+
+class SlowConnection:
+    def __init__(self):
+        self.running = {}
+        self.cancelled = []
+
+    def cursor(self):
+        return SlowCursor(self)
+
+    def get_query_status(self, query_id):
+        return self.running[query_id]
+
+    def is_still_running(self, status):
+        return status
+
+def test_cancellation():
+    print("=== TESTING CANCELLATION ===")
+
+    # Point the ledger at a throwaway file
+    query_ledger.LEDGER_PATH = os.path.join(tempfile.mkdtemp(), 'ledger.sqlite')
+    query_ledger._ledger_initialized = False
+
+    token = CancelToken()
+    calls = []
+    with token.on_cancel(lambda: calls.append("closed")):
+        token.cancel("test")
+        token.cancel("again")
+    assert token.cancelled and token.reason == "test" and calls == ["closed"]
+    with token.on_cancel(lambda: calls.append("late")):
+        pass
+    assert calls == ["closed", "late"]
+    with pytest.raises(RequestCancelled):
+        token.raise_if_cancelled()
+    print("✅ Cancel callbacks run once, and immediately when already cancelled")
+
+    # An agent response stream is closed as soon as the token is cancelled
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowStreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    agent = CortexAgent(account="test")
+    agent.base_url = f"http://127.0.0.1:{server.server_port}"
+    agent._jwt_token_data = {"token": "test", "payload": {"exp": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)}}
+    agent.start_conversation()
+
+    token = CancelToken()
+    threading.Timer(0.5, token.cancel).start()
+    start_time = time.time()
+    response = agent.send_message("What are the total sales by category?", cancel_token=token)
+    seconds = time.time() - start_time
+    assert response["status"] == "cancelled" and seconds < 2
+    assert [message["role"] for message in agent.messages] == ["system"]
+    assert SlowStreamHandler.disconnected.wait(2)
+    server.shutdown()
+    print(f"✅ Agent stream aborted {seconds:.2f}s after the request, connection released, question rolled back")
+
+    # A running warehouse statement is cancelled by its query ID
+    conn = SlowConnection()
+    token = CancelToken()
+    threading.Timer(0.3, token.cancel).start()
+    tag = query_ledger.build_query_tag("chat_sql_exec", agent.conversation_id)
+    with pytest.raises(RequestCancelled):
+        query_ledger.execute_tagged(conn.cursor(), "SELECT SLOW()", tag, cancel_token=token)
+    assert conn.cancelled == ["01-slow-query"]
+    print("✅ Running statement cancelled with SYSTEM$CANCEL_QUERY by query ID")
+
+    # A local query is interrupted
+    token = CancelToken()
+    threading.Timer(0.5, token.cancel).start()
+    with pytest.raises(RequestCancelled):
+        get_local_engine().query("SELECT SUM(a * b) FROM range(3000000000) t(a), range(2) s(b)", cancel_token=token)
+    print("✅ Local query interrupted")
+
+    # Cancelled work shows up in the ledger separately from errors
+    features = {row["feature"]: row for row in query_ledger.top_slowest_features()}
+    assert features["chat_agent_run"]["cancelled_count"] == 1 and features["chat_agent_run"]["error_count"] == 0
+    assert features["chat_sql_exec"]["cancelled_count"] == 1
+    print(f"✅ Cancelled counts: {[(feature, row['cancelled_count']) for feature, row in features.items()]}")
+
+if __name__ == "__main__":
+    test_cancellation()
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import pytest
+from contextlib import contextmanager
+import pyarrow.parquet as pq
+import query_ledger
+import chunked_loader
+from chunked_loader import iter_chunks, load_progress, load_large_file, source_fingerprint
+from preprocess_data import source_path
+
+class StageCursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self.sfqid = "loader-query"
+        self.rowcount = 1
+
+    def execute(self, statement, params=None, timeout=None, _statement_params=None):
+        if statement.startswith("PUT"):
+            if self.pool.fail_after is not None and len(self.pool.puts) >= self.pool.fail_after:
+                raise RuntimeError("connection lost")
+            self.pool.puts.append(os.path.basename(statement.split()[1]))
+        else:
+            self.pool.statements.append(statement)
+
+    def fetchall(self):
+        return [("loaded",)]
+
+    def close(self):
+        pass
+
+class StagePool:
+    """Stands in for a SnowflakeConnectionPool, recording PUTs and failing after fail_after of them"""
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.puts = []
+        self.statements = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return StageCursor(self)
+
+def chunk_row_ids(work_dir, names):
+    return [row_id for name in names for row_id in pq.read_table(os.path.join(work_dir, name)).column('ROW_ID').to_pylist()]
+
+def test_chunked_loader():
+    print("=== TESTING CHUNKED LOADER ===")
+    
+    work_dir = tempfile.mkdtemp()
+    chunk_dir, ledger_path = chunked_loader.CHUNK_DIR, query_ledger.LEDGER_PATH
+    chunked_loader.CHUNK_DIR = os.path.join(work_dir, 'chunks')
+    query_ledger.LEDGER_PATH = os.path.join(work_dir, 'ledger.sqlite')
+    query_ledger._ledger_initialized = False
+    
+    # 2,500 rows parsed 300 at a time; about two pieces reach the target chunk size
+    source = os.path.join(work_dir, 'orders.csv')
+    with open(source_path('Orders'), encoding='utf-8-sig') as f:
+        lines = f.readlines()[:2501]
+    with open(source, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    expected = [int(line.split(',', 1)[0]) for line in lines[1:]]
+    target_bytes, rows_per_piece = 40000, 300
+    
+    produce_dir = os.path.join(work_dir, 'produce')
+    os.makedirs(produce_dir)
+    progress = load_progress(produce_dir, source_fingerprint(source))
+    names = list(iter_chunks(source, 'Orders', produce_dir, progress, target_bytes, rows_per_piece))
+    sizes = [os.path.getsize(os.path.join(produce_dir, name)) for name in names]
+    assert len(names) > 2 and all(size >= target_bytes for size in sizes[:-1])
+    # A chunk is closed as soon as it reaches the target, so it holds just enough pieces
+    assert all(progress["chunks"][name]["rows"] == 2 * rows_per_piece for name in names[:-1])
+    print(f"✅ {len(names)} chunks of at least {target_bytes} bytes: {sizes}")
+    
+    # The last chunk holds the rows left over, and together the chunks hold every row once
+    assert progress["chunks"][names[-1]]["rows"] == len(expected) % (2 * rows_per_piece)
+    assert pq.ParquetFile(os.path.join(produce_dir, names[-1])).metadata.num_rows == progress["chunks"][names[-1]]["rows"]
+    assert chunk_row_ids(produce_dir, names) == expected and progress["rows_consumed"] == len(expected)
+    print(f"✅ Last partial chunk holds the remaining {progress['chunks'][names[-1]]['rows']} rows")
+    
+    # A run stopped after two chunks continues from progress.json
+    resume_dir = os.path.join(work_dir, 'resume')
+    os.makedirs(resume_dir)
+    first_run = iter_chunks(source, 'Orders', resume_dir, load_progress(resume_dir, source_fingerprint(source)), target_bytes, rows_per_piece)
+    stopped = [next(first_run), next(first_run)]
+    first_run.close()
+    progress = load_progress(resume_dir, source_fingerprint(source))
+    assert list(progress["chunks"]) == stopped and progress["rows_consumed"] == 4 * rows_per_piece
+    resumed = list(iter_chunks(source, 'Orders', resume_dir, progress, target_bytes, rows_per_piece))
+    assert stopped + resumed == names
+    assert chunk_row_ids(resume_dir, stopped + resumed) == expected
+    print(f"✅ Resumed after {len(stopped)} chunks without duplicate or missing rows")
+    
+    # Uploads interrupted by a failed PUT resume without re-sending uploaded chunks, then COPY once
+    failing = StagePool(fail_after=2)
+    with pytest.raises(RuntimeError):
+        load_large_file(source, target_bytes=target_bytes, rows_per_piece=rows_per_piece, upload_workers=1, keep_chunks=True, pool=failing)
+    assert not failing.statements
+    pool = StagePool()
+    result = load_large_file(source, target_bytes=target_bytes, rows_per_piece=rows_per_piece, upload_workers=1, keep_chunks=True, pool=pool)
+    assert sorted(failing.puts + pool.puts) == names and not set(failing.puts) & set(pool.puts)
+    assert result["rows"] == len(expected) and result["chunks"] == len(names)
+    assert len([statement for statement in pool.statements if "COPY INTO" in statement]) == 1
+    loaded_dir = os.path.join(chunked_loader.CHUNK_DIR, 'orders', source_fingerprint(source))
+    assert chunk_row_ids(loaded_dir, names) == expected
+    assert load_large_file(source, pool=StagePool())["seconds"] == 0
+    print(f"✅ Load resumed after {len(failing.puts)} uploaded chunks and copied {result['rows']} rows once")
+    
+    chunked_loader.CHUNK_DIR, query_ledger.LEDGER_PATH = chunk_dir, ledger_path
+    query_ledger._ledger_initialized = False
+    shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    test_chunked_loader()
@@ -0,0 +1,69 @@
+import os
+import glob
+import shutil
+import tempfile
+import columnar_cache
+from columnar_cache import load_table, load_dataframe, cache_path
+from preprocess_data import read_typed_csv, arrow_schema, source_path
+
+def test_columnar_cache():
+    print("=== TESTING COLUMNAR CACHE ===")
+    
+    work_dir = tempfile.mkdtemp()
+    columnar_cache.CACHE_DIR = os.path.join(work_dir, 'cache')
+    columnar_cache.DIGEST_INDEX_PATH = os.path.join(columnar_cache.CACHE_DIR, 'source_digests.json')
+    
+    # The cached table matches parsing the CSV directly
+    orders = load_table('Orders')
+    assert orders.schema == arrow_schema('Orders')
+    expected = read_typed_csv('Orders')
+    assert orders.num_rows == len(expected)
+    assert abs(orders.column('SALES').to_pandas().sum() - expected['SALES'].sum()) < 0.01
+    print(f"✅ Orders cached with {orders.num_rows} rows and the table schema")
+    
+    # A second load maps the same file instead of converting again
+    path = cache_path('Orders')
+    modified = os.path.getmtime(path)
+    assert load_table('Orders').equals(orders) and os.path.getmtime(path) == modified
+    print("✅ Second load reuses the cache file")
+    
+    # Conformed dimensions are cached separately from the raw rows
+    customers = load_dataframe('Customers', conform=True)
+    assert customers['CUSTOMER_ID'].is_unique
+    assert len(load_dataframe('Customers')) > len(customers)
+    print(f"✅ Conformed Customers cached separately ({len(customers)} rows)")
+    
+    # Changing the source gives a new cache file; another source of the table has its own
+    source = os.path.join(work_dir, 'orders.csv')
+    shutil.copy(source_path('Orders'), source)
+    before = cache_path('Orders', source)
+    assert before != path
+    assert load_table('Orders', source).num_rows == orders.num_rows
+    with open(source, 'r', encoding='utf-8-sig') as f:
+        lines = f.readlines()
+    with open(source, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:101])
+    assert cache_path('Orders', source) != before
+    assert load_table('Orders', source).num_rows == 100
+    print("✅ A changed source is converted again")
+    
+    # Superseded files of a source are removed once this process no longer maps them;
+    # the caches of other sources, tables and variants are kept
+    mapped_path = cache_path('Orders', source)
+    mapped = load_table('Orders', source)
+    with open(source, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:51])
+    assert load_table('Orders', source).num_rows == 50
+    assert not os.path.exists(before) and os.path.exists(mapped_path), "a mapped file is kept"
+    del mapped
+    with open(source, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:21])
+    assert load_table('Orders', source).num_rows == 20
+    assert sorted(glob.glob(os.path.join(columnar_cache.CACHE_DIR, 'orders_raw_*.arrow'))) == \
+        sorted([path, cache_path('Orders', source)])
+    assert load_table('Orders').num_rows == orders.num_rows and os.path.getmtime(path) == modified
+    assert len(glob.glob(os.path.join(columnar_cache.CACHE_DIR, 'customers_*.arrow'))) == 2
+    print("✅ Superseded cache files are removed; other sources, tables and variants are kept")
+
+if __name__ == "__main__":
+    test_columnar_cache()
@@ -0,0 +1,51 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from compact_frame import compact_frame, load_compact, decode_dates, encode_dates, memory_report
+from columnar_cache import load_dataframe
+
+def test_compact_frame():
+    print("=== TESTING COMPACT FRAME ===")
+    
+    orders = load_compact('Orders')
+    naive = load_dataframe('Orders')
+    
+    # Narrow types: categorical strings with small codes, narrow integers, int32 days
+    assert isinstance(orders['REGION'].dtype, pd.CategoricalDtype) and orders['REGION'].cat.codes.dtype == np.int8
+    assert list(orders['REGION'].cat.categories) == sorted(naive['REGION'].unique())
+    assert orders['QUANTITY'].dtype == np.int8 and orders['ROW_ID'].dtype == np.int16
+    assert orders['ORDER_DATE'].dtype == np.int32
+    assert orders['DISCOUNT'].dtype == np.float32 and orders['SALES'].dtype == np.float64
+    print("✅ Strings, integers, floats and dates use the narrowest types that keep their values")
+    
+    # Values are unchanged
+    for column in ['ORDER_ID', 'PRODUCT_NAME', 'POSTAL_CODE', 'QUANTITY', 'SALES', 'PROFIT']:
+        assert orders[column].astype(naive[column].dtype).tolist() == naive[column].tolist(), column
+    assert (np.round(orders['DISCOUNT'].astype(float), 4) == naive['DISCOUNT']).all()
+    assert list(pd.Series(decode_dates(orders['ORDER_DATE'])).dt.date) == naive['ORDER_DATE'].tolist()
+    assert encode_dates(datetime.date(2016, 1, 1)) == (datetime.date(2016, 1, 1) - datetime.date(1970, 1, 1)).days
+    print("✅ Values round-trip, including dates")
+    
+    # Group-bys give the same answers on far less memory
+    naive_totals = naive.groupby(['CATEGORY', 'REGION'])['SALES'].sum()
+    compact_totals = orders.groupby(['CATEGORY', 'REGION'], observed=True)['SALES'].sum()
+    assert np.allclose(compact_totals.reindex(naive_totals.index).to_numpy(), naive_totals.to_numpy())
+    ratio = memory_report(naive)["total_bytes"] / memory_report(orders)["total_bytes"]
+    assert ratio > 4
+    print(f"✅ Same group-by results with {ratio:.1f}x less memory")
+    
+    # Nulls survive in every kind of column
+    table = pa.table({
+        "NAME": pa.array(["b", None, "a"]),
+        "COUNT": pa.array([1, None, 300]),
+        "DAY": pa.array([datetime.date(2020, 1, 1), None, datetime.date(2020, 1, 3)]),
+    })
+    frame = compact_frame(table)
+    assert frame['NAME'].isna().tolist() == [False, True, False] and list(frame['NAME'].cat.categories) == ["a", "b"]
+    assert str(frame['COUNT'].dtype) == 'Int16' and frame['COUNT'].isna().sum() == 1
+    assert pd.isna(decode_dates(frame['DAY'])[1])
+    print("✅ Nulls are kept")
+
+if __name__ == "__main__":
+    test_compact_frame()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import example_cache
+import load_manifest
+from example_cache import EXAMPLE_QUERIES, refresh_examples, get_cached_answer, example_cache_stats, start_example_prewarm
+from load_manifest import load_manifest as read_manifest, record_artifact
+from question_router import router_stats
+
+def test_example_cache():
+    print("=== TESTING EXAMPLE ANSWER PRE-WARMING ===")
+    
+    work_dir = tempfile.mkdtemp()
+    load_manifest.MANIFEST_PATH = os.path.join(work_dir, 'load_manifest.json')
+    questions = [question for group in EXAMPLE_QUERIES.values() for question in group]
+    
+    # Without an agent, every example the router answers is pre-computed, outside the router's hit rate
+    questions_before = router_stats()["questions"]
+    computed = refresh_examples()
+    assert computed == 8 and router_stats()["questions"] == questions_before
+    cached = get_cached_answer("Show me the top 5 products by sales")
+    assert cached["cached"] and len(cached["data"]) == 5
+    assert router_stats()["questions"] == questions_before + 1 and router_stats()["routed"] >= 1
+    assert get_cached_answer("show me the TOP 5 products by sales?")["data"].equals(cached["data"])
+    assert get_cached_answer("Show me customers managed by Jason Gonzalez") is None
+    print(f"✅ {computed} of {len(questions)} examples pre-computed; a warm hit took {cached['cached_ms']:.2f} ms")
+    
+    # Current answers are not recomputed
+    assert refresh_examples() == 0
+    
+    # A new data version makes the answers stale: they stop being served and the next refresh replaces them
+    manifest = read_manifest()
+    record_artifact(manifest, "orders_ingest", "new-batch")
+    assert get_cached_answer("List all Gold tier customers") is None
+    assert example_cache._refresh_requested.is_set()
+    assert example_cache_stats()["current"] == 0
+    assert refresh_examples() == 8
+    assert get_cached_answer("List all Gold tier customers") is not None
+    print("✅ A data version change invalidates and refreshes the answers")
+    
+    # The background worker runs once when polling is off
+    start_example_prewarm(poll_seconds=0).join(timeout=30)
+    stats = example_cache_stats()
+    assert stats["current"] == 8 and not stats["refreshing"]
+    assert stats["avg_warm_ms"] < stats["avg_cold_ms"]
+    print(f"✅ Warm hits avg {stats['avg_warm_ms']:.2f} ms vs {stats['avg_cold_ms']:.1f} ms cold")
+    
+    shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    test_example_cache()
@@ -0,0 +1,39 @@
+import pyarrow.parquet as pq
+from generate_data import learn_distributions, generate_dataset
+from preprocess_data import arrow_schema, read_typed_csv
+
+def test_generate_data(tmp_dir='/tmp/test_generate_data'):
+    print("=== TESTING SYNTHETIC DATA GENERATOR ===")
+    
+    model = learn_distributions()
+    result = generate_dataset(50000, output_dir=tmp_dir, seed=42, chunk_rows=20000, model=model)
+    orders = pq.read_table(f"{tmp_dir}/orders").to_pandas()
+    customers = pq.read_table(f"{tmp_dir}/customers").to_pandas()
+    products = pq.read_table(f"{tmp_dir}/products").to_pandas()
+    assert len(orders) == 50000 and orders['ROW_ID'].is_unique
+    assert pq.read_schema(result['files'][-1]).equals(arrow_schema('Orders'))
+    print(f"✅ {len(orders)} order lines in {len(result['files']) - 2} chunks match the table schema")
+    
+    # Referential integrity: every fact row points at a generated, unique dimension row
+    assert customers['CUSTOMER_ID'].is_unique and products['PRODUCT_ID'].is_unique
+    assert orders['CUSTOMER_ID'].isin(customers['CUSTOMER_ID']).all()
+    assert orders['PRODUCT_ID'].isin(products['PRODUCT_ID']).all()
+    assert orders.groupby('ORDER_ID')['CUSTOMER_ID'].nunique().max() == 1
+    print("✅ Customer and product IDs resolve to the generated dimensions")
+    
+    # Learned distributions carry over
+    sample = read_typed_csv('Orders')
+    sample_mix = sample['CATEGORY'].value_counts(normalize=True)
+    generated_mix = orders['CATEGORY'].value_counts(normalize=True)
+    assert (sample_mix - generated_mix).abs().max() < 0.05
+    assert orders.loc[orders['DISCOUNT'] >= 0.5, 'PROFIT'].sum() < 0 < orders.loc[orders['DISCOUNT'] == 0, 'PROFIT'].sum()
+    assert (orders['SHIP_DATE'] >= orders['ORDER_DATE']).all()
+    print("✅ Category mix, discount/profit relationship and ship dates follow the sample")
+    
+    # Same seed, same bytes
+    again = generate_dataset(50000, output_dir=tmp_dir + '_again', seed=42, chunk_rows=20000, model=model)
+    assert pq.read_table(again['files'][-1]).equals(pq.read_table(result['files'][-1]))
+    print("✅ Output is deterministic for a seed")
+
+if __name__ == "__main__":
+    test_generate_data()
@@ -0,0 +1,77 @@
+import time
+from contextlib import contextmanager
+import health_probe
+from health_probe import get_health_status
+
+class CountingCursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self.sfqid = "health-query"
+        self.rowcount = 1
+
+    def execute(self, statement, params=None, timeout=None, _statement_params=None):
+        self.pool.statements.append(statement)
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+class CountingPool:
+    """Stands in for a SnowflakeConnectionPool and counts the statements run on it"""
+    def __init__(self):
+        self.statements = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return CountingCursor(self)
+
+class SignedAgent:
+    account = "test"
+
+    def get_jwt_token(self):
+        return {"token": "signed"}
+
+class UnsignedAgent(SignedAgent):
+    def get_jwt_token(self):
+        return None
+
+def wait_for_probe():
+    while get_health_status(refresh=False)["probing"]:
+        time.sleep(0.01)
+
+def test_health_probe():
+    print("=== TESTING HEALTH PROBE ===")
+    
+    # The first read returns at once and starts a background probe
+    pool = CountingPool()
+    status = get_health_status(agent_factory=SignedAgent, pool=pool, ttl_seconds=60)
+    assert status["state"] == "unknown" and status["probing"]
+    wait_for_probe()
+    status = get_health_status(agent_factory=SignedAgent, pool=pool, ttl_seconds=60)
+    assert status["state"] == "healthy" and set(status["checks"]) == {"snowflake", "cortex_agent"}
+    assert pool.statements == ["SELECT 1"]
+    print(f"✅ Probe finished in the background: {status['checks']['snowflake']['seconds'] * 1000:.1f} ms")
+    
+    # Within the TTL every read is served from the cached result
+    for _ in range(100):
+        cached = get_health_status(agent_factory=SignedAgent, pool=pool, ttl_seconds=60)
+    assert cached["checked_time"] == status["checked_time"] and pool.statements == ["SELECT 1"]
+    print("✅ 100 reads within the TTL ran no statements")
+    
+    # An expired result is re-probed; the stale one is served meanwhile
+    health_probe._probe_agent = None
+    stale = get_health_status(agent_factory=UnsignedAgent, pool=pool, ttl_seconds=0)
+    assert stale["state"] == "healthy"
+    wait_for_probe()
+    status = get_health_status(pool=pool, refresh=False)
+    assert status["state"] == "degraded" and not status["checks"]["cortex_agent"]["ok"]
+    assert len(pool.statements) == 2
+    print(f"✅ Expired result re-probed: {status['checks']['cortex_agent']['error_message']}")
+
+if __name__ == "__main__":
+    test_health_probe()
@@ -0,0 +1,85 @@
+import os
+import time
+import shutil
+import tempfile
+import ingest_daemon
+import columnar_cache
+import load_manifest
+from ingest_daemon import next_batch, record_file, ledger_status, freshness_report, keep_ingested_copy
+from load_manifest import load_manifest as read_manifest, record_ingested, ingested_files
+from columnar_cache import load_table
+from preprocess_data import prepare_load_file, source_path
+
+def test_ingest_daemon():
+    print("=== TESTING INGESTION LEDGER AND BATCHING ===")
+    
+    work_dir = tempfile.mkdtemp()
+    ingest_daemon.INGEST_LEDGER_PATH = os.path.join(work_dir, 'ingest_ledger.sqlite')
+    watch_dir = os.path.join(work_dir, 'incoming')
+    os.makedirs(watch_dir)
+    
+    # Three settled files, one a copy of another under a new name, plus a file still being written
+    for name in ('a.csv', 'b.csv'):
+        with open(os.path.join(watch_dir, name), 'w') as f:
+            f.write(f"Row ID\n{name}\n")
+    shutil.copy(os.path.join(watch_dir, 'a.csv'), os.path.join(watch_dir, 'a_again.csv'))
+    for age, name in ((60, 'a.csv'), (50, 'b.csv'), (40, 'a_again.csv')):
+        past = time.time() - age
+        os.utime(os.path.join(watch_dir, name), (past, past))
+    open(os.path.join(watch_dir, 'partial.csv'), 'w').close()
+    
+    batch = next_batch(watch_dir, settle_seconds=10, max_files=3)
+    assert [os.path.basename(f['path']) for f in batch] == ['a.csv', 'b.csv'], \
+        "oldest first, without duplicates or unsettled files"
+    # The copy waits in the watch directory until its original is loaded
+    assert os.path.exists(os.path.join(watch_dir, 'a_again.csv'))
+    assert not os.path.exists(os.path.join(watch_dir, 'processed'))
+    print(f"✅ Picked a micro-batch of {len(batch)} settled files")
+    
+    # Once loaded, the same content under another name is not loaded again
+    for file_info in batch:
+        record_file(file_info, "loaded", batch_id="test", rows_loaded=1)
+        os.remove(file_info['path'])
+    assert ledger_status(batch[0]['file_hash']) == "loaded"
+    assert next_batch(watch_dir, settle_seconds=10) == []
+    assert os.path.exists(os.path.join(watch_dir, 'processed', 'a_again.csv'))
+    print("✅ Files whose content was already loaded are skipped")
+    
+    report = freshness_report()
+    assert report['files'] == 2 and report['max_seconds'] >= 59
+    print(f"✅ Freshness lag reported: max {report['max_seconds']:.1f}s")
+    
+    # Loaded files are recorded once, in load order, for setup to append again after a reload
+    saved = (load_manifest.MANIFEST_PATH, columnar_cache.CACHE_DIR, columnar_cache.DIGEST_INDEX_PATH, columnar_cache.INGESTED_ORDERS_DIR)
+    load_manifest.MANIFEST_PATH = os.path.join(work_dir, 'load_manifest.json')
+    manifest = read_manifest()
+    record_ingested(manifest, ['first.parquet', 'second.parquet'])
+    record_ingested(manifest, ['second.parquet', 'third.parquet'])
+    assert ingested_files() == ['first.parquet', 'second.parquet', 'third.parquet']
+    print("✅ Ingested files recorded in the manifest")
+    
+    # The converted copy of a loaded file joins the local Orders source, once
+    columnar_cache.CACHE_DIR = os.path.join(work_dir, 'cache')
+    columnar_cache.DIGEST_INDEX_PATH = os.path.join(columnar_cache.CACHE_DIR, 'source_digests.json')
+    ingest_daemon.INGESTED_ORDERS_DIR = columnar_cache.INGESTED_ORDERS_DIR = os.path.join(work_dir, 'ingested')
+    base_rows = load_table('Orders').num_rows
+    extract = os.path.join(work_dir, 'extract.csv')
+    with open(source_path('Orders'), encoding='utf-8-sig') as f:
+        lines = f.readlines()[:11]
+    with open(extract, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    for attempt in range(2):
+        output_dir = os.path.join(work_dir, 'ingest', str(attempt))
+        prepared = prepare_load_file('Orders', extract, output_dir=output_dir)
+        keep_ingested_copy({"file_hash": "f" * 64, "staged_path": prepared["load_path"]}, f"000000000000{attempt}_000")
+        assert not os.path.exists(output_dir)
+    assert len(os.listdir(ingest_daemon.INGESTED_ORDERS_DIR)) == 1
+    assert load_table('Orders').num_rows == base_rows + 10
+    print(f"✅ Local Orders includes the ingested rows ({base_rows} + 10)")
+    
+    load_manifest.MANIFEST_PATH, columnar_cache.CACHE_DIR, columnar_cache.DIGEST_INDEX_PATH, columnar_cache.INGESTED_ORDERS_DIR = saved
+    ingest_daemon.INGESTED_ORDERS_DIR = columnar_cache.INGESTED_ORDERS_DIR
+    shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    test_ingest_daemon()
@@ -0,0 +1,46 @@
+import pytest
+from local_engine import LocalEngine, translate_sql, run_sql
+from preprocess_data import read_typed_csv
+
+def test_local_engine():
+    print("=== TESTING LOCAL SQL ENGINE ===")
+    
+    engine = LocalEngine()
+    orders = read_typed_csv('Orders')
+    
+    # Fully qualified, quoted upper-case names as Cortex Analyst writes them
+    result = engine.query('SELECT "REGION", SUM("SALES") AS "TOTAL" FROM "SUPERSTOREDB"."DATA"."ORDERS" GROUP BY "REGION"')
+    expected = orders.groupby('REGION')['SALES'].sum()
+    assert len(result) == len(expected)
+    for region, total in zip(result['REGION'], result['TOTAL']):
+        assert abs(total - expected[region]) < 0.01
+    print(f"✅ Qualified names resolve; {len(result)} regions match pandas")
+    
+    # Snowflake functions and bare date parts
+    assert translate_sql("SELECT DATEDIFF(day, a, b);") == "SELECT DATEDIFF('day', a, b)"
+    result = engine.query("""
+        SELECT IFF(SUM(Profit) > 0, 'profit', 'loss') AS Outcome,
+               DIV0(SUM(Profit), 0) AS Ratio,
+               MAX(DATEDIFF(day, Order_Date, Ship_Date)) AS Max_Days
+        FROM SuperstoreDB.data.Orders
+        """)
+    assert result['Outcome'][0] == 'profit' and result['Ratio'][0] == 0
+    assert result['Max_Days'][0] == (orders['SHIP_DATE'] - orders['ORDER_DATE']).map(lambda d: d.days).max()
+    print("✅ IFF, DIV0 and DATEDIFF(day, ...) run locally")
+    
+    # Dimensions are conformed and summary tables exist as views
+    customers = engine.query("SELECT COUNT(*) AS N, COUNT(DISTINCT Customer_ID) AS Keys FROM Customers")
+    assert customers['N'][0] == customers['Keys'][0]
+    summary = engine.query("SELECT SUM(Order_Lines) AS Lines FROM Daily_Sales_Summary")
+    assert summary['Lines'][0] == len(orders)
+    print("✅ Customers are unique per key and summary tables are available")
+    
+    # Unsupported SQL raises so callers can fall back to Snowflake
+    with pytest.raises(Exception):
+        engine.query("SELECT TO_CHAR(Order_Date, 'YYYY') FROM Orders")
+    with pytest.raises(Exception):
+        run_sql("SELECT TO_CHAR(Order_Date, 'YYYY') FROM Orders", backend="local", fallback=False)
+    print("✅ Unsupported SQL is reported instead of answered")
+
+if __name__ == "__main__":
+    test_local_engine()
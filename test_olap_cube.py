@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import pytest
+import pyarrow as pa
+import pyarrow.parquet as pq
+import columnar_cache
+from olap_cube import OlapCube, answer
+from columnar_cache import load_table
+from preprocess_data import source_path
+
+def test_olap_cube():
+    print("=== TESTING OLAP CUBE ===")
+    
+    orders_table = load_table('Orders')
+    orders = orders_table.to_pandas()
+    cube = OlapCube.from_orders(orders_table)
+    assert cube.rows_aggregated == len(orders) and cube.cells < len(orders)
+    print(f"✅ {len(orders)} rows aggregated into {cube.cells} cells")
+    
+    # Group-bys, averages and filters match pandas on the raw rows
+    result = cube.query(["SUM(SALES)", "AVG(DISCOUNT)", "COUNT(*)"], ["CATEGORY", "REGION"], {"SEGMENT": "Consumer"})
+    subset = orders[orders['SEGMENT'] == 'Consumer']
+    expected = subset.groupby(['CATEGORY', 'REGION']).agg(sales=('SALES', 'sum'), discount=('DISCOUNT', 'mean'), lines=('SALES', 'size'))
+    assert len(result) == len(expected)
+    for _, row in result.iterrows():
+        group = expected.loc[(row['CATEGORY'], row['REGION'])]
+        assert abs(row['SUM(SALES)'] - group['sales']) < 0.01
+        assert abs(row['AVG(DISCOUNT)'] - group['discount']) < 1e-9
+        assert row['COUNT(*)'] == group['lines']
+    print(f"✅ Sales, average discount and lines by category and region match pandas ({len(result)} groups)")
+    
+    monthly = cube.query(["PROFIT"], ["MONTH"], {"REGION": ["West", "East"], "MONTH": "2016-03"})
+    march = orders[orders['REGION'].isin(['West', 'East']) & (orders['ORDER_DATE'].astype(str).str[:7] == '2016-03')]
+    assert len(monthly) == 1 and abs(monthly['PROFIT'][0] - march['PROFIT'].sum()) < 0.01
+    total = cube.query(["SUM(QUANTITY)"])
+    assert total['SUM(QUANTITY)'][0] == orders['QUANTITY'].sum()
+    print("✅ Month filters, multi-value filters and grand totals are correct")
+    
+    # Appending rows incrementally gives the same cube as building from all rows
+    incremental = OlapCube.from_orders(orders_table.slice(0, 6000)).append(orders_table.slice(6000))
+    full = cube.query(["SUM(SALES)"], ["SUB_CATEGORY"]).set_index('SUB_CATEGORY')['SUM(SALES)']
+    appended = incremental.query(["SUM(SALES)"], ["SUB_CATEGORY"]).set_index('SUB_CATEGORY')['SUM(SALES)']
+    assert ((full - appended.reindex(full.index)).abs() < 0.01).all() and incremental.cells == cube.cells
+    print("✅ Incremental append matches a full build")
+    
+    # refresh adds only appended rows, and rebuilds when existing rows change even if the count does not
+    work_dir = tempfile.mkdtemp()
+    cache_dir, digest_index_path = columnar_cache.CACHE_DIR, columnar_cache.DIGEST_INDEX_PATH
+    columnar_cache.CACHE_DIR = os.path.join(work_dir, 'cache')
+    columnar_cache.DIGEST_INDEX_PATH = os.path.join(columnar_cache.CACHE_DIR, 'source_digests.json')
+    source = os.path.join(work_dir, 'orders')
+    os.makedirs(source)
+    pq.write_table(orders_table.slice(0, 6000), os.path.join(source, 'part_1.parquet'))
+    refreshed = OlapCube()
+    assert refreshed.refresh(source) == 6000 and refreshed.refresh(source) == 0
+    pq.write_table(orders_table.slice(6000), os.path.join(source, 'part_2.parquet'))
+    assert refreshed.refresh(source) == len(orders) - 6000 and refreshed.rows_aggregated == len(orders)
+    grown = refreshed.query(["SUM(SALES)"], ["SUB_CATEGORY"]).set_index('SUB_CATEGORY')['SUM(SALES)']
+    assert ((full - grown.reindex(full.index)).abs() < 0.01).all()
+    rewritten = orders.copy()
+    rewritten.loc[:99, 'SALES'] += 1000
+    os.remove(os.path.join(source, 'part_2.parquet'))
+    pq.write_table(pa.Table.from_pandas(rewritten, schema=orders_table.schema, preserve_index=False), os.path.join(source, 'part_1.parquet'))
+    assert refreshed.refresh(source) == len(orders) and refreshed.rows_aggregated == len(orders)
+    assert abs(refreshed.query(["SUM(SALES)"])['SUM(SALES)'][0] - rewritten['SALES'].sum()) < 0.01
+    # A CSV appended in place is recognised by hashing only the bytes already aggregated
+    csv_source = os.path.join(work_dir, 'orders.csv')
+    shutil.copy(source_path('Orders'), csv_source)
+    grown_csv = OlapCube()
+    assert grown_csv.refresh(csv_source) == len(orders)
+    with open(csv_source, 'a', encoding='utf-8') as f:
+        f.write(open(source_path('Orders'), encoding='utf-8-sig').read().splitlines()[1].replace('1,', '99999,', 1) + '\n')
+    assert grown_csv.refresh(csv_source) == 1 and grown_csv.rows_aggregated == len(orders) + 1
+    columnar_cache.CACHE_DIR, columnar_cache.DIGEST_INDEX_PATH = cache_dir, digest_index_path
+    shutil.rmtree(work_dir)
+    print("✅ refresh appends new files and rows and rebuilds when a same-size source is rewritten")
+    
+    # Questions outside the cube are rejected so callers can fall back
+    for measures, dimensions in ((["MEDIAN(SALES)"], []), (["SUM(SALES)"], ["CUSTOMER_ID"]), (["COUNT(ORDER_ID)"], [])):
+        with pytest.raises(ValueError):
+            cube.query(measures, dimensions)
+    fallback = answer(["MEDIAN(SALES)"], sql="SELECT MEDIAN(Sales) AS Median_Sales FROM SuperstoreDB.data.Orders")
+    assert fallback['source'] == 'local' and abs(fallback['data']['Median_Sales'][0] - orders['SALES'].median()) < 0.01
+    print("✅ Unsupported measures and dimensions are rejected and answered by the local engine instead")
+
+if __name__ == "__main__":
+    test_olap_cube()
@@ -0,0 +1,52 @@
+import datetime
+import pandas as pd
+from preprocess_data import TABLE_SCHEMAS, read_typed_csv, normalize_frame, to_arrow_table, arrow_schema, conform_dimension
+
+def test_preprocess_data():
+    print("=== TESTING CSV PREPROCESSING ===")
+    
+    orders = read_typed_csv('Orders')
+    assert len(orders) == 9994, "COPY with ON_ERROR = 'CONTINUE' must not be the only guard against dropped rows"
+    assert list(orders.columns)[0] == 'ROW_ID', "UTF-8 BOM should not leak into the first header"
+    assert orders['ORDER_DATE'].iloc[0] == datetime.date(2016, 11, 8)
+    assert orders['POSTAL_CODE'].str.len().eq(5).all()
+    print(f"✅ Orders: {len(orders)} rows, dates and postal codes normalized")
+    
+    for table in TABLE_SCHEMAS:
+        arrow_table = to_arrow_table(read_typed_csv(table), table)
+        assert arrow_table.schema.equals(arrow_schema(table))
+        print(f"✅ {table}: {arrow_table.num_rows} rows match the table schema")
+    
+    # Unparseable values must fail loudly instead of being dropped
+    raw = pd.read_csv('data/superstore_product_descriptions.csv', dtype=str, keep_default_na=False).head(5)
+    raw.loc[2, 'Release Date'] = '13/45/2020'
+    try:
+        normalize_frame(raw, 'Products')
+        raise AssertionError("Invalid date was accepted")
+    except ValueError as e:
+        print(f"✅ Invalid value rejected: {e}")
+
+def test_conform_dimension():
+    print("=== TESTING DIMENSION KEY CONFORMANCE ===")
+    
+    customers = read_typed_csv('Customers')
+    kept, dropped = conform_dimension(customers, 'Customers', 'latest')
+    assert kept['CUSTOMER_ID'].is_unique and len(kept) == customers['CUSTOMER_ID'].nunique()
+    assert len(kept) + len(dropped) == len(customers)
+    latest = customers.groupby('CUSTOMER_ID')['CUSTOMER_SINCE'].max()
+    assert (kept.set_index('CUSTOMER_ID')['CUSTOMER_SINCE'].sort_index() == latest).all()
+    print(f"✅ Customers: {len(kept)} of {len(customers)} rows kept, latest version of each")
+    
+    rows = pd.DataFrame({
+        'PRODUCT_ID': ['P1', 'P1', 'P1', 'P2'],
+        'BRAND': ['Acme', None, 'Apex', 'Acme'],
+        'RELEASE_DATE': [datetime.date(2020, 1, 1), datetime.date(2024, 1, 1), datetime.date(2022, 1, 1), None],
+    })
+    assert conform_dimension(rows, 'Products', 'first')[0]['BRAND'].tolist() == ['Acme', 'Acme']
+    assert conform_dimension(rows, 'Products', 'latest')[0]['BRAND'].tolist() == [None, 'Acme']
+    assert conform_dimension(rows, 'Products', 'most_complete')[0]['BRAND'].tolist() == ['Apex', 'Acme']
+    print("✅ first, latest and most_complete survivorship rules pick the expected rows")
+
+if __name__ == "__main__":
+    test_preprocess_data()
+    test_conform_dimension()
@@ -0,0 +1,47 @@
+import os
+import json
+import tempfile
+import query_ledger
+
+def test_query_ledger():
+    print("=== TESTING QUERY TAGS AND LEDGER ===")
+    
+    # Point the ledger at a throwaway file
+    query_ledger.LEDGER_PATH = os.path.join(tempfile.mkdtemp(), 'ledger.sqlite')
+    query_ledger._ledger_initialized = False
+    
+    tag = query_ledger.build_query_tag("chat_sql_exec", "conversation-1", "What are the total sales by category?")
+    params = query_ledger.tag_statement_params(tag)
+    assert json.loads(params["QUERY_TAG"])["feature"] == "chat_sql_exec"
+    assert tag["question_hash"] and "sales" not in tag["question_hash"]
+    print(f"✅ Query tag: {params['QUERY_TAG']}")
+    
+    query_ledger.record_query(tag, "SELECT 1", query_id="q-1", submit_time=1.0,
+                              first_row_seconds=0.5, last_row_seconds=2.0, rows_fetched=10, bytes_fetched=80)
+    query_ledger.record_query(query_ledger.build_query_tag("data_explorer"), "SELECT 2", query_id="q-2",
+                              submit_time=1.0, first_row_seconds=0.1, last_row_seconds=0.2, rows_fetched=100)
+    query_ledger.record_query(query_ledger.build_query_tag("data_explorer"), "SELECT 3", status="error",
+                              error_message="boom", submit_time=1.0, last_row_seconds=0.4)
+    
+    features = query_ledger.top_slowest_features(n=5)
+    assert [row["feature"] for row in features] == ["chat_sql_exec", "data_explorer"]
+    assert features[1]["query_count"] == 2 and features[1]["error_count"] == 1
+    print(f"✅ Slowest features: {[(row['feature'], round(row['avg_seconds'], 2)) for row in features]}")
+    
+    slowest = query_ledger.slowest_queries(n=1)
+    assert slowest[0]["query_id"] == "q-1"
+    print("✅ Slowest query can be joined on query_id:", slowest[0]["query_id"])
+    
+    # Rerun latency percentiles
+    for seconds in [0.01 * i for i in range(1, 21)]:
+        query_ledger.record_query(query_ledger.build_query_tag("app_rerun"), "rerun:render",
+                                  submit_time=2.0, last_row_seconds=seconds)
+    query_ledger.record_query(query_ledger.build_query_tag("app_rerun"), "rerun:chat", submit_time=2.0, last_row_seconds=9.0)
+    latency = query_ledger.feature_latency("app_rerun", statement="rerun:render")
+    assert latency["count"] == 20 and latency["p50_seconds"] == 0.11 and latency["p95_seconds"] == 0.2
+    assert query_ledger.feature_latency("app_rerun")["max_seconds"] == 9.0
+    assert query_ledger.feature_latency("app_rerun", since=3.0) == {"count": 0, "p50_seconds": None, "p95_seconds": None, "max_seconds": None}
+    print(f"✅ Rerun latency: p50 {latency['p50_seconds'] * 1000:.0f} ms, p95 {latency['p95_seconds'] * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    test_query_ledger()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import pytest
+import pandas as pd
+import pyarrow.parquet as pq
+import columnar_cache
+from semantic_query import compile_query, execute_plan, plan_to_sql, run_structured_query
+from local_engine import get_local_engine
+from columnar_cache import load_table
+
+REQUESTS = [
+    {"measures": ["SUM(SALES)", "AVG(DISCOUNT)", "COUNT(*)"], "dimensions": ["CATEGORY", "REGION"]},
+    {"measures": ["SUM(PROFIT)", "COUNT_DISTINCT(ORDER_ID)"], "dimensions": ["CUSTOMERS.CUSTOMER_TIER"],
+     "filters": [{"column": "SEGMENT", "op": "in", "value": ["Consumer", "Corporate"]}]},
+    {"measures": ["SUM(QUANTITY)"], "dimensions": ["MATERIAL"], "time_dimension": "ORDER_DATE", "time_grain": "year",
+     "filters": [{"column": "ORDER_DATE", "op": "between", "value": ["2016-01-01", "2017-06-30"]}]},
+    {"table": "DAILY_SALES_SUMMARY", "measures": ["AVERAGE_DISCOUNT", "PROFIT_MARGIN"], "dimensions": ["SHIP_MODE"]},
+    {"measures": ["SUM(SALES)"], "dimensions": ["PRODUCT_NAME"],
+     "order_by": [{"column": "SUM(SALES)", "direction": "desc"}], "limit": 5},
+]
+
+def _normalized(frame):
+    frame = frame.copy()
+    frame.columns = [column.upper() for column in frame.columns]
+    for column in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[column]):
+            frame[column] = frame[column].dt.date
+    return frame
+
+def test_semantic_query():
+    print("=== TESTING SEMANTIC QUERY COMPILER ===")
+    
+    # The pandas execution and the generated SQL (run on the local engine) agree
+    engine = get_local_engine()
+    for request in REQUESTS:
+        plan = compile_query(request)
+        local = _normalized(execute_plan(plan))
+        via_sql = _normalized(engine.query(plan_to_sql(plan)))
+        assert list(local.columns) == list(via_sql.columns)
+        assert len(local) == len(via_sql)
+        dimensions = [d["name"] for d in plan["dimensions"]]
+        if dimensions and not plan["limit"]:
+            local = local.sort_values(dimensions).reset_index(drop=True)
+            via_sql = via_sql.sort_values(dimensions).reset_index(drop=True)
+        for column in local.columns:
+            if column in dimensions:
+                assert local[column].astype(str).tolist() == via_sql[column].astype(str).tolist()
+            else:
+                assert ((local[column].astype(float) - via_sql[column].astype(float)).abs() < 1e-6).all(), column
+        print(f"✅ {', '.join(request['measures'])} by {', '.join(dimensions)}: {len(local)} rows match the SQL")
+    
+    # Relationships drive the joins: CUSTOMER_TIER pulls in Customers only
+    plan = compile_query(REQUESTS[1])
+    assert [join["name"] for join in plan["joins"]] == ["ORDERS_TO_CUSTOMERS"]
+    print("✅ Joins follow the declared relationships")
+    
+    # Invalid requests are rejected with every problem listed
+    with pytest.raises(ValueError) as error:
+        compile_query({"measures": ["SUM(CATEGORY)", "SUM(NOPE)"], "dimensions": ["REGION"], "time_dimension": "ORDER_DATE", "time_grain": "fortnight",
+                       "filters": [{"column": "REGION", "op": "like", "value": "W%"}]})
+    message = str(error.value)
+    assert "not a fact" in message and "NOPE" in message and "time_grain" in message and "like" in message
+    with pytest.raises(ValueError):
+        compile_query({"table": "CUSTOMERS", "measures": ["SUM(SALES)"]})
+    print("✅ Invalid measures, unknown columns, grains and operators are rejected")
+    
+    result = run_structured_query(REQUESTS[4])
+    assert len(result["data"]) == 5 and "LIMIT 5" in result["sql"]
+    print(f"✅ run_structured_query answered in {result['seconds'] * 1000:.1f} ms")
+    
+    # A source change reaches the next query without clearing anything: here, rows appended by ingestion
+    count = {"measures": ["COUNT(ORDER_ID)"]}
+    summary_count = {"table": "DAILY_SALES_SUMMARY", "measures": ["SUM(ORDER_LINES)"]}
+    before = run_structured_query(count)["data"].iloc[0, 0], run_structured_query(summary_count)["data"].iloc[0, 0]
+    work_dir = tempfile.mkdtemp()
+    ingested_dir = columnar_cache.INGESTED_ORDERS_DIR
+    columnar_cache.INGESTED_ORDERS_DIR = work_dir
+    try:
+        pq.write_table(load_table('Orders').slice(0, 10), os.path.join(work_dir, '0000000000001_000_test.parquet'))
+        after = run_structured_query(count)["data"].iloc[0, 0], run_structured_query(summary_count)["data"].iloc[0, 0]
+        assert after == (before[0] + 10, before[1] + 10)
+    finally:
+        columnar_cache.INGESTED_ORDERS_DIR = ingested_dir
+        shutil.rmtree(work_dir)
+    assert run_structured_query(count)["data"].iloc[0, 0] == before[0]
+    print("✅ Frames and summary tables follow a changed source")
+
+if __name__ == "__main__":
+    test_semantic_query()
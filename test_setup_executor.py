@@ -0,0 +1,63 @@
+import os
+import time
+import tempfile
+import load_manifest
+from setup_executor import run_steps, critical_path, incomplete_steps
+
+def test_setup_executor():
+    print("=== TESTING SETUP EXECUTOR ===")
+    
+    # Keep checkpoints out of the real manifest
+    load_manifest.MANIFEST_PATH = os.path.join(tempfile.mkdtemp(), 'manifest.json')
+    manifest = {"target": "TEST", "artifacts": {}}
+    calls = []
+    failing = {"copy": True}
+    
+    def work(name, seconds=0.0):
+        def run():
+            time.sleep(seconds)
+            if failing.get(name):
+                raise RuntimeError(f"{name} failed")
+            calls.append(name)
+        return run
+    
+    steps = [
+        {"name": "table", "run": work("table", 0.05), "digest": "ddl"},
+        {"name": "put", "run": work("put", 0.05), "digest": "file-v1"},
+        {"name": "copy", "run": work("copy"), "depends_on": ["table", "put"], "digest": "copy"},
+        {"name": "search", "run": work("search"), "after": ["copy"], "digest": "service"},
+        {"name": "model", "run": work("model"), "digest": "model"},
+    ]
+    
+    start_time = time.time()
+    results = run_steps(steps, manifest, max_workers=4)
+    assert time.time() - start_time < 0.1, "table and put should run in parallel"
+    assert results["copy"]["status"] == "failed" and results["search"]["status"] == "blocked"
+    assert results["model"]["status"] == "success", "independent branches keep running after a failure"
+    assert incomplete_steps(steps, results) == ["copy", "search"]
+    print("✅ Failure blocks only dependent steps; independent steps run in parallel")
+    
+    # Re-run resumes at the failed step
+    failing["copy"] = False
+    calls.clear()
+    results = run_steps(steps, manifest)
+    assert calls == ["copy", "search"], calls
+    assert critical_path(steps, results)[-2:] == ["copy", "search"]
+    print("✅ Re-run resumes from the first failure")
+    
+    # A changed input reruns its dependents but not steps that only run after them
+    steps[1]["digest"] = "file-v2"
+    calls.clear()
+    run_steps(steps, manifest)
+    assert calls == ["put", "copy"], calls
+    print("✅ Changed inputs rerun dependent steps only")
+    
+    try:
+        run_steps([{"name": "a", "run": work("a"), "depends_on": ["b"]},
+                   {"name": "b", "run": work("b"), "depends_on": ["a"]}], manifest)
+        raise AssertionError("Dependency cycle was accepted")
+    except ValueError as e:
+        print(f"✅ Dependency cycle rejected: {e}")
+
+if __name__ == "__main__":
+    test_setup_executor()
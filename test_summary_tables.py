@@ -0,0 +1,30 @@
+import re
+import yaml
+from setup_database import SUMMARY_TABLES, SEMANTIC_MODEL_PATH, PRODUCT_DOCUMENTS_QUERY
+
+def test_summary_tables():
+    print("=== TESTING SUMMARY TABLES AGAINST THE SEMANTIC MODEL ===")
+    
+    with open(SEMANTIC_MODEL_PATH, 'r') as f:
+        model = yaml.safe_load(f)
+    logical_tables = {table['base_table']['table']: table for table in model['tables']}
+    
+    for name, query in SUMMARY_TABLES.items():
+        table = logical_tables.get(name.upper())
+        assert table, f"{name} is not exposed in the semantic model"
+        
+        # Every column the model reads must be produced by the summary query
+        select_list = query.upper().split(' FROM ')[0]
+        produced = set(re.findall(r'\bAS (\w+)', select_list)) | set(re.findall(r'^\s*(\w+),?$', select_list, re.MULTILINE))
+        for section in ('time_dimensions', 'dimensions', 'facts'):
+            for column in table.get(section, []):
+                assert column['expr'].upper() in produced, f"{name} does not produce {column['expr']}"
+        print(f"✅ {name}: {len(produced)} columns match the semantic model")
+    
+    # Search documents and Product_Summary pick the same name for a product
+    name_rule = lambda query: re.search(r'(\w+)\((?:\w+\.)?Product_Name\) AS Product_Name', query).group(1)
+    assert name_rule(PRODUCT_DOCUMENTS_QUERY) == name_rule(SUMMARY_TABLES["Product_Summary"])
+    print(f"✅ Product_Documents and Product_Summary both name products by {name_rule(PRODUCT_DOCUMENTS_QUERY)}")
+
+if __name__ == "__main__":
+    test_summary_tables()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import pytest
+import columnar_cache
+import table_profile
+from table_profile import get_profile, profile_frame, profile_path
+from columnar_cache import load_dataframe
+
+def test_table_profile():
+    print("=== TESTING TABLE PROFILES ===")
+
+    work_dir = tempfile.mkdtemp()
+    columnar_cache.CACHE_DIR = os.path.join(work_dir, 'cache')
+    columnar_cache.DIGEST_INDEX_PATH = os.path.join(columnar_cache.CACHE_DIR, 'source_digests.json')
+
+    # Statistics describe every row, not a sample
+    profile = get_profile('Orders', backend='local')
+    orders = load_dataframe('Orders')
+    columns = {column["name"]: column for column in profile["columns"]}
+    assert profile["rows"] == len(orders) and not profile["cached"]
+    for name in ['SALES', 'PROFIT', 'QUANTITY', 'DISCOUNT']:
+        assert columns[name]["count"] == orders[name].count() and columns[name]["nulls"] == orders[name].isna().sum()
+        assert columns[name]["min"] == pytest.approx(orders[name].min()) and columns[name]["max"] == pytest.approx(orders[name].max())
+        assert columns[name]["mean"] == pytest.approx(orders[name].mean())
+        assert orders[name].quantile(0.2) <= columns[name]["p50"] <= orders[name].quantile(0.8)
+    assert columns['ORDER_DATE']["min"] == str(orders['ORDER_DATE'].min())[:10]
+    assert columns['CUSTOMER_NAME']["max"] == orders['CUSTOMER_NAME'].max()
+    assert all(column["approx_distinct"] <= column["count"] for column in profile["columns"])
+    print(f"✅ Orders profiled over all {profile['rows']} rows in {profile['seconds']:.2f}s")
+
+    # Top values are exact counts
+    for name in ['REGION', 'CATEGORY', 'SHIP_MODE']:
+        expected = orders[name].value_counts()
+        assert [(top["value"], top["count"]) for top in columns[name]["top_values"]] == list(zip(expected.index, expected.tolist()))
+    assert columns['ROW_ID']["top_values"] is None and columns['SALES']["top_values"] is None
+    print(f"✅ Top values: {[(top['value'], top['count']) for top in columns['REGION']['top_values']]}")
+
+    # Customers has no STATE column; its categorical column still gets top values
+    customers = get_profile('Customers', backend='local')
+    tiers = {column["name"]: column for column in customers["columns"]}['CUSTOMER_TIER']["top_values"]
+    assert 'STATE' not in profile_frame(customers).index and {top["value"] for top in tiers} == {"Gold", "Silver", "Bronze"}
+    print("✅ Customers profiled by tier")
+
+    # Computed once per data version: memory, then the stored file, then recomputed on request
+    cached = get_profile('Orders', backend='local')
+    assert cached["cached"] and cached["computed_time"] == profile["computed_time"]
+    assert os.path.exists(profile_path('Orders', 'local', profile["version"]))
+    table_profile._profiles.clear()
+    stored = get_profile('Orders', backend='local')
+    assert stored["cached"] and stored["columns"] == cached["columns"]
+    outdated = profile_path('Orders', 'local', 'orders_raw_0000000000000000')
+    with open(outdated, 'w') as f:
+        f.write('{}')
+    assert not get_profile('Orders', backend='local', refresh=True)["cached"]
+    assert not os.path.exists(outdated) and os.path.exists(profile_path('Customers', 'local', customers["version"]))
+    print(f"✅ Profile cached for data version {profile['version']}; outdated profiles removed")
+
+if __name__ == "__main__":
+    test_table_profile()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import columnar_cache
+import semantic_query
+from wide_table import KeyIndex, get_key_index, key_index_path, load_wide_table, wide_table_path, row_column
+from columnar_cache import load_dataframe
+from preprocess_data import source_path
+
+def test_wide_table():
+    print("=== TESTING KEY INDEXES AND THE ORDERS WIDE TABLE ===")
+    
+    work_dir = tempfile.mkdtemp()
+    columnar_cache.CACHE_DIR = os.path.join(work_dir, 'cache')
+    columnar_cache.DIGEST_INDEX_PATH = os.path.join(columnar_cache.CACHE_DIR, 'source_digests.json')
+    
+    # Key indexes map keys to rows of the conformed dimension
+    customers = load_dataframe('Customers', conform=True)
+    index = get_key_index('Customers')
+    assert index.lookup(customers['CUSTOMER_ID'][10])['CUSTOMER_TIER'] == customers['CUSTOMER_TIER'][10]
+    assert index.lookup('NO-SUCH-KEY') is None
+    assert list(index.positions(['NO-SUCH-KEY', customers['CUSTOMER_ID'][3]])) == [-1, 3]
+    assert get_key_index('Customers') is index
+    assert list(index.positions(customers['CUSTOMER_ID'])) == list(range(len(customers)))
+    print("✅ Key indexes return row positions and rows")
+    
+    # The index is written once next to the dimension's cache file and mapped by later loads
+    built_at = os.path.getmtime(key_index_path('Customers'))
+    assert list(KeyIndex('Customers').positions(['NO-SUCH-KEY', customers['CUSTOMER_ID'][3]])) == [-1, 3]
+    assert os.path.getmtime(key_index_path('Customers')) == built_at
+    print("✅ Key indexes are persisted and reused")
+    
+    # The wide table holds the same attributes a join would
+    wide = load_wide_table().to_pandas()
+    orders = load_dataframe('Orders')
+    products = load_dataframe('Products', conform=True)
+    joined = orders.merge(customers, on='CUSTOMER_ID', how='left').merge(products, on='PRODUCT_ID', how='left')
+    for column in ['CUSTOMER_TIER', 'ACCOUNT_MANAGER', 'BRAND', 'MATERIAL', 'SUSTAINABILITY_RATING', 'WARRANTY_YEARS']:
+        assert wide[column].astype(str).tolist() == joined[column].astype(str).tolist(), column
+    assert wide[row_column('Customers')].notna().sum() == joined['CUSTOMER_SINCE'].notna().sum()
+    print(f"✅ Wide table matches Orders joined to Customers and Products ({len(wide)} rows)")
+    
+    # Any source change gives a new wide table; other sources keep theirs
+    source = os.path.join(work_dir, 'orders.csv')
+    shutil.copy(source_path('Orders'), source)
+    before = wide_table_path(source)
+    assert before != wide_table_path() and load_wide_table(source).num_rows == len(wide)
+    with open(source, 'a', encoding='utf-8') as f:
+        f.write(open(source_path('Orders'), encoding='utf-8-sig').read().splitlines()[1].replace('1,', '99999,', 1) + '\n')
+    assert wide_table_path(source) != before
+    assert load_wide_table(source).num_rows == len(wide) + 1
+    assert not os.path.exists(before) and os.path.exists(wide_table_path())
+    print("✅ A changed source invalidates the wide table")
+    
+    # The structured query path answers attribute questions from the wide table with the same result as joining
+    plan = semantic_query.compile_query({"measures": ["SUM(PROFIT)"], "dimensions": ["SUSTAINABILITY_RATING", "CUSTOMER_TIER"],
+                                         "filters": [{"column": "MATERIAL", "op": "=", "value": "Glass"}]})
+    assert semantic_query._wide_columns(plan, semantic_query.get_semantic_model(), {"ORDERS": {"PROFIT"}, "PRODUCTS": {"SUSTAINABILITY_RATING", "MATERIAL"}, "CUSTOMERS": {"CUSTOMER_TIER"}})
+    from_wide = semantic_query.execute_plan(plan).sort_values(["SUSTAINABILITY_RATING", "CUSTOMER_TIER"]).reset_index(drop=True)
+    semantic_query.WIDE_TABLE_ENABLED = False
+    try:
+        from_join = semantic_query.execute_plan(plan).sort_values(["SUSTAINABILITY_RATING", "CUSTOMER_TIER"]).reset_index(drop=True)
+    finally:
+        semantic_query.WIDE_TABLE_ENABLED = True
+    assert from_wide[["SUSTAINABILITY_RATING", "CUSTOMER_TIER"]].equals(from_join[["SUSTAINABILITY_RATING", "CUSTOMER_TIER"]])
+    assert np.allclose(from_wide["SUM(PROFIT)"], from_join["SUM(PROFIT)"])
+    assert semantic_query._frames[semantic_query.WIDE_FRAME_KEY][0] == wide_table_path()
+    print("✅ Structured queries on the wide table match the joined result")
+    
+    shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    test_wide_table()
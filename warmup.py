@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from snowflake_connection import get_connection_pool
+from query_ledger import build_query_tag, execute_tagged
+
+# Load environment variables
+load_dotenv()
+
+# Number of pooled connections opened ahead of the first question
+WARMUP_CONNECTIONS = int(os.getenv('WARMUP_CONNECTIONS', '2'))
+
+# Seconds between keep-warm runs (0 disables). Keep it below the warehouse AUTO_SUSPEND of 300s
+KEEP_WARM_INTERVAL = int(os.getenv('WARMUP_KEEP_WARM_SECONDS', '0'))
+
+# Cheap statement that resumes the warehouse if it is suspended
+RESUME_WAREHOUSE_STATEMENT = "ALTER WAREHOUSE IF EXISTS {warehouse} RESUME IF SUSPENDED"
+
+_status_lock = threading.Lock()
+_status = {
+    "state": "cold",        # cold, warming, warm or error
+    "last_warm_time": None,  # time.time() of the last successful warm-up
+    "steps": {},             # step name -> seconds taken
+    "error_message": None
+}
+_warmup_thread = None
+
+def get_warmup_status():
+    """
+    Return a snapshot of the warm-up status for display in the UI
+    """
+    with _status_lock:
+        status = dict(_status)
+        status["steps"] = dict(_status["steps"])
+        return status
+
+def _set_status(**updates):
+    with _status_lock:
+        _status.update(updates)
+
+def _timed(steps, name, func, *args):
+    start_time = time.time()
+    result = func(*args)
+    steps[name] = time.time() - start_time
+    return result
+
+def _prime_pool(pool, count):
+    """Open up to count connections concurrently and hand them back to the pool"""
+    count = min(count, pool.max_size)
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        connections = list(executor.map(lambda _: pool.acquire(), range(count)))
+    for conn in connections:
+        pool.release(conn)
+
+def _resume_warehouse(pool):
+    warehouse = os.getenv('SNOWFLAKE_WAREHOUSE', 'SuperstoreWarehouse')
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        tag = build_query_tag("warmup")
+        execute_tagged(cursor, RESUME_WAREHOUSE_STATEMENT.format(warehouse=warehouse), tag)
+        execute_tagged(cursor, "SELECT current_warehouse()", tag)
+        cursor.fetchone()
+        cursor.close()
+
+def warm_up(agent=None, pool=None, connections=None):
+    """
+    Pay the cold-start costs before the first user question arrives
+
+    Opens pooled connections, signs the agent's JWT and resumes the warehouse.
+    Progress and per-step timings are published through get_warmup_status().
+
+    Args:
+        agent (CortexAgent): Agent whose JWT and key-pair connections should be primed
+        pool (SnowflakeConnectionPool): Pool to prime (default get_connection_pool())
+        connections (int): Number of connections to open (default WARMUP_CONNECTIONS)
+
+    Returns:
+        bool: True if every step succeeded
+    """
+    pool = pool or get_connection_pool()
+    connections = connections or WARMUP_CONNECTIONS
+    steps = {}
+    _set_status(state="warming", error_message=None)
+
+    try:
+        _timed(steps, "connect", _prime_pool, pool, connections)
+        if agent is not None:
+            _timed(steps, "sign_jwt", agent.get_jwt_token)
+            _timed(steps, "agent_connect", _prime_pool, agent.connection_pool, 1)
+        _timed(steps, "resume_warehouse", _resume_warehouse, pool)
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+        _set_status(state="error", steps=steps, error_message=str(e))
+        return False
+
+    print(f"Warm-up completed: {', '.join(f'{name}={elapsed:.2f}s' for name, elapsed in steps.items())}")
+    _set_status(state="warm", steps=steps, last_warm_time=time.time())
+    return True
+
+def _warmup_loop(agent, pool, keep_warm_interval):
+    warm_up(agent=agent, pool=pool)
+    while keep_warm_interval:
+        time.sleep(keep_warm_interval)
+        warm_up(agent=agent, pool=pool)
+
+def start_background_warmup(agent=None, pool=None, keep_warm_interval=None):
+    """
+    Run warm_up() in a daemon thread, optionally repeating it on a keep-warm schedule
+
+    Safe to call on every app rerun: the warm-up runs once per process (and keeps
+    running on the keep-warm schedule), not again on each call. If it finished
+    with an error, the next call starts it again.
+
+    Args:
+        agent (CortexAgent): Agent to prime alongside the shared connection pool
+        pool (SnowflakeConnectionPool): Pool to prime (default get_connection_pool())
+        keep_warm_interval (int): Seconds between repeated warm-ups (default KEEP_WARM_INTERVAL, 0 disables)
+
+    Returns:
+        threading.Thread: The running (or last) warm-up thread
+    """
+    global _warmup_thread
+    if keep_warm_interval is None:
+        keep_warm_interval = KEEP_WARM_INTERVAL
+
+    with _status_lock:
+        failed = _warmup_thread is not None and not _warmup_thread.is_alive() and _status["state"] == "error"
+        if _warmup_thread is None or failed:
+            _warmup_thread = threading.Thread(
+                target=_warmup_loop,
+                args=(agent, pool, keep_warm_interval),
+                name="snowflake-warmup",
+                daemon=True
+            )
+            _warmup_thread.start()
+        return _warmup_thread
+
+if __name__ == "__main__":
+    warm_up()
+    print(get_warmup_status())
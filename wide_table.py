@@ -0,0 +1,224 @@
+import os
+import time
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from dotenv import load_dotenv
+from load_manifest import text_sha256
+from preprocess_data import SURVIVORSHIP_RULE, TABLE_SCHEMAS, source_path
+import columnar_cache
+from columnar_cache import load_table, cache_path, map_file, remove_superseded, source_id
+
+# Load environment variables
+load_dotenv()
+
+# Answer Orders questions about customer or product attributes from the wide table instead of joining
+WIDE_TABLE_ENABLED = os.getenv('LOCAL_WIDE_TABLE', 'true').lower() == 'true'
+
+# Dimensions gathered into the wide table and the Orders column referencing each one's key
+WIDE_DIMENSIONS = {
+    'Customers': 'CUSTOMER_ID',
+    'Products': 'PRODUCT_ID',
+}
+
+# Bump when the wide table layout changes so existing files are rebuilt
+WIDE_FORMAT_VERSION = 1
+
+def row_column(table):
+    """Name of the wide table column holding the matching row of a dimension (null when there is none)"""
+    return f"{table.upper()}_ROW"
+
+def key_index_path(table, rule=SURVIVORSHIP_RULE):
+    """Return the key index file of a conformed dimension, named after the cache file it indexes"""
+    return os.path.join(columnar_cache.CACHE_DIR, f"keys_{os.path.basename(cache_path(table, conform=True, rule=rule))}")
+
+def _key_hashes(values):
+    """64-bit hashes of key values, the same in every process"""
+    return pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+
+def _write_file(table, target):
+    """Write a table as an uncompressed Arrow IPC file under a temporary name, then rename it into place"""
+    os.makedirs(columnar_cache.CACHE_DIR, exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, target)
+
+def build_key_index(table, rule=SURVIVORSHIP_RULE):
+    """
+    Write a conformed dimension's key index next to its cache file
+
+    The index holds the key hashes sorted, each with the row position of its key,
+    so any process can map it and binary-search it instead of hashing every key.
+    Index files of earlier versions of the same dimension are removed.
+
+    Returns:
+        str: Path of the key index file
+    """
+    target = key_index_path(table, rule)
+    rows = load_table(table, conform=True, rule=rule)
+    hashes = _key_hashes(rows.column(TABLE_SCHEMAS[table]['key']).to_numpy(zero_copy_only=False))
+    order = np.argsort(hashes, kind='stable')
+    _write_file(pa.table({'KEY_HASH': hashes[order], 'POSITION': order.astype(np.int32)}), target)
+    remove_superseded(f"{os.path.basename(target).rsplit('_', 1)[0]}_*.arrow", target)
+    return target
+
+class KeyIndex:
+    """
+    Index from a conformed dimension's key to its row position
+
+    The rows are the memory-mapped, conformed dimension from the columnar cache,
+    so a position indexes straight into the dimension as setup_database.py loads it.
+    The index itself is the memory-mapped key index file (see build_key_index),
+    built once per version of the dimension and shared by every process.
+    """
+
+    def __init__(self, table, rule=SURVIVORSHIP_RULE):
+        self.table = table
+        self.key = TABLE_SCHEMAS[table]['key']
+        self.rows = load_table(table, conform=True, rule=rule)
+        path = key_index_path(table, rule)
+        if not os.path.exists(path):
+            path = build_key_index(table, rule)
+        index = map_file(path)
+        self.hashes = index.column('KEY_HASH').combine_chunks().to_numpy()
+        self.order = index.column('POSITION').combine_chunks().to_numpy()
+
+    def _find(self, keys):
+        """Row positions of an array of key values, -1 where a key has no row"""
+        keys = np.asarray(keys, dtype=object)
+        hashes = _key_hashes(keys)
+        slots = np.searchsorted(self.hashes, hashes)
+        positions = np.full(len(keys), -1, dtype=np.int32)
+        hit = np.flatnonzero(slots < len(self.hashes))
+        hit = hit[self.hashes[slots[hit]] == hashes[hit]]
+        candidates = self.order[slots[hit]]
+        matched = self.rows.column(self.key).take(candidates).to_numpy(zero_copy_only=False) == keys[hit]
+        positions[hit[matched]] = candidates[matched]
+        # Keys sharing a hash sit next to each other; check the rest of the run on a collision
+        for i in hit[~matched]:
+            slot = slots[i] + 1
+            while slot < len(self.hashes) and self.hashes[slot] == hashes[i]:
+                if self.rows.column(self.key)[int(self.order[slot])].as_py() == keys[i]:
+                    positions[i] = self.order[slot]
+                    break
+                slot += 1
+        return positions
+
+    def positions(self, keys):
+        """
+        Row positions of many keys at once
+
+        Args:
+            keys: Arrow array or column, or array-like of key values
+
+        Returns:
+            numpy.ndarray: int32 row positions, -1 where a key has no row
+        """
+        if isinstance(keys, (pa.Array, pa.ChunkedArray)):
+            # Look up each distinct key once, then expand by the dictionary codes
+            encoded = pc.dictionary_encode(keys).combine_chunks()
+            distinct = self._find(encoded.dictionary.to_numpy(zero_copy_only=False))
+            codes = encoded.indices.fill_null(-1).to_numpy()
+            return np.where(codes >= 0, np.append(distinct, -1)[codes], -1).astype(np.int32)
+        return self._find(keys)
+
+    def lookup(self, key):
+        """Return a key's row as a dict, or None if the key is not in the dimension"""
+        position = self._find([key])[0]
+        return self.rows.slice(position, 1).to_pylist()[0] if position >= 0 else None
+
+_key_indexes = {}
+_key_indexes_lock = threading.Lock()
+
+def get_key_index(table, rule=SURVIVORSHIP_RULE):
+    """
+    Return the process-wide key index of a dimension, mapped again only when its source changes
+    """
+    source_key = cache_path(table, conform=True, rule=rule)
+    with _key_indexes_lock:
+        if (table, rule) not in _key_indexes or _key_indexes[(table, rule)][0] != source_key:
+            _key_indexes[(table, rule)] = (source_key, KeyIndex(table, rule))
+        return _key_indexes[(table, rule)][1]
+
+def wide_table_path(path=None, rule=SURVIVORSHIP_RULE):
+    """
+    Return the wide table file for an Orders source, named by a hash of every source it gathers from
+
+    The component cache file names are themselves content hashes, so a change
+    to Orders, Customers, Products or the survivorship rule gives a new file name.
+    The name starts with the Orders source_id, so wide tables of different sources
+    never supersede each other.
+    """
+    key = text_sha256(
+        WIDE_FORMAT_VERSION,
+        os.path.basename(cache_path('Orders', path)),
+        *(os.path.basename(cache_path(table, conform=True, rule=rule)) for table in WIDE_DIMENSIONS)
+    )
+    return os.path.join(columnar_cache.CACHE_DIR, f"orders_wide_{source_id(path or source_path('Orders'))}_{key[:16]}.arrow")
+
+def build_wide_table(path=None, rule=SURVIVORSHIP_RULE):
+    """
+    Materialize Orders with every customer and product attribute gathered onto each row
+
+    Each dimension's attributes are gathered with a vectorized take over the row
+    positions from its key index; Orders rows without a matching dimension row
+    get nulls, and the positions are kept in a <TABLE>_ROW column so inner-join
+    semantics can be applied. Written like the columnar cache: an uncompressed
+    Arrow IPC file under a temporary name, then renamed, and the wide tables it
+    supersedes are removed.
+
+    Returns:
+        str: Path of the wide table file
+    """
+    start_time = time.time()
+    target = wide_table_path(path, rule)
+    orders = load_table('Orders', path)
+    wide = orders
+    for table, foreign_key in WIDE_DIMENSIONS.items():
+        index = get_key_index(table, rule)
+        positions = index.positions(orders.column(foreign_key))
+        gather = pa.array(positions, mask=positions < 0)
+        for name in index.rows.column_names:
+            if name != index.key:
+                wide = wide.append_column(name, index.rows.column(name).take(gather))
+        wide = wide.append_column(row_column(table), gather)
+
+    _write_file(wide, target)
+    print(f"Built Orders wide table ({wide.num_rows} rows, {wide.num_columns} columns) in {time.time() - start_time:.2f}s: {target}")
+    remove_superseded(f"orders_wide_{source_id(path or source_path('Orders'))}_*.arrow", target)
+    return target
+
+def load_wide_table(path=None, rule=SURVIVORSHIP_RULE):
+    """
+    Load the Orders wide table, building it on first use or after any source changed
+
+    Returns:
+        pyarrow.Table (memory-mapped): the Orders columns, then each dimension's
+        non-key columns and its <TABLE>_ROW position column
+    """
+    target = wide_table_path(path, rule)
+    if not os.path.exists(target):
+        target = build_wide_table(path, rule)
+    return map_file(target)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Orders wide table and compare a grouped question with and without joins")
+    parser.add_argument("path", nargs="?", help="Orders source file or directory (default data/superstore.csv)")
+    args = parser.parse_args()
+
+    wide = load_wide_table(args.path)
+    orders = load_table('Orders', args.path).select(['CUSTOMER_ID', 'SALES']).to_pandas()
+    customers = load_table('Customers', conform=True).select(['CUSTOMER_ID', 'CUSTOMER_TIER']).to_pandas()
+
+    start_time = time.time()
+    joined = orders.merge(customers, on='CUSTOMER_ID').groupby('CUSTOMER_TIER')['SALES'].sum()
+    join_seconds = time.time() - start_time
+    start_time = time.time()
+    gathered = wide.select(['CUSTOMER_TIER', 'SALES']).to_pandas().groupby('CUSTOMER_TIER')['SALES'].sum()
+    wide_seconds = time.time() - start_time
+    print(gathered)
+    print(f"Sales by customer tier: hash join {join_seconds * 1000:.1f} ms, wide table {wide_seconds * 1000:.1f} ms")